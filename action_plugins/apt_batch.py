@@ -0,0 +1,130 @@
+# Ubootu batched apt transactions with per-package results
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+DOCUMENTATION = """
+    name: apt_batch
+    short_description: Install or remove a list of packages or .deb files in one apt transaction
+    description:
+      - Takes the arguments of ansible.builtin.apt, with C(name) or C(deb) as a list. All packages
+        go through one apt run instead of one per loop item, paying for the dpkg lock, cache open
+        and trigger processing once.
+      - The result keeps per-package attribution in C(package_results) (item, status, msg), which
+        the ubootu_events callback reports item by item like a loop.
+      - If the transaction fails, each package is retried on its own so one bad package doesn't
+        hold back the rest, and the failures are attributed to the packages that caused them.
+"""
+
+import os
+import sys
+
+from ansible.module_utils.common.text.converters import to_native
+from ansible.plugins.action import ActionBase
+
+# The output parsing lives in the repository's lib package, one level up from this plugin
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from lib.apt_batch import package_results  # noqa: E402
+
+# apt-get run for a batch of .deb files; the apt module only takes one deb at a time
+DEB_INSTALL_ARGV = [
+    "env",
+    "DEBIAN_FRONTEND=noninteractive",
+    "apt-get",
+    "install",
+    "-y",
+    "-q",
+    "-o",
+    "Dpkg::Options::=--force-confdef",
+    "-o",
+    "Dpkg::Options::=--force-confold",
+]
+
+# apt arguments that do something without a package list
+NO_PACKAGE_OPTIONS = ("update_cache", "autoremove", "autoclean", "upgrade")
+
+
+def _enabled(value):
+    if isinstance(value, str):
+        return value.strip().lower() not in ("", "no", "false", "n", "off", "0")
+    return bool(value)
+
+
+def _as_list(value):
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple)):
+        return [str(item) for item in value if item]
+    return [item.strip() for item in str(value).split(",") if item.strip()]
+
+
+class ActionModule(ActionBase):
+    def _apt(self, args, task_vars):
+        return self._execute_module(module_name="ansible.legacy.apt", module_args=args, task_vars=task_vars)
+
+    def _install_debs(self, debs, task_vars):
+        if self._play_context.check_mode:
+            # apt-get can't dry-run local files through the command module; check each with apt
+            return {"changed": any(self._apt({"deb": deb}, task_vars).get("changed") for deb in debs)}
+        result = self._execute_module(
+            module_name="ansible.legacy.command", module_args={"argv": DEB_INSTALL_ARGV + debs}, task_vars=task_vars
+        )
+        if not result.get("failed"):
+            result["changed"] = "Unpacking " in (result.get("stdout") or "")
+        return result
+
+    def run(self, tmp=None, task_vars=None):
+        task_vars = task_vars or {}
+        result = super(ActionModule, self).run(tmp, task_vars)
+        del tmp
+
+        args = dict(self._task.args)
+        debs = _as_list(args.pop("deb", None))
+        names = _as_list(args.pop("name", None))
+        if debs and names:
+            result.update(failed=True, msg="apt_batch takes either name or deb, not both")
+            return result
+        specs = debs or names
+
+        if not specs:
+            # Nothing selected; still honour update_cache, autoremove and the like, which apt
+            # runs without a name. Anything else (state, purge, ...) has nothing to act on.
+            if any(_enabled(args.get(option)) for option in NO_PACKAGE_OPTIONS):
+                result.update(self._apt(args, task_vars))
+            else:
+                result["changed"] = False
+            result.update(package_results=[])
+            return result
+
+        batch = self._install_debs(debs, task_vars) if debs else self._apt(dict(args, name=names), task_vars)
+        if not batch.get("failed"):
+            result.update(batch)
+            result["package_results"] = package_results(specs, batch, debs=bool(debs))
+            return result
+
+        # Find out which packages broke the transaction; the others still get installed
+        packages = []
+        for spec in specs:
+            single = self._apt(dict(args, deb=spec) if debs else dict(args, name=[spec]), task_vars)
+            if single.get("failed"):
+                packages.append({"item": spec, "status": "failed", "msg": to_native(single.get("msg", ""))})
+            else:
+                packages.extend(package_results([spec], single, debs=bool(debs)))
+
+        failed = [entry["item"] for entry in packages if entry["status"] == "failed"]
+        result.update(
+            changed=any(entry["status"] == "changed" for entry in packages),
+            failed=bool(failed),
+            package_results=packages,
+        )
+        if failed:
+            result["msg"] = "Failed to %s: %s" % (
+                "remove" if args.get("state") == "absent" else "install",
+                ", ".join(failed),
+            )
+        return result
@@ -0,0 +1,144 @@
+# Ubootu get_url backed by the shared artifact cache
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+DOCUMENTATION = """
+    name: cached_get_url
+    short_description: get_url that reuses artifacts from the controller's content-addressed cache
+    description:
+      - Takes the same arguments as ansible.builtin.get_url. The file is fetched into the artifact
+        cache on the controller (~/.cache/ubootu/artifacts, or ubootu_artifact_cache_dir) and copied
+        to dest from there, so reapplying or provisioning another host doesn't download it again.
+      - With a checksum the cached copy is used without a request; without one it is revalidated
+        with the ETag/Last-Modified it was served with.
+      - Anything the cache can't handle (authentication, client certificates, checksum files,
+        check mode on an uncached file, an unreachable server) falls back to ansible.builtin.get_url.
+      - Set ubootu_artifact_cache to false to always use ansible.builtin.get_url.
+      - With ubootu_bundle_dir set, files come from the offline bundle's artifact cache only; a file
+        missing from the bundle fails the task instead of being downloaded.
+"""
+
+import os
+import sys
+
+from ansible.module_utils.common.text.converters import to_native
+from ansible.module_utils.parsing.convert_bool import boolean
+from ansible.module_utils.six.moves.urllib.parse import urlparse
+from ansible.plugins.action import ActionBase
+from ansible.utils.display import Display
+
+# The cache lives in the repository's lib package, one level up from this plugin
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from lib.artifact_cache import ARTIFACT_CACHE_MAX_SIZE, ArtifactCache, ChecksumMismatch  # noqa: E402
+from lib.offline_bundle import ARTIFACTS_DIR  # noqa: E402
+
+display = Display()
+
+# get_url arguments the cache understands; any other argument means plain get_url
+CACHED_ARGS = {"url", "dest", "mode", "owner", "group", "checksum", "force", "headers", "timeout", "validate_certs"}
+COPY_ARGS = ("mode", "owner", "group")
+
+
+class ActionModule(ActionBase):
+    TRANSFERS_FILES = True
+
+    def _get_url(self, task_vars):
+        return self._execute_module(
+            module_name="ansible.legacy.get_url", module_args=self._task.args, task_vars=task_vars
+        )
+
+    def _bundle_dir(self, task_vars):
+        bundle_dir = task_vars.get("ubootu_bundle_dir")
+        return self._templar.template(bundle_dir) if bundle_dir else None
+
+    def _cache(self, task_vars):
+        bundle_dir = self._bundle_dir(task_vars)
+        if bundle_dir:
+            return ArtifactCache(os.path.join(bundle_dir, ARTIFACTS_DIR), max_size=sys.maxsize)
+        cache_dir = task_vars.get("ubootu_artifact_cache_dir")
+        max_size_mb = task_vars.get("ubootu_artifact_cache_max_size_mb")
+        max_size = int(self._templar.template(max_size_mb)) * 1024 * 1024 if max_size_mb else ARTIFACT_CACHE_MAX_SIZE
+        return ArtifactCache(self._templar.template(cache_dir) if cache_dir else None, max_size)
+
+    def run(self, tmp=None, task_vars=None):
+        task_vars = task_vars or {}
+        result = super(ActionModule, self).run(tmp, task_vars)
+        del tmp
+
+        args = self._task.args
+        url = args.get("url")
+        dest = args.get("dest")
+        enabled = boolean(self._templar.template(task_vars.get("ubootu_artifact_cache", True)), strict=False)
+        if not enabled or not url or not dest or set(args) - CACHED_ARGS:
+            result.update(self._get_url(task_vars))
+            return result
+
+        checksum = args.get("checksum") or None
+        force = boolean(args.get("force", False), strict=False)
+        dest_stat = self._execute_remote_stat(dest, all_vars=task_vars, follow=True)
+        if (dest_stat["exists"] and dest_stat["isdir"]) or dest.endswith("/"):
+            dest = os.path.join(dest, os.path.basename(urlparse(url).path) or "index.html")
+            dest_stat = self._execute_remote_stat(dest, all_vars=task_vars, follow=True)
+        if dest_stat["exists"] and not checksum and not force:
+            # get_url leaves an existing file alone unless forced or checksummed
+            result.update(changed=False, dest=dest, url=url, msg="file already exists")
+            return result
+
+        cache = self._cache(task_vars)
+        offline = bool(self._bundle_dir(task_vars))
+        try:
+            if offline:
+                try:
+                    artifact = cache.fetch(url, checksum, offline=True)
+                except ValueError:
+                    # Bundled by URL, as the cache can't verify this kind of checksum
+                    artifact = cache.fetch(url, offline=True)
+            elif self._play_context.check_mode:
+                # Check mode copies from the cache if it can, but never downloads into it
+                artifact = cache.get(url, checksum)
+                if artifact is None:
+                    result.update(self._get_url(task_vars))
+                    return result
+            else:
+                artifact = cache.fetch(
+                    url,
+                    checksum,
+                    headers=args.get("headers"),
+                    timeout=int(args.get("timeout", 10)),
+                    validate_certs=boolean(args.get("validate_certs", True), strict=False),
+                )
+        except ChecksumMismatch as e:
+            result.update(failed=True, dest=dest, url=url, msg="The checksum for %s did not match: %s" % (url, e))
+            return result
+        except ValueError:
+            # A checksum the cache can't verify itself (e.g. a URL of a checksums file)
+            result.update(self._get_url(task_vars))
+            return result
+        except Exception as e:
+            if offline:
+                result.update(failed=True, dest=dest, url=url, msg="Not in the offline bundle: %s" % to_native(e))
+                return result
+            display.warning("cached_get_url: %s could not be cached, downloading directly: %s" % (url, to_native(e)))
+            result.update(self._get_url(task_vars))
+            return result
+
+        copy_task = self._task.copy()
+        copy_task.args = dict(src=str(artifact.path), dest=dest, **{key: args[key] for key in COPY_ARGS if key in args})
+        copy_action = self._shared_loader_obj.action_loader.get(
+            "ansible.legacy.copy",
+            task=copy_task,
+            connection=self._connection,
+            play_context=self._play_context,
+            loader=self._loader,
+            templar=self._templar,
+            shared_loader_obj=self._shared_loader_obj,
+        )
+        result.update(copy_action.run(task_vars=task_vars))
+        result.update(url=url, status_code=200, artifact_cache=artifact.status, sha256sum=artifact.sha256)
+        return result
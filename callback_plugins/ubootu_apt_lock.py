@@ -0,0 +1,104 @@
+# Ubootu package-manager serializer for concurrent role runs
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+DOCUMENTATION = """
+    name: ubootu_apt_lock
+    type: aggregate
+    short_description: Keep package-manager tasks of concurrent Ubootu runs from overlapping
+    description:
+      - Holds an exclusive lock on the file named by UBOOTU_APT_LOCK while a package-manager
+        task (apt, dpkg, snap, flatpak, or a shell/command task calling them) runs.
+      - Several ansible-playbook processes sharing the lock file take turns instead of failing
+        on the dpkg lock. Does nothing when UBOOTU_APT_LOCK is unset.
+    requirements:
+      - Enabled through ANSIBLE_CALLBACKS_ENABLED (the role scheduler sets it)
+"""
+
+import fcntl
+import os
+import re
+
+from ansible.plugins.callback import CallbackBase
+
+PACKAGE_MODULES = {
+    "apt",
+    "apt_batch",
+    "apt_key",
+    "apt_repository",
+    "deb822_repository",
+    "dpkg_selections",
+    "package",
+    "package_facts",
+    "snap",
+    "flatpak",
+    "flatpak_remote",
+}
+
+# Shell and command tasks that call a package manager
+PACKAGE_COMMAND_RE = re.compile(r"\b(apt|apt-get|aptitude|dpkg|snap|flatpak|add-apt-repository)\b")
+
+
+class CallbackModule(CallbackBase):
+    """Take the shared lock before package-manager tasks and release it when they finish"""
+
+    CALLBACK_VERSION = 2.0
+    CALLBACK_TYPE = "aggregate"
+    CALLBACK_NAME = "ubootu_apt_lock"
+    CALLBACK_NEEDS_ENABLED = True
+
+    def __init__(self, *args, **kwargs):
+        super(CallbackModule, self).__init__(*args, **kwargs)
+        self._lock_path = os.environ.get("UBOOTU_APT_LOCK")
+        self._lock_fd = None
+
+    def _is_package_task(self, task):
+        action = (task.action or "").split(".")[-1]
+        if action in PACKAGE_MODULES:
+            return True
+        if action in ("shell", "command", "raw"):
+            args = task.args or {}
+            command = args.get("_raw_params") or args.get("cmd") or " ".join(args.get("argv") or [])
+            return bool(PACKAGE_COMMAND_RE.search(str(command)))
+        return False
+
+    def _acquire(self):
+        if self._lock_fd is not None or not self._lock_path:
+            return
+        try:
+            fd = os.open(self._lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+        except OSError as e:
+            self._display.warning("ubootu_apt_lock: cannot open %s: %s" % (self._lock_path, e))
+            self._lock_path = None
+            return
+        # Blocks this run until no other run is inside a package-manager task
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        self._lock_fd = fd
+
+    def _release(self, *args, **kwargs):
+        if self._lock_fd is None:
+            return
+        try:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+        finally:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    def v2_playbook_on_task_start(self, task, is_conditional):
+        self._release()
+        if self._is_package_task(task):
+            self._acquire()
+
+    def v2_playbook_on_handler_task_start(self, task):
+        self.v2_playbook_on_task_start(task, False)
+
+    # Task start callbacks run before the task is queued, so the lock covers the whole task
+    v2_runner_on_ok = _release
+    v2_runner_on_failed = _release
+    v2_runner_on_skipped = _release
+    v2_runner_on_unreachable = _release
+    v2_playbook_on_play_start = _release
+    v2_playbook_on_stats = _release
@@ -0,0 +1,79 @@
+# Ubootu recorder of what an apply installs and downloads, for offline bundles
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+DOCUMENTATION = """
+    name: ubootu_bundle_recorder
+    type: aggregate
+    short_description: Record the packages, downloads, snaps and flatpaks a run resolves
+    description:
+      - Appends one JSON line per package-manager or download task that ran (or failed) to the
+        file named by UBOOTU_BUNDLE_RECORD, with the task's templated arguments. Skipped tasks
+        are not recorded, so the file lists exactly what the configuration implies.
+      - Shell and command tasks are recorded, with their task name, when their command contains a
+        URL, so the bundle can list the install scripts and downloads it can't carry.
+      - lib/offline_bundle reads the file to build an offline apply bundle.
+        Does nothing when UBOOTU_BUNDLE_RECORD is unset.
+    requirements:
+      - Enabled through ANSIBLE_CALLBACKS_ENABLED (the bundle exporter sets it)
+"""
+
+import json
+import os
+
+from ansible.plugins.callback import CallbackBase
+
+RECORDED_MODULES = {"apt", "apt_batch", "package", "cached_get_url", "get_url", "snap", "flatpak"}
+COMMAND_MODULES = {"shell", "command"}
+
+
+class CallbackModule(CallbackBase):
+    """Write the arguments of every recorded task that ran"""
+
+    CALLBACK_VERSION = 2.0
+    CALLBACK_TYPE = "aggregate"
+    CALLBACK_NAME = "ubootu_bundle_recorder"
+    CALLBACK_NEEDS_ENABLED = True
+
+    def __init__(self, *args, **kwargs):
+        super(CallbackModule, self).__init__(*args, **kwargs)
+        self._record_path = os.environ.get("UBOOTU_BUNDLE_RECORD")
+
+    def _record(self, result):
+        if not self._record_path:
+            return
+        module = (result._task.action or "").split(".")[-1]
+        data = result._result
+        if module not in RECORDED_MODULES | COMMAND_MODULES or data.get("skipped") or "results" in data:
+            # Looped tasks are recorded item by item
+            return
+        args = (getattr(result, "_task_fields", None) or {}).get("args") or result._task.args
+        entry = {"module": module, "args": args}
+        if module in COMMAND_MODULES:
+            if "://" not in json.dumps(args, default=str):
+                return
+            entry["task"] = result._task.get_name()
+        if data.get("url"):
+            entry["url"] = data["url"]
+        try:
+            with open(self._record_path, "a") as f:
+                f.write(json.dumps(entry, default=str) + "\n")
+        except OSError as e:
+            self._display.warning("ubootu_bundle_recorder: cannot write %s: %s" % (self._record_path, e))
+            self._record_path = None
+
+    def v2_runner_on_ok(self, result):
+        self._record(result)
+
+    def v2_runner_on_failed(self, result, ignore_errors=False):
+        # A check run fails on packages from repositories it didn't add; they are still needed
+        self._record(result)
+
+    def v2_runner_item_on_ok(self, result):
+        self._record(result)
+
+    def v2_runner_item_on_failed(self, result):
+        self._record(result)
@@ -0,0 +1,164 @@
+# Ubootu progress event stream for the TUI progress dialog
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+DOCUMENTATION = """
+    name: ubootu_events
+    type: stdout
+    short_description: Newline-delimited JSON progress events for the Ubootu TUI
+    description:
+      - Writes one JSON object per line for play and task starts, per-host and per-item
+        results (with timings and skip reasons) and the final stats.
+      - Batched package tasks (apt_batch) get one item event per package from their package_results.
+      - Events go to the file descriptor named by UBOOTU_EVENT_FD, or to stdout when it is unset.
+      - Warnings and errors are still printed by Ansible itself.
+    requirements:
+      - Set as the stdout callback (ANSIBLE_STDOUT_CALLBACK=ubootu_events)
+"""
+
+import json
+import os
+import time
+
+from ansible.plugins.callback import CallbackBase
+
+
+class CallbackModule(CallbackBase):
+    """Emit progress events as newline-delimited JSON"""
+
+    CALLBACK_VERSION = 2.0
+    CALLBACK_TYPE = "stdout"
+    CALLBACK_NAME = "ubootu_events"
+
+    def __init__(self, *args, **kwargs):
+        super(CallbackModule, self).__init__(*args, **kwargs)
+        self._task_started = {}
+        self._stream = None
+
+        fd = os.environ.get("UBOOTU_EVENT_FD")
+        if fd:
+            try:
+                self._stream = os.fdopen(int(fd), "w", buffering=1, encoding="utf-8")
+            except (OSError, ValueError) as e:
+                self._display.warning("ubootu_events: cannot open UBOOTU_EVENT_FD=%s: %s" % (fd, e))
+
+    def _emit(self, event, **fields):
+        fields["event"] = event
+        fields["time"] = round(time.time(), 3)
+        line = json.dumps(fields, default=str)
+        if self._stream is not None:
+            try:
+                self._stream.write(line + "\n")
+                return
+            except (OSError, ValueError):
+                # Reader went away; keep the run going on stdout
+                self._stream = None
+        self._display.display(line)
+
+    def _task_fields(self, result):
+        task = result._task
+        fields = {
+            "task": task.get_name().strip(),
+            "id": task._uuid,
+            "host": result._host.get_name(),
+        }
+        started = self._task_started.get(task._uuid)
+        if started is not None:
+            fields["duration"] = round(time.time() - started, 3)
+        return fields
+
+    def _message(self, result):
+        data = result._result
+        msg = data.get("msg") or data.get("stderr") or data.get("reason") or ""
+        if isinstance(msg, (list, dict)):
+            msg = json.dumps(msg, default=str)
+        return str(msg).strip().split("\n")[0]
+
+    def _skip_fields(self, result):
+        data = result._result
+        fields = {}
+        if data.get("skip_reason"):
+            fields["skip_reason"] = data["skip_reason"]
+        if data.get("false_condition"):
+            fields["false_condition"] = str(data["false_condition"])
+        return fields
+
+    def v2_playbook_on_start(self, playbook):
+        self._emit("playbook_start", playbook=os.path.basename(playbook._file_name))
+
+    def v2_playbook_on_play_start(self, play):
+        self._emit("play_start", name=play.get_name().strip())
+
+    def v2_playbook_on_task_start(self, task, is_conditional):
+        self._task_started[task._uuid] = time.time()
+        self._emit("task_start", task=task.get_name().strip(), id=task._uuid, action=task.action)
+
+    def v2_playbook_on_handler_task_start(self, task):
+        self._task_started[task._uuid] = time.time()
+        self._emit("task_start", task=task.get_name().strip(), id=task._uuid, action=task.action, handler=True)
+
+    def _has_items(self, result):
+        """Whether the result's items were reported on their own: loop results or per-package results"""
+        data = result._result
+        return "results" in data or "package_results" in data
+
+    def _emit_package_items(self, result):
+        """One item event per package of a batched package task, as a loop would have"""
+        fields = self._task_fields(result)
+        fields.pop("duration", None)
+        for package in result._result.get("package_results") or []:
+            item = dict(fields, status=package.get("status", "ok"), item=str(package.get("item")))
+            if package.get("msg"):
+                item["msg"] = str(package["msg"]).strip().split("\n")[0]
+            self._emit("item", **item)
+
+    def v2_runner_on_ok(self, result):
+        self._emit_package_items(result)
+        status = "changed" if result._result.get("changed", False) else "ok"
+        self._emit("result", status=status, loop=self._has_items(result), **self._task_fields(result))
+
+    def v2_runner_on_failed(self, result, ignore_errors=False):
+        self._emit_package_items(result)
+        self._emit(
+            "result",
+            status="failed",
+            ignore_errors=bool(ignore_errors),
+            msg=self._message(result),
+            loop=self._has_items(result),
+            **self._task_fields(result),
+        )
+
+    def v2_runner_on_skipped(self, result):
+        fields = self._task_fields(result)
+        fields.update(self._skip_fields(result))
+        self._emit("result", status="skipped", loop="results" in result._result, **fields)
+
+    def v2_runner_on_unreachable(self, result):
+        self._emit("result", status="unreachable", msg=self._message(result), **self._task_fields(result))
+
+    def _item_fields(self, result):
+        fields = self._task_fields(result)
+        fields.pop("duration", None)
+        fields["item"] = str(self._get_item_label(result._result))
+        return fields
+
+    def v2_runner_item_on_ok(self, result):
+        status = "changed" if result._result.get("changed", False) else "ok"
+        self._emit("item", status=status, **self._item_fields(result))
+
+    def v2_runner_item_on_failed(self, result):
+        self._emit("item", status="failed", msg=self._message(result), **self._item_fields(result))
+
+    def v2_runner_item_on_skipped(self, result):
+        fields = self._item_fields(result)
+        fields.update(self._skip_fields(result))
+        self._emit("item", status="skipped", **fields)
+
+    def v2_playbook_on_stats(self, stats):
+        hosts = {host: stats.summarize(host) for host in sorted(stats.processed.keys())}
+        self._emit("stats", hosts=hosts)
+        if self._stream is not None:
+            self._stream.flush()
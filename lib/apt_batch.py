@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Per-package results for batched apt transactions
+Reads apt-get/dpkg output to tell which of the packages in one transaction
+were installed, upgraded or removed, so a single apt run can still be
+reported package by package
+"""
+
+import os
+import re
+from typing import Any, Dict, List
+
+# dpkg progress lines naming the package they act on, e.g. "Setting up tree (2.1.1-2) ..."
+_DPKG_ACTION_RE = re.compile(
+    r"^(Unpacking|Setting up|Removing|Purging configuration files for) ([^\s:]+)(?::\S+)? ", re.M
+)
+
+# "Preparing to unpack .../tool.deb ..." is followed by the "Unpacking <package>" line for that file
+_PREPARE_RE = re.compile(r"^Preparing to unpack (\S+) \.\.\.\n(?:.*\n)*?Unpacking ([^\s:]+)", re.M)
+
+_VERSION_SEPARATORS = ("=", ">", "<")
+
+
+def package_name(spec: str) -> str:
+    """Package name of an apt spec such as "foo=1.2", "foo>=1.0" or "foo:i386" """
+    name = str(spec).strip()
+    for separator in _VERSION_SEPARATORS:
+        name = name.split(separator)[0]
+    return name.split(":")[0].strip()
+
+
+def changed_packages(output: str) -> Dict[str, str]:
+    """Packages dpkg acted on in an apt-get run, as name -> "installed" or "removed" """
+    changed: Dict[str, str] = {}
+    for action, name in _DPKG_ACTION_RE.findall(output or ""):
+        if action in ("Unpacking", "Setting up"):
+            changed.setdefault(name, "installed")
+        else:
+            changed[name] = "removed"
+    return changed
+
+
+def deb_packages(output: str) -> Dict[str, str]:
+    """Package unpacked from each .deb file in an apt-get run, keyed by file name"""
+    return {os.path.basename(path): name for path, name in _PREPARE_RE.findall(output or "")}
+
+
+def package_results(specs: List[str], result: Dict[str, Any], debs: bool = False) -> List[Dict[str, Any]]:
+    """One result per requested package (or .deb file) of a successful transaction
+
+    A package is changed if dpkg acted on it and ok otherwise. If apt
+    reported a change without output to attribute it by, every package is
+    taken as changed.
+    """
+    output = "\n".join(str(result.get(key) or "") for key in ("stdout", "stderr"))
+    changed = changed_packages(output)
+    unpacked = deb_packages(output) if debs else {}
+    unattributed = bool(result.get("changed")) and not changed
+
+    results = []
+    for spec in specs:
+        entry: Dict[str, Any] = {"item": spec}
+        if debs:
+            entry["status"] = "changed" if os.path.basename(spec) in unpacked or unattributed else "ok"
+        else:
+            entry["status"] = "changed" if package_name(spec) in changed or unattributed else "ok"
+        results.append(entry)
+    return results
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Content-addressed cache for downloaded artifacts
+Keeps .deb packages, AppImages and release tarballs by SHA-256 so reapplying,
+or provisioning another machine from the same cache, reuses them instead of
+downloading again. The least recently used artifacts are evicted to keep the
+cache under a size limit.
+"""
+
+import hashlib
+import json
+import os
+import ssl
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# Total size of cached artifacts before the least recently used are evicted
+ARTIFACT_CACHE_MAX_SIZE = 4 * 1024**3
+
+# Artifacts used within this many seconds are never evicted: another apply sharing the cache
+# may have just fetched one and be about to copy it into place
+EVICTION_GRACE_PERIOD = 300
+
+DOWNLOAD_TIMEOUT = 30
+
+_CHUNK_SIZE = 1024 * 1024
+
+
+class ChecksumMismatch(ValueError):
+    """A download did not match the checksum the task asked for"""
+
+
+def get_artifact_cache_dir() -> Path:
+    """Directory cached artifacts are kept in"""
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return Path(base) / "ubootu" / "artifacts"
+
+
+def parse_checksum(checksum: Optional[str]) -> Optional[Tuple[str, str]]:
+    """Split a get_url style "<algorithm>:<hex digest>" checksum
+
+    Raises ValueError for checksums the cache can't verify, such as an
+    unknown algorithm or a URL of a checksum file.
+    """
+    if not checksum:
+        return None
+    algorithm, _, digest = checksum.partition(":")
+    algorithm = algorithm.strip().lower()
+    digest = digest.strip().lower()
+    if algorithm not in hashlib.algorithms_available or not digest or "/" in digest:
+        raise ValueError(f"unsupported checksum {checksum!r}")
+    return algorithm, digest
+
+
+def artifact_key(url: str, checksum: Optional[str] = None) -> str:
+    """Cache key of a download: its URL plus the checksum it must match"""
+    return hashlib.sha256(f"{url}\n{checksum or ''}".encode()).hexdigest()
+
+
+@dataclass
+class FetchResult:
+    path: Path
+    sha256: str
+    size: int
+    # "hit" (no request), "revalidated" (304 or offline), or "downloaded"
+    status: str
+
+
+class ArtifactCache:
+    """Artifacts stored once by SHA-256 under blobs/, with keys/ mapping URL + checksum to a blob
+
+    A blob's modification time records when it was last used, for LRU eviction;
+    blobs used within EVICTION_GRACE_PERIOD are kept even over the size limit.
+    Everything is written to a temporary file first and renamed into place, so
+    concurrent applies sharing the cache never see a partial artifact.
+    """
+
+    def __init__(self, cache_dir: Optional[Path] = None, max_size: int = ARTIFACT_CACHE_MAX_SIZE):
+        self.cache_dir = Path(cache_dir) if cache_dir else get_artifact_cache_dir()
+        self.max_size = max_size
+        self.blobs_dir = self.cache_dir / "blobs"
+        self.keys_dir = self.cache_dir / "keys"
+
+    def blob_path(self, sha256: str) -> Path:
+        return self.blobs_dir / sha256
+
+    def _load_key(self, key: str) -> Optional[Dict]:
+        try:
+            with open(self.keys_dir / f"{key}.json", "r") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(entry, dict) or not self.blob_path(str(entry.get("sha256"))).is_file():
+            return None
+        return entry
+
+    def _store_key(self, key: str, entry: Dict) -> None:
+        self.keys_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.keys_dir, prefix=".tmp-")
+        with os.fdopen(fd, "w") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, self.keys_dir / f"{key}.json")
+
+    def _use(self, entry: Dict, status: str) -> FetchResult:
+        path = self.blob_path(entry["sha256"])
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return FetchResult(path, entry["sha256"], path.stat().st_size, status)
+
+    def get(self, url: str, checksum: Optional[str] = None) -> Optional[FetchResult]:
+        """The cached artifact for a URL and checksum, without any network access"""
+        expected = parse_checksum(checksum)
+        if expected and expected[0] == "sha256" and self.blob_path(expected[1]).is_file():
+            # Same content under another URL (a mirror, or a renamed release asset)
+            return self._use({"sha256": expected[1]}, "hit")
+        entry = self._load_key(artifact_key(url, checksum))
+        return self._use(entry, "hit") if entry else None
+
+    def fetch(
+        self,
+        url: str,
+        checksum: Optional[str] = None,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: int = DOWNLOAD_TIMEOUT,
+        validate_certs: bool = True,
+        offline: bool = False,
+    ) -> FetchResult:
+        """Cached artifact for `url`, downloading it if needed
+
+        With a checksum a cached copy is used as-is. Without one the cached
+        copy is revalidated with the ETag/Last-Modified it was served with,
+        because the same URL can serve a newer file; if the server can't be
+        reached the cached copy is used anyway. `offline` skips the server.
+        """
+        expected = parse_checksum(checksum)
+        if expected:
+            cached = self.get(url, checksum)
+            if cached:
+                return cached
+
+        key = artifact_key(url, checksum)
+        entry = None if expected else self._load_key(key)
+        if entry and offline:
+            return self._use(entry, "hit")
+        if offline:
+            raise FileNotFoundError(f"{url} is not in the artifact cache")
+
+        request = urllib.request.Request(url, headers=dict(headers or {}))
+        if entry and entry.get("etag"):
+            request.add_header("If-None-Match", entry["etag"])
+        if entry and entry.get("last_modified"):
+            request.add_header("If-Modified-Since", entry["last_modified"])
+        context = None
+        if not validate_certs:
+            context = ssl.create_default_context()
+            context.check_hostname = False
+            context.verify_mode = ssl.CERT_NONE
+
+        try:
+            response = urllib.request.urlopen(request, timeout=timeout, context=context)
+        except urllib.error.HTTPError as e:
+            if entry and (e.code == 304 or e.code == 429 or e.code >= 500):
+                return self._use(entry, "revalidated")
+            raise
+        except (urllib.error.URLError, OSError):
+            if entry:
+                return self._use(entry, "revalidated")
+            raise
+
+        with response:
+            sha256, size = self._download(response, expected)
+            self._store_key(
+                key,
+                {
+                    "url": url,
+                    "checksum": checksum,
+                    "sha256": sha256,
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                    "stored": time.time(),
+                },
+            )
+        self.evict(keep={sha256})
+        return FetchResult(self.blob_path(sha256), sha256, size, "downloaded")
+
+    def _download(self, response, expected: Optional[Tuple[str, str]]) -> Tuple[str, int]:
+        """Stream a response into blobs/, checking it against the expected checksum"""
+        self.blobs_dir.mkdir(parents=True, exist_ok=True)
+        sha256 = hashlib.sha256()
+        verify = hashlib.new(expected[0]) if expected and expected[0] != "sha256" else None
+        size = 0
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.blobs_dir, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in iter(lambda: response.read(_CHUNK_SIZE), b""):
+                    f.write(chunk)
+                    sha256.update(chunk)
+                    if verify:
+                        verify.update(chunk)
+                    size += len(chunk)
+
+            digest = (verify or sha256).hexdigest()
+            if expected and digest != expected[1]:
+                raise ChecksumMismatch(f"{expected[0]} checksum {digest} does not match {expected[1]}")
+            os.replace(tmp_path, self.blob_path(sha256.hexdigest()))
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+        return sha256.hexdigest(), size
+
+    def size(self) -> int:
+        return sum(path.stat().st_size for path in self._blobs())
+
+    def _blobs(self) -> List[Path]:
+        if not self.blobs_dir.is_dir():
+            return []
+        return [path for path in self.blobs_dir.iterdir() if path.is_file() and not path.name.startswith(".")]
+
+    def evict(self, keep: Optional[set] = None) -> List[str]:
+        """Remove least recently used artifacts until the cache fits in max_size
+
+        Artifacts used within EVICTION_GRACE_PERIOD are skipped, so the cache can
+        stay over max_size until they age.
+        """
+        blobs = sorted(self._blobs(), key=lambda path: path.stat().st_mtime)
+        total = sum(path.stat().st_size for path in blobs)
+        removed = []
+        for path in blobs:
+            if total <= self.max_size:
+                break
+            if keep and path.name in keep:
+                continue
+            try:
+                # Checked again here, as a concurrent apply may have used it since the listing
+                stat = path.stat()
+                if time.time() - stat.st_mtime < EVICTION_GRACE_PERIOD:
+                    continue
+                path.unlink()
+            except OSError:
+                continue
+            total -= stat.st_size
+            removed.append(path.name)
+        # Keys pointing at evicted blobs are ignored on lookup and overwritten on the next download
+        return removed
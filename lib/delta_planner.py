@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Delta planner for applies
+Diffs the last applied configuration against the current one and works out
+which roles can be affected by the difference, when every changed item can be
+traced to the roles that use it
+"""
+
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set
+
+import yaml
+
+# Role files that decide what a role does with the configuration
+ROLE_SOURCE_DIRS = ("tasks", "handlers", "vars", "defaults", "templates")
+ROLE_SOURCE_SUFFIXES = {".yml", ".yaml", ".j2"}
+
+# Top-level config keys the planner understands; a change anywhere else means a full apply
+PLANNED_KEYS = {"selected_items", "configurable_items", "metadata"}
+
+_WORD_RE = re.compile(r"[A-Za-z0-9_+-]+")
+
+
+@dataclass
+class ConfigDelta:
+    """What changed between two configurations"""
+
+    added: Set[str] = field(default_factory=set)
+    removed: Set[str] = field(default_factory=set)
+    changed_values: Set[str] = field(default_factory=set)
+    other_keys: Set[str] = field(default_factory=set)
+
+    @property
+    def empty(self) -> bool:
+        return not (self.added or self.removed or self.changed_values or self.other_keys)
+
+    @property
+    def items(self) -> Set[str]:
+        """Ids of every selected or configurable item that changed"""
+        return self.added | self.removed | self.changed_values
+
+
+def _configurable_values(config: Dict[str, Any]) -> Dict[str, Any]:
+    values = {}
+    for item_id, entry in (config.get("configurable_items") or {}).items():
+        values[item_id] = entry.get("value") if isinstance(entry, dict) else entry
+    return values
+
+
+def config_delta(applied: Dict[str, Any], current: Dict[str, Any]) -> ConfigDelta:
+    """Selections, configurable values and other settings that differ"""
+    applied_items = set(applied.get("selected_items") or [])
+    current_items = set(current.get("selected_items") or [])
+
+    applied_values = _configurable_values(applied)
+    current_values = _configurable_values(current)
+    changed_values = {
+        item_id
+        for item_id in set(applied_values) | set(current_values)
+        if applied_values.get(item_id) != current_values.get(item_id)
+    }
+
+    other_keys = {key for key in (set(applied) | set(current)) - PLANNED_KEYS if applied.get(key) != current.get(key)}
+    return ConfigDelta(current_items - applied_items, applied_items - current_items, changed_values, other_keys)
+
+
+def load_config(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, "r") as f:
+            config = yaml.safe_load(f)
+    except (OSError, yaml.YAMLError):
+        return None
+    return config if isinstance(config, dict) else None
+
+
+def playbook_roles(playbook: Path) -> List[str]:
+    """Roles the plays of a playbook list, in order"""
+    try:
+        with open(playbook, "r") as f:
+            plays = yaml.safe_load(f)
+    except (OSError, yaml.YAMLError):
+        return []
+
+    roles: List[str] = []
+    for play in plays if isinstance(plays, list) else []:
+        for entry in (play.get("roles") or []) if isinstance(play, dict) else []:
+            name = entry.get("role") or entry.get("name") if isinstance(entry, dict) else entry
+            if name and name not in roles:
+                roles.append(str(name))
+    return roles
+
+
+class RoleReferenceIndex:
+    """Which roles mention each word (item id, variable name) in their tasks, vars and templates"""
+
+    def __init__(self, roles_dir: Path, roles: Optional[List[str]] = None):
+        self.roles_dir = Path(roles_dir)
+        self._roles: Dict[str, Set[str]] = {}
+
+        role_dirs = [self.roles_dir / role for role in roles] if roles is not None else self.roles_dir.iterdir()
+        for role_dir in sorted(path for path in role_dirs if path.is_dir()):
+            for source_dir in ROLE_SOURCE_DIRS:
+                for path in (role_dir / source_dir).rglob("*"):
+                    if path.suffix not in ROLE_SOURCE_SUFFIXES or not path.is_file():
+                        continue
+                    try:
+                        text = path.read_text(encoding="utf-8", errors="replace")
+                    except OSError:
+                        continue
+                    for word in set(_WORD_RE.findall(text)):
+                        self._roles.setdefault(word, set()).add(role_dir.name)
+
+    def roles_for(self, word: str) -> Set[str]:
+        return self._roles.get(word, set())
+
+
+@dataclass
+class DeltaPlan:
+    """Roles to run for a configuration change, and the items that put each one there"""
+
+    roles: List[str]
+    reasons: Dict[str, List[str]]
+    delta: ConfigDelta
+
+
+def plan_delta(
+    applied: Optional[Dict[str, Any]],
+    current: Dict[str, Any],
+    playbook: Path,
+    var_name: Optional[Callable[[str], str]] = None,
+    extra_words: Optional[List[str]] = None,
+) -> Optional[DeltaPlan]:
+    """Roles of `playbook` affected by the change from `applied` to `current`
+
+    An item affects the roles that mention its id (or, for configurable
+    items, the Ansible variable it is passed as, via `var_name`).
+    `extra_words` adds variables that change with the delta, such as
+    packages_to_remove.
+
+    Many items are never named in a role: they reach the roles through
+    variables derived from the selection (an item id translated to a
+    package name, a prompt or tool setting, a list built in group_vars), so
+    an item no role mentions is one whose roles can't be told, not one that
+    changes nothing.
+
+    Returns None when a full apply is needed: nothing was applied before,
+    nothing changed (so re-converging is what was asked for), a setting
+    outside the item selections changed, or any changed item is mentioned by
+    no role.
+    """
+    if applied is None:
+        return None
+    delta = config_delta(applied, current)
+    if delta.empty or delta.other_keys:
+        return None
+
+    index = RoleReferenceIndex(Path(playbook).parent / "roles", playbook_roles(Path(playbook)))
+    reasons: Dict[str, List[str]] = {}
+    for item_id in sorted(delta.items):
+        words = {item_id}
+        if var_name is not None and item_id in delta.changed_values:
+            words.add(var_name(item_id))
+        roles = set().union(*(index.roles_for(word) for word in words))
+        if not roles:
+            return None
+        for role in roles:
+            reasons.setdefault(role, [])
+            if item_id not in reasons[role]:
+                reasons[role].append(item_id)
+    for word in extra_words or []:
+        for role in index.roles_for(word):
+            reasons.setdefault(role, []).append(word)
+
+    if not reasons:
+        return None
+    return DeltaPlan(sorted(reasons), reasons, delta)
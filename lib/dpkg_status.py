@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Reader for the dpkg status database
+Parses /var/lib/dpkg/status directly instead of spawning dpkg-query
+"""
+
+import mmap
+import re
+from typing import Dict, Iterator, Optional
+
+DPKG_STATUS_FILE = "/var/lib/dpkg/status"
+
+# Only these fields are decoded; continuation lines and other fields are skipped
+_FIELD_NAMES = {
+    b"Package": "package",
+    b"Status": "status",
+    b"Version": "version",
+    b"Installed-Size": "installed_size",
+    b"Architecture": "architecture",
+    b"Multi-Arch": "multi_arch",
+}
+_FIELD_RE = re.compile(rb"^(Package|Status|Version|Installed-Size|Architecture|Multi-Arch):[ \t]*(.*?)[ \t\r]*$", re.M)
+
+
+def _parse_stanza(stanza: bytes) -> Dict[str, str]:
+    """Decode the wanted fields of one stanza"""
+    return {_FIELD_NAMES[key]: value.decode("utf-8", "replace") for key, value in _FIELD_RE.findall(stanza)}
+
+
+def iter_status_stanzas(path: str = DPKG_STATUS_FILE) -> Iterator[Dict[str, str]]:
+    """Yield the wanted fields of each stanza in a dpkg status file
+
+    The file is memory-mapped and split on blank lines, so only one stanza is
+    decoded at a time. Raises OSError if the file can't be read.
+    """
+    with open(path, "rb") as f:
+        try:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files can't be mapped
+            return
+
+        with data:
+            pos = 0
+            end = len(data)
+            while pos < end:
+                split = data.find(b"\n\n", pos)
+                if split == -1:
+                    split = end
+                stanza = data[pos:split]
+                pos = split + 2
+
+                # Runs of blank lines between stanzas leave empty slices
+                if stanza.strip():
+                    fields = _parse_stanza(stanza)
+                    if fields.get("package"):
+                        yield fields
+
+
+def read_installed_packages(path: str = DPKG_STATUS_FILE) -> Dict[str, Dict[str, str]]:
+    """Installed packages from a dpkg status file
+
+    Package names follow dpkg-query's ${binary:Package}: Multi-Arch: same
+    packages and packages of a foreign architecture carry an :arch suffix.
+
+    Returns:
+        Dict mapping package name to version, status and installed-size
+    """
+    installed = []
+    native_arch: Optional[str] = None
+
+    for fields in iter_status_stanzas(path):
+        if fields["package"] == "dpkg":
+            native_arch = fields.get("architecture")
+
+        if "install ok installed" not in fields.get("status", ""):
+            continue
+        installed.append(fields)
+
+    packages = {}
+    for fields in installed:
+        name = fields["package"]
+        arch = fields.get("architecture", "")
+        if arch and arch != "all" and (fields.get("multi_arch") == "same" or (native_arch and arch != native_arch)):
+            name = f"{name}:{arch}"
+
+        packages[name] = {
+            "version": fields.get("version", ""),
+            "status": "installed",
+            "size": fields.get("installed_size", ""),
+        }
+
+    return packages
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+Fleet applies
+Applies one configuration to every host of an inventory in a single
+ansible-playbook run with real forks, following each host's progress on the
+ubootu_events stream and summarizing every host's result at the end
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, TextIO, Tuple
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+CALLBACK_DIR = REPO_ROOT / "callback_plugins"
+EVENT_CALLBACK_NAME = "ubootu_events"
+
+# Hosts configured at the same time
+DEFAULT_FORKS = 10
+
+# Header of a play's host list in --list-hosts output, e.g. "    hosts (2):"
+_LIST_HOSTS_RE = re.compile(r"^\s+hosts \(\d+\):\s*$")
+
+# Password prompts left out of the --list-hosts run
+_PROMPT_FLAGS = {"-k", "--ask-pass", "-K", "--ask-become-pass"}
+
+# Result statuses counted per host, as named in ubootu_events and in the play recap
+STATUSES = ("ok", "changed", "failed", "skipped", "unreachable", "ignored")
+
+
+@dataclass
+class HostProgress:
+    """Task results and failures of one host"""
+
+    name: str
+    ok: int = 0
+    changed: int = 0
+    failed: int = 0
+    skipped: int = 0
+    unreachable: int = 0
+    ignored: int = 0
+    task: str = ""
+    failures: List[str] = field(default_factory=list)
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    done: bool = False
+
+    @property
+    def status(self) -> str:
+        if self.unreachable:
+            return "unreachable"
+        if self.failed:
+            return "failed"
+        if not self.done:
+            return "running" if self.started is not None else "not run"
+        return "changed" if self.changed else "ok"
+
+    @property
+    def duration(self) -> float:
+        if self.started is None or self.finished is None:
+            return 0.0
+        return self.finished - self.started
+
+
+def format_duration(seconds: float) -> str:
+    """Compact duration like 4m 05s"""
+    seconds = int(round(seconds))
+    if seconds >= 3600:
+        return f"{seconds // 3600}h {seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m {seconds % 60:02d}s"
+    return f"{seconds}s"
+
+
+class FleetProgress:
+    """Per-host progress built from ubootu_events events"""
+
+    def __init__(self, hosts: Optional[List[str]] = None):
+        self.hosts: Dict[str, HostProgress] = {name: HostProgress(name) for name in hosts or []}
+        self.task = ""
+        self.finished = False
+
+    def host(self, name: str) -> HostProgress:
+        if name not in self.hosts:
+            self.hosts[name] = HostProgress(name)
+        return self.hosts[name]
+
+    def handle(self, event: Dict[str, Any]) -> List[str]:
+        """Take in one event; returns the lines worth printing about it"""
+        kind = event.get("event")
+        if kind == "task_start":
+            self.task = event.get("task") or self.task
+            return [self.status_line()]
+
+        if kind == "result" and event.get("host"):
+            host = self.host(event["host"])
+            now = event.get("time") or time.time()
+            if host.started is None:
+                host.started = now
+            host.finished = now
+            host.task = event.get("task") or host.task
+
+            status = event.get("status")
+            if status == "failed" and event.get("ignore_errors"):
+                status = "ignored"
+            if status in STATUSES:
+                setattr(host, status, getattr(host, status) + 1)
+            if status == "changed":
+                # As in the play recap, changed results count as ok too
+                host.ok += 1
+            if status in ("failed", "unreachable"):
+                failure = f"{host.task}: {event.get('msg') or status}"
+                host.failures.append(failure)
+                return [f"{host.name}: {status.upper()} {failure}"]
+            return []
+
+        if kind == "stats":
+            # The play recap is authoritative for the totals
+            for name, summary in (event.get("hosts") or {}).items():
+                host = self.host(name)
+                host.ok = summary.get("ok", host.ok)
+                host.changed = summary.get("changed", host.changed)
+                host.failed = summary.get("failures", host.failed)
+                host.skipped = summary.get("skipped", host.skipped)
+                host.unreachable = summary.get("unreachable", host.unreachable)
+                host.ignored = summary.get("ignored", host.ignored)
+                host.done = True
+            self.finished = True
+        return []
+
+    def counts(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for host in self.hosts.values():
+            counts[host.status] = counts.get(host.status, 0) + 1
+        return counts
+
+    def status_line(self) -> str:
+        counts = self.counts()
+        active = len(self.hosts) - counts.get("failed", 0) - counts.get("unreachable", 0)
+        line = f"[{time.strftime('%H:%M:%S')}] {self.task} ({active}/{len(self.hosts)} hosts"
+        for status in ("failed", "unreachable"):
+            if counts.get(status):
+                line += f", {counts[status]} {status}"
+        return line + ")"
+
+    def summary_lines(self) -> List[str]:
+        """Per-host result table, with each failure under its host"""
+        width = max([len("HOST")] + [len(name) for name in self.hosts])
+        lines = [
+            f"{'HOST':<{width}}  {'STATUS':<11}  {'OK':>5}  {'CHANGED':>7}  {'FAILED':>6}  {'SKIPPED':>7}  TIME",
+        ]
+        for host in sorted(self.hosts.values(), key=lambda host: host.name):
+            lines.append(
+                f"{host.name:<{width}}  {host.status:<11}  {host.ok:>5}  {host.changed:>7}  {host.failed:>6}  "
+                f"{host.skipped:>7}  {format_duration(host.duration)}"
+            )
+            lines.extend(f"  - {failure}" for failure in host.failures)
+
+        counts = self.counts()
+        totals = ", ".join(f"{counts[status]} {status}" for status in sorted(counts))
+        lines.append(f"{len(self.hosts)} hosts: {totals}" if self.hosts else "No hosts were run")
+        return lines
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: dict(asdict(host), status=host.status) for name, host in sorted(self.hosts.items())}
+
+
+def fleet_command(
+    inventory: str,
+    config: str,
+    forks: int = DEFAULT_FORKS,
+    limit: Optional[str] = None,
+    check: bool = False,
+    extra_args: Optional[List[str]] = None,
+) -> List[str]:
+    """ansible-playbook command applying config to the inventory's hosts
+
+    Unlike a local apply there is no forced local connection or single fork;
+    each host connects the way the inventory says. The hosts share one
+    ansible-playbook process, so the role scheduler and its package-manager
+    lock, which only serve local applies, are not used.
+    """
+    command = [
+        "ansible-playbook",
+        "site.yml",
+        "-i",
+        str(inventory),
+        "--forks",
+        str(forks),
+        "--extra-vars",
+        f"@{config}",
+        "--become-method",
+        "sudo",
+    ]
+    if limit:
+        command.extend(["--limit", limit])
+    if check:
+        command.append("--check")
+    return command + list(extra_args or [])
+
+
+def parse_list_hosts(output: str) -> List[str]:
+    """Host names from `ansible-playbook --list-hosts` output"""
+    hosts: List[str] = []
+    listing = False
+    for line in output.splitlines():
+        if _LIST_HOSTS_RE.match(line):
+            listing = True
+        elif listing and line.strip() and line.startswith("      "):
+            hosts.append(line.strip())
+        else:
+            listing = False
+    return list(dict.fromkeys(hosts))
+
+
+def inventory_hosts(command: List[str]) -> List[str]:
+    """Hosts a fleet command will run on, or [] if ansible can't say"""
+    command = [arg for arg in command if arg not in _PROMPT_FLAGS]
+    try:
+        result = subprocess.run(command + ["--list-hosts"], cwd=str(REPO_ROOT), capture_output=True, text=True)
+    except OSError:
+        return []
+    return parse_list_hosts(result.stdout) if result.returncode == 0 else []
+
+
+def event_environment(write_fd: int) -> Dict[str, str]:
+    """Environment sending ubootu_events to write_fd"""
+    env = os.environ.copy()
+    plugin_paths = [str(CALLBACK_DIR)]
+    if env.get("ANSIBLE_CALLBACK_PLUGINS"):
+        plugin_paths.append(env["ANSIBLE_CALLBACK_PLUGINS"])
+    env["ANSIBLE_CALLBACK_PLUGINS"] = os.pathsep.join(plugin_paths)
+    env["ANSIBLE_STDOUT_CALLBACK"] = EVENT_CALLBACK_NAME
+    env["UBOOTU_EVENT_FD"] = str(write_fd)
+    return env
+
+
+def run_fleet(
+    command: List[str], hosts: Optional[List[str]] = None, output: TextIO = sys.stdout
+) -> Tuple[int, FleetProgress]:
+    """Run a fleet command, printing progress as hosts report; returns its exit code and progress"""
+    progress = FleetProgress(hosts)
+    read_fd, write_fd = os.pipe()
+    try:
+        # stdin stays attached so --ask-become-pass and --ask-pass can prompt
+        process = subprocess.Popen(command, cwd=str(REPO_ROOT), env=event_environment(write_fd), pass_fds=(write_fd,))
+    except OSError:
+        os.close(read_fd)
+        raise
+    finally:
+        # Only ansible-playbook holds the write end now, so reading ends when it exits
+        os.close(write_fd)
+
+    with os.fdopen(read_fd, "r", encoding="utf-8", errors="replace") as events:
+        for line in events:
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(event, dict):
+                for message in progress.handle(event):
+                    output.write(message + "\n")
+                    output.flush()
+    return process.wait(), progress
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Apply one configuration to every host of an inventory")
+    parser.add_argument(
+        "-i", "--inventory", required=True, help="inventory file or directory, e.g. inventories/production"
+    )
+    parser.add_argument("-c", "--config", default="config.yml", help="configuration to apply (default: config.yml)")
+    parser.add_argument("-f", "--forks", type=int, default=DEFAULT_FORKS, help="hosts configured at the same time")
+    parser.add_argument("-l", "--limit", help="only run on hosts matching this pattern")
+    parser.add_argument("--check", action="store_true", help="report what would change without changing it")
+    parser.add_argument("--summary-file", type=Path, help="also write the per-host results here as JSON")
+    parser.add_argument("ansible_args", nargs=argparse.REMAINDER, help="extra ansible-playbook arguments, after --")
+    args = parser.parse_args(argv)
+
+    config = Path(args.config).resolve()
+    if not config.is_file():
+        parser.error(f"{args.config} does not exist")
+    ansible_args = args.ansible_args[1:] if args.ansible_args[:1] == ["--"] else args.ansible_args
+    command = fleet_command(
+        str(Path(args.inventory).resolve()), str(config), args.forks, args.limit, args.check, ansible_args
+    )
+
+    hosts = inventory_hosts(command)
+    print(f"Applying {args.config} to {len(hosts) or 'the'} hosts in {args.inventory}, {args.forks} at a time")
+    try:
+        returncode, progress = run_fleet(command, hosts)
+    except OSError as e:
+        sys.stderr.write(f"Error: could not run ansible-playbook: {e}\n")
+        return 1
+
+    print()
+    print("\n".join(progress.summary_lines()))
+    if args.summary_file:
+        with open(args.summary_file, "w") as f:
+            json.dump({"returncode": returncode, "hosts": progress.to_dict()}, f, indent=2)
+    return returncode
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+GitHub release resolution for binary tool installs
+Looks up the latest release of GitHub repositories through an on-disk cache
+that is revalidated with ETags, resolving many repositories concurrently
+"""
+
+import json
+import os
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+GITHUB_API_URL = "https://api.github.com"
+
+# Seconds a cached release is used without asking GitHub; after that it is revalidated
+RELEASE_CACHE_TTL = 3600
+
+# Concurrent requests in a batch
+DEFAULT_WORKERS = 8
+
+REQUEST_TIMEOUT = 15
+
+# The parts of a release the roles use; the rest of the API response isn't cached
+RELEASE_FIELDS = ("tag_name", "name", "html_url", "published_at", "prerelease")
+ASSET_FIELDS = ("name", "browser_download_url", "size", "content_type")
+
+
+def get_release_cache_dir() -> Path:
+    """Directory cached release metadata is kept in, shared by every apply on this machine"""
+    if os.environ.get("UBOOTU_RELEASE_CACHE_DIR"):
+        # Set while exporting an offline bundle
+        return Path(os.environ["UBOOTU_RELEASE_CACHE_DIR"])
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return Path(base) / "ubootu" / "github-releases"
+
+
+def slim_release(release: Dict[str, Any]) -> Dict[str, Any]:
+    """A release reduced to the fields the roles read"""
+    slim = {key: release.get(key) for key in RELEASE_FIELDS}
+    slim["assets"] = [{key: asset.get(key) for key in ASSET_FIELDS} for asset in release.get("assets") or []]
+    return slim
+
+
+class ReleaseCache:
+    """One JSON file per repository holding its latest release, ETag and when it was last checked"""
+
+    def __init__(self, cache_dir: Optional[Path] = None, ttl: int = RELEASE_CACHE_TTL):
+        self.cache_dir = Path(cache_dir) if cache_dir else get_release_cache_dir()
+        self.ttl = ttl
+
+    def path(self, repo: str) -> Path:
+        return self.cache_dir / (repo.replace("/", "__") + ".json")
+
+    def load(self, repo: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.path(repo), "r") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(entry, dict) or not isinstance(entry.get("release"), dict):
+            return None
+        return entry
+
+    def is_fresh(self, entry: Dict[str, Any]) -> bool:
+        checked = entry.get("checked")
+        return isinstance(checked, (int, float)) and time.time() - checked <= self.ttl
+
+    def store(self, repo: str, release: Dict[str, Any], etag: Optional[str]) -> Dict[str, Any]:
+        """Save a release; concurrent applies never see a half-written file"""
+        entry = {"repo": repo, "checked": time.time(), "etag": etag, "release": release}
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=".tmp-")
+            with os.fdopen(fd, "w") as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, self.path(repo))
+        except OSError:
+            # An unwritable cache only costs the next apply a request
+            pass
+        return entry
+
+
+class ReleaseResolver:
+    """Resolves repositories' latest releases, asking GitHub only when the cache is stale
+
+    Results have the shape of a registered ``uri`` result (``json``,
+    ``failed``, ``status``, ``msg``) plus ``repo`` and ``cached``, so tasks
+    that read ``<var>.json.assets`` keep working. An ``offline`` resolver
+    answers from the cache alone, however old the entries are.
+    """
+
+    def __init__(
+        self,
+        cache: Optional[ReleaseCache] = None,
+        api_url: str = GITHUB_API_URL,
+        token: Optional[str] = None,
+        timeout: int = REQUEST_TIMEOUT,
+        max_workers: int = DEFAULT_WORKERS,
+        offline: bool = False,
+    ):
+        self.cache = cache or ReleaseCache()
+        self.api_url = api_url.rstrip("/")
+        self.token = token if token is not None else os.environ.get("GITHUB_TOKEN")
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self.offline = offline
+
+    def _request(self, repo: str, etag: Optional[str]) -> urllib.request.Request:
+        request = urllib.request.Request(f"{self.api_url}/repos/{repo}/releases/latest")
+        request.add_header("Accept", "application/vnd.github+json")
+        request.add_header("User-Agent", "ubootu")
+        if etag:
+            request.add_header("If-None-Match", etag)
+        if self.token:
+            request.add_header("Authorization", f"Bearer {self.token}")
+        return request
+
+    @staticmethod
+    def _result(repo: str, entry: Dict[str, Any], status: int, cached: bool) -> Dict[str, Any]:
+        return {"repo": repo, "failed": False, "status": status, "cached": cached, "json": entry["release"]}
+
+    def resolve(self, repo: str) -> Dict[str, Any]:
+        """Latest release of one repository ("owner/name")"""
+        entry = self.cache.load(repo)
+        if entry is not None and (self.offline or self.cache.is_fresh(entry)):
+            return self._result(repo, entry, 200, True)
+        if self.offline:
+            return {
+                "repo": repo,
+                "failed": True,
+                "status": -1,
+                "cached": False,
+                "json": {},
+                "msg": "not in the release cache",
+            }
+
+        try:
+            with urllib.request.urlopen(self._request(repo, entry and entry.get("etag")), timeout=self.timeout) as r:
+                release = slim_release(json.load(r))
+                entry = self.cache.store(repo, release, r.headers.get("ETag"))
+                return self._result(repo, entry, r.status, False)
+        except urllib.error.HTTPError as e:
+            if e.code == 304 and entry is not None:
+                # Unchanged; conditional requests don't count against the rate limit
+                entry = self.cache.store(repo, entry["release"], e.headers.get("ETag") or entry.get("etag"))
+                return self._result(repo, entry, 304, True)
+            error = f"HTTP Error {e.code}: {e.reason}"
+        except (urllib.error.URLError, OSError, ValueError) as e:
+            error = str(e)
+
+        if entry is not None:
+            # Rate limited or offline: an old answer beats failing the install
+            return dict(self._result(repo, entry, 200, True), stale=True, msg=error)
+        return {"repo": repo, "failed": True, "status": -1, "cached": False, "json": {}, "msg": error}
+
+    def resolve_all(self, repos: Iterable[str]) -> List[Dict[str, Any]]:
+        """Latest releases of many repositories in one concurrent pass, in the order given"""
+        repos = list(repos)
+        unique = list(dict.fromkeys(repos))
+        if len(unique) <= 1:
+            results = {repo: self.resolve(repo) for repo in unique}
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(unique))) as pool:
+                results = dict(zip(unique, pool.map(self.resolve, unique)))
+        return [results[repo] for repo in repos]
@@ -0,0 +1,532 @@
+#!/usr/bin/env python3
+"""
+Offline apply bundles
+Records what applying a configuration installs and downloads, and fetches all
+of it into one portable directory: a local apt repository with every package
+and its dependencies, the downloaded artifacts, GitHub release metadata, snaps
+and Ansible collections. Applying with ubootu_bundle_dir set to that directory
+needs no network for anything the manifest doesn't list as unbundled or missing.
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from email.utils import formatdate
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from .apt_batch import package_name
+from .artifact_cache import ArtifactCache, ChecksumMismatch
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+CALLBACK_DIR = REPO_ROOT / "callback_plugins"
+RECORDER_CALLBACK_NAME = "ubootu_bundle_recorder"
+
+BUNDLE_FORMAT = 1
+MANIFEST_NAME = "bundle.json"
+
+# Layout of a bundle directory
+APT_DIR = "apt"
+ARTIFACTS_DIR = "artifacts"
+RELEASES_DIR = "github-releases"
+SNAPS_DIR = "snaps"
+COLLECTIONS_DIR = "collections"
+
+# What setup.sh installs before Ansible runs; the bundle has to carry these too
+PREREQUISITE_PACKAGES = [
+    "python3",
+    "python3-pip",
+    "python3-venv",
+    "python3-yaml",
+    "python3-rich",
+    "python3-git",
+    "python3-full",
+    "software-properties-common",
+    "ansible",
+]
+
+# Playbooks an apply runs, in order
+PLAYBOOKS = ("bootstrap.yml", "site.yml")
+
+# While a bundle is active apt reads only its repository; these override /etc/apt/sources.list*
+APT_ETC_DIR = Path("/etc/apt")
+APT_CONF_NAME = "99ubootu-bundle"
+APT_SOURCES_NAME = "ubootu-bundle"
+
+APT_DEPENDS_ARGV = [
+    "apt-cache",
+    "depends",
+    "--recurse",
+    "--no-recommends",
+    "--no-suggests",
+    "--no-conflicts",
+    "--no-breaks",
+    "--no-replaces",
+    "--no-enhances",
+]
+
+ABSENT_STATES = {"absent", "removed"}
+_URL_RE = re.compile(r"https?://[^\s'\"|;&()<>]+")
+_TRUE_STRINGS = {"true", "yes", "on", "1", "y"}
+
+
+class BundleError(Exception):
+    """A bundle could not be built or used"""
+
+
+def _as_list(value) -> List[str]:
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple)):
+        return [str(item) for item in value if item]
+    return [item.strip() for item in str(value).split(",") if item.strip()]
+
+
+def _truthy(value) -> bool:
+    return value is True or str(value).strip().lower() in _TRUE_STRINGS
+
+
+@dataclass
+class BundleRecord:
+    """Everything the recorded run installed or downloaded"""
+
+    apt: Set[str] = field(default_factory=set)
+    downloads: Dict[str, Optional[str]] = field(default_factory=dict)
+    snaps: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    flatpaks: Set[str] = field(default_factory=set)
+    # URLs fetched by shell and command tasks (install scripts, curl | gpg), by task name
+    commands: Dict[str, List[str]] = field(default_factory=dict)
+
+    def add(self, entry: Dict[str, Any]) -> None:
+        """Take in one line written by the ubootu_bundle_recorder callback"""
+        module = entry.get("module")
+        args = entry.get("args") or {}
+        if str(args.get("state", "present")) in ABSENT_STATES:
+            return
+
+        if module in ("apt", "apt_batch", "package"):
+            # Local .deb files were downloaded by an earlier task, which is recorded itself
+            self.apt.update(package_name(name) for name in _as_list(args.get("name") or args.get("pkg")))
+        elif module in ("cached_get_url", "get_url"):
+            url = entry.get("url") or args.get("url")
+            if url:
+                self.downloads.setdefault(str(url), args.get("checksum") or None)
+        elif module == "snap":
+            for name in _as_list(args.get("name")):
+                self.snaps[name] = {"classic": _truthy(args.get("classic")), "channel": args.get("channel") or "stable"}
+        elif module == "flatpak":
+            self.flatpaks.update(_as_list(args.get("name")))
+        elif module in ("shell", "command"):
+            command = args.get("_raw_params") or args.get("cmd") or " ".join(_as_list(args.get("argv")))
+            urls = sorted(set(_URL_RE.findall(str(command))))
+            if urls:
+                self.commands[str(entry.get("task") or command)] = urls
+
+
+def read_record(path: Path) -> BundleRecord:
+    """Parse a file written by the ubootu_bundle_recorder callback"""
+    record = BundleRecord()
+    try:
+        with open(path, "r") as f:
+            lines = f.readlines()
+    except FileNotFoundError:
+        return record
+    for line in lines:
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(entry, dict):
+            record.add(entry)
+    return record
+
+
+def _run_batch(argv: List[str], names: List[str], cwd: Optional[Path] = None) -> Tuple[List[str], List[str]]:
+    """Run `argv + names` once, or name by name if that fails
+
+    Returns the outputs of the runs that succeeded and the names that failed.
+    """
+    try:
+        result = subprocess.run(argv + names, cwd=cwd, capture_output=True, text=True)
+    except FileNotFoundError:
+        raise BundleError(f"{argv[0]} is not installed")
+    if result.returncode == 0:
+        return [result.stdout], []
+
+    outputs, failed = [], []
+    for name in names:
+        single = subprocess.run(argv + [name], cwd=cwd, capture_output=True, text=True)
+        if single.returncode == 0:
+            outputs.append(single.stdout)
+        else:
+            failed.append(name)
+    return outputs, failed
+
+
+def parse_depends(output: str) -> List[str]:
+    """Packages named by `apt-cache depends --recurse` output, without virtual packages"""
+    names = []
+    for line in output.splitlines():
+        # Dependencies are indented; every package is also listed unindented once
+        if line and not line[0].isspace() and not line.startswith("<"):
+            names.append(line.strip())
+    return list(dict.fromkeys(names))
+
+
+def apt_closure(packages: Iterable[str]) -> Tuple[List[str], List[str]]:
+    """Packages plus everything they depend on, and the packages apt doesn't know"""
+    packages = sorted(set(packages))
+    if not packages:
+        return [], []
+    outputs, _ = _run_batch(APT_DEPENDS_ARGV, packages)
+    closure = parse_depends("\n".join(outputs))
+    # apt-cache only warns about packages it doesn't know (or that are purely virtual)
+    missing = [name for name in packages if name not in closure]
+    return closure, missing
+
+
+def download_apt_packages(packages: List[str], directory: Path) -> List[str]:
+    """Download .deb files for packages into directory; returns those that could not be downloaded"""
+    directory.mkdir(parents=True, exist_ok=True)
+    if not packages:
+        return []
+    _, failed = _run_batch(["apt-get", "download", "-q"], packages, cwd=directory)
+    return failed
+
+
+def _file_hashes(path: Path) -> Tuple[str, str]:
+    md5, sha256 = hashlib.md5(), hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            md5.update(chunk)
+            sha256.update(chunk)
+    return md5.hexdigest(), sha256.hexdigest()
+
+
+def write_apt_index(directory: Path) -> int:
+    """Write Packages, Packages.gz and Release for the .deb files in directory, a flat repository
+
+    Returns the number of packages indexed.
+    """
+    stanzas = []
+    for deb in sorted(directory.glob("*.deb")):
+        try:
+            control = subprocess.run(
+                ["dpkg-deb", "-f", str(deb)], capture_output=True, text=True, check=True
+            ).stdout.rstrip("\n")
+        except FileNotFoundError:
+            raise BundleError("dpkg-deb is not installed")
+        except subprocess.CalledProcessError as e:
+            sys.stderr.write(f"[DEBUG] Skipping unreadable package {deb.name}: {e.stderr.strip()}\n")
+            continue
+        md5, sha256 = _file_hashes(deb)
+        stanzas.append(
+            f"{control}\nFilename: ./{deb.name}\nSize: {deb.stat().st_size}\nMD5sum: {md5}\nSHA256: {sha256}\n"
+        )
+
+    index = "\n".join(stanzas)
+    (directory / "Packages").write_text(index)
+    with gzip.open(directory / "Packages.gz", "wt") as f:
+        f.write(index)
+
+    release = [f"Date: {formatdate(usegmt=True)}", "SHA256:"]
+    for name in ("Packages", "Packages.gz"):
+        path = directory / name
+        release.append(f" {_file_hashes(path)[1]} {path.stat().st_size} {name}")
+    (directory / "Release").write_text("\n".join(release) + "\n")
+    return len(stanzas)
+
+
+def download_artifacts(downloads: Dict[str, Optional[str]], cache: ArtifactCache) -> List[str]:
+    """Fetch every recorded download into the bundle's artifact cache; returns the URLs that failed"""
+    failed = []
+    for url, checksum in sorted(downloads.items()):
+        try:
+            cache.fetch(url, checksum)
+        except ChecksumMismatch as e:
+            sys.stderr.write(f"[DEBUG] Not bundling {url}: {e}\n")
+            failed.append(url)
+        except ValueError:
+            # A checksum the cache can't verify (a checksums file); keep the file by URL
+            try:
+                cache.fetch(url)
+            except Exception as e:
+                sys.stderr.write(f"[DEBUG] Could not bundle {url}: {e}\n")
+                failed.append(url)
+        except Exception as e:
+            sys.stderr.write(f"[DEBUG] Could not bundle {url}: {e}\n")
+            failed.append(url)
+    return failed
+
+
+def download_snaps(snaps: Dict[str, Dict[str, Any]], directory: Path) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """Download snaps with their assertions; returns the bundled snaps and the names that failed"""
+    directory.mkdir(parents=True, exist_ok=True)
+    bundled, failed = [], []
+    for name, options in sorted(snaps.items()):
+        argv = ["snap", "download", f"--target-directory={directory}", f"--channel={options['channel']}", name]
+        try:
+            result = subprocess.run(argv, capture_output=True, text=True)
+        except FileNotFoundError:
+            raise BundleError("snap is not installed")
+        files = sorted(directory.glob(f"{name}_*.snap"), key=lambda path: path.stat().st_mtime)
+        if result.returncode != 0 or not files:
+            failed.append(name)
+            continue
+        snap = files[-1]
+        bundled.append(
+            {"name": name, "classic": options["classic"], "snap": snap.name, "assert": snap.with_suffix(".assert").name}
+        )
+    return bundled, failed
+
+
+def download_collections(directory: Path) -> bool:
+    """Download the Ansible collections in requirements.yml into directory"""
+    try:
+        result = subprocess.run(
+            [
+                "ansible-galaxy",
+                "collection",
+                "download",
+                "-r",
+                str(REPO_ROOT / "requirements.yml"),
+                "-p",
+                str(directory),
+            ],
+            capture_output=True,
+            text=True,
+        )
+    except FileNotFoundError:
+        return False
+    return result.returncode == 0
+
+
+def record_environment(record_path: Path, bundle_dir: Path) -> Dict[str, str]:
+    """Environment for ansible-playbook runs recorded for a bundle"""
+    env = os.environ.copy()
+    env["UBOOTU_BUNDLE_RECORD"] = str(record_path)
+    # Releases the run looks up are cached straight into the bundle
+    env["UBOOTU_RELEASE_CACHE_DIR"] = str(bundle_dir / RELEASES_DIR)
+
+    plugin_paths = [str(CALLBACK_DIR)]
+    if env.get("ANSIBLE_CALLBACK_PLUGINS"):
+        plugin_paths.append(env["ANSIBLE_CALLBACK_PLUGINS"])
+    env["ANSIBLE_CALLBACK_PLUGINS"] = os.pathsep.join(plugin_paths)
+    for key in ("ANSIBLE_CALLBACKS_ENABLED", "ANSIBLE_CALLBACK_WHITELIST"):
+        enabled = [name for name in env.get(key, "").split(",") if name]
+        env[key] = ",".join(enabled + [RECORDER_CALLBACK_NAME])
+    return env
+
+
+def record_commands(config: Path, bundle_dir: Path, apply: bool, ansible_args: List[str]) -> List[List[str]]:
+    """ansible-playbook commands whose runs are recorded"""
+    commands = []
+    for playbook in PLAYBOOKS:
+        command = ["ansible-playbook", playbook, "--extra-vars", f"@{config}"]
+        # A real apply downloads into the bundle as it goes; a check run leaves that to export_bundle
+        command += ["--extra-vars", f"ubootu_artifact_cache_dir={bundle_dir / ARTIFACTS_DIR}"]
+        if not apply:
+            command.append("--check")
+        commands.append(command + list(ansible_args))
+    return commands
+
+
+def record_run(config: Path, bundle_dir: Path, apply: bool = False, ansible_args: Optional[List[str]] = None):
+    """Run the playbooks for config, recording what they install and download
+
+    Without `apply` the playbooks run in check mode, which stops at the first
+    task that depends on an earlier one having really run; applying on a
+    reference machine records everything.
+
+    Returns the record and whether every playbook ran to the end.
+    """
+    fd, record_path = tempfile.mkstemp(prefix="ubootu-bundle-", suffix=".jsonl")
+    os.close(fd)
+    env = record_environment(Path(record_path), bundle_dir)
+    finished = True
+    try:
+        for command in record_commands(config, bundle_dir, apply, ansible_args or []):
+            try:
+                if subprocess.run(command, cwd=str(REPO_ROOT), env=env).returncode != 0:
+                    finished = False
+            except FileNotFoundError:
+                raise BundleError("ansible-playbook is not installed")
+        return read_record(Path(record_path)), finished
+    finally:
+        os.unlink(record_path)
+
+
+def write_manifest(bundle_dir: Path, manifest: Dict[str, Any]) -> None:
+    fd, tmp_path = tempfile.mkstemp(dir=bundle_dir, prefix=".tmp-")
+    with os.fdopen(fd, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, bundle_dir / MANIFEST_NAME)
+
+
+def load_manifest(bundle_dir: Path) -> Dict[str, Any]:
+    try:
+        with open(Path(bundle_dir) / MANIFEST_NAME, "r") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        raise BundleError(f"{bundle_dir} is not a Ubootu bundle: {e}")
+    if manifest.get("format") != BUNDLE_FORMAT:
+        raise BundleError(f"{bundle_dir} has bundle format {manifest.get('format')}, expected {BUNDLE_FORMAT}")
+    return manifest
+
+
+def build_bundle(
+    record: BundleRecord, bundle_dir: Path, config: Optional[Path] = None, run_finished: bool = True
+) -> Dict[str, Any]:
+    """Download everything in record into bundle_dir and write its manifest
+
+    `run_finished` is False when the recorded run stopped early, so the
+    bundle may lack what the rest of the run would have needed. The manifest
+    is only `complete` if the run finished and nothing it needs was left out
+    of the bundle: no missing packages or downloads, no flatpaks, and no
+    shell or command tasks fetching URLs.
+    """
+    bundle_dir.mkdir(parents=True, exist_ok=True)
+    if config is not None and config.resolve() != (bundle_dir / "config.yml").resolve():
+        shutil.copyfile(config, bundle_dir / "config.yml")
+
+    apt_dir = bundle_dir / APT_DIR
+    closure, unknown = apt_closure(record.apt | set(PREREQUISITE_PACKAGES))
+    missing_apt = unknown + download_apt_packages(closure, apt_dir)
+    indexed = write_apt_index(apt_dir)
+
+    # Bundles are copied whole, so nothing is ever evicted from their artifact cache
+    cache = ArtifactCache(bundle_dir / ARTIFACTS_DIR, max_size=sys.maxsize)
+    missing_downloads = download_artifacts(record.downloads, cache)
+
+    snaps, missing_snaps = download_snaps(record.snaps, bundle_dir / SNAPS_DIR) if record.snaps else ([], [])
+    collections = download_collections(bundle_dir / COLLECTIONS_DIR)
+
+    releases_dir = bundle_dir / RELEASES_DIR
+    missing = {"apt": sorted(missing_apt), "downloads": missing_downloads, "snaps": missing_snaps}
+    # Flatpaks can't be exported without installing them, so they still need Flathub; install
+    # scripts fetch more than the URL they start from, so caching that URL wouldn't help either
+    unbundled = {"flatpaks": sorted(record.flatpaks), "commands": dict(sorted(record.commands.items()))}
+    manifest = {
+        "format": BUNDLE_FORMAT,
+        "created": time.time(),
+        "complete": run_finished and not any(missing.values()) and not any(unbundled.values()),
+        "run_finished": run_finished,
+        "apt_packages": indexed,
+        "downloads": sorted(record.downloads),
+        "github_releases": sorted(path.stem.replace("__", "/") for path in releases_dir.glob("*.json")),
+        "snaps": snaps,
+        "collections": collections,
+        "unbundled": unbundled,
+        "missing": missing,
+    }
+    write_manifest(bundle_dir, manifest)
+    return manifest
+
+
+def export_bundle(
+    config: Path, bundle_dir: Path, apply: bool = False, ansible_args: Optional[List[str]] = None
+) -> Dict[str, Any]:
+    """Build an offline apply bundle for config in bundle_dir"""
+    bundle_dir = bundle_dir.resolve()
+    bundle_dir.mkdir(parents=True, exist_ok=True)
+    record, run_finished = record_run(config.resolve(), bundle_dir, apply, ansible_args)
+    return build_bundle(record, bundle_dir, config, run_finished)
+
+
+def apt_sources(bundle_dir: Path) -> str:
+    return f"deb [trusted=yes] file:{(Path(bundle_dir) / APT_DIR).resolve()} ./\n"
+
+
+def apt_config(sources_dir: Path) -> str:
+    return (
+        f'Dir::Etc::SourceList "{sources_dir}/sources.list";\nDir::Etc::SourceParts "{sources_dir}/sources.list.d";\n'
+    )
+
+
+def write_apt_config(bundle_dir: Path, apt_etc: Path = APT_ETC_DIR) -> None:
+    """Make apt read only the bundle's repository"""
+    sources_dir = apt_etc / APT_SOURCES_NAME
+    (sources_dir / "sources.list.d").mkdir(parents=True, exist_ok=True)
+    (sources_dir / "sources.list").write_text(apt_sources(bundle_dir))
+    # Repositories the roles add are ignored until deactivate; their packages come from the bundle
+    (apt_etc / "apt.conf.d").mkdir(parents=True, exist_ok=True)
+    (apt_etc / "apt.conf.d" / APT_CONF_NAME).write_text(apt_config(sources_dir))
+
+
+def activate(bundle_dir: Path) -> None:
+    """Point apt at the bundle's repository and install the bundle's snaps (needs root)"""
+    manifest = load_manifest(bundle_dir)
+    write_apt_config(bundle_dir)
+    subprocess.run(["apt-get", "update", "-q"], check=False)
+    snaps_dir = Path(bundle_dir) / SNAPS_DIR
+    for snap in manifest.get("snaps", []):
+        subprocess.run(["snap", "ack", str(snaps_dir / snap["assert"])], check=False)
+        install = ["snap", "install", str(snaps_dir / snap["snap"])]
+        subprocess.run(install + (["--classic"] if snap.get("classic") else []), check=False)
+
+
+def deactivate(apt_etc: Path = APT_ETC_DIR) -> None:
+    """Give apt its own sources back"""
+    try:
+        (apt_etc / "apt.conf.d" / APT_CONF_NAME).unlink()
+    except FileNotFoundError:
+        pass
+    shutil.rmtree(apt_etc / APT_SOURCES_NAME, ignore_errors=True)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Build and use offline apply bundles")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser("export", help="download everything a configuration needs into a bundle")
+    export.add_argument("config", type=Path)
+    export.add_argument("bundle", type=Path)
+    export.add_argument("--apply", action="store_true", help="apply for real while recording (complete bundle)")
+    export.add_argument("ansible_args", nargs=argparse.REMAINDER, help="extra ansible-playbook arguments, after --")
+    commands.add_parser("activate", help="use a bundle's apt repository and snaps (root)").add_argument(
+        "bundle", type=Path
+    )
+    commands.add_parser("deactivate", help="restore apt's own sources (root)")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "export":
+            ansible_args = args.ansible_args[1:] if args.ansible_args[:1] == ["--"] else args.ansible_args
+            manifest = export_bundle(args.config, args.bundle, args.apply, ansible_args)
+            print(
+                f"Bundled {manifest['apt_packages']} apt packages, {len(manifest['downloads'])} downloads, "
+                f"{len(manifest['github_releases'])} GitHub releases and {len(manifest['snaps'])} snaps"
+            )
+            for kind, names in manifest["missing"].items():
+                if names:
+                    print(f"Could not bundle {kind}: {', '.join(names)}")
+            if manifest["unbundled"]["flatpaks"]:
+                print(f"Flatpaks still need network: {', '.join(manifest['unbundled']['flatpaks'])}")
+            for task, urls in manifest["unbundled"]["commands"].items():
+                print(f"Still needs network: {task} ({', '.join(urls)})")
+            if not manifest["run_finished"]:
+                print(
+                    "The recorded run did not finish; run export with --apply on a reference machine for a full bundle"
+                )
+            if not manifest["complete"]:
+                print("The bundle is not complete: applying it offline will fail where network is still needed")
+        elif args.command == "activate":
+            activate(args.bundle)
+        else:
+            deactivate()
+    except (BundleError, OSError) as e:
+        sys.stderr.write(f"Error: {e}\n")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
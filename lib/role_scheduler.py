@@ -0,0 +1,553 @@
+#!/usr/bin/env python3
+"""
+Role-level execution planner for site.yml
+Builds a dependency graph from each role's meta/main.yml, plus the playbook
+order between roles that edit the same files or desktop settings, and runs
+roles that don't depend on each other as concurrent ansible-playbook processes
+"""
+
+import argparse
+import configparser
+import json
+import os
+import queue
+import re
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+import yaml
+
+# Roles running at the same time; package-manager tasks are serialized anyway
+DEFAULT_MAX_PARALLEL = 4
+
+# Callback that serializes package-manager tasks across the concurrent runs
+APT_LOCK_CALLBACK_NAME = "ubootu_apt_lock"
+CALLBACK_DIR = Path(__file__).resolve().parents[1] / "callback_plugins"
+
+# Extra var naming the roles that get their own run; meta dependencies on them are skipped
+SCHEDULED_ROLES_VAR = "ubootu_scheduled_roles"
+
+# Flags that only inspect the playbook; those commands run unchanged
+_INSPECT_FLAGS = {"--list-tasks", "--list-hosts", "--list-tags", "--syntax-check"}
+
+# Modules that rewrite a file in place; two roles doing so to one file must not overlap
+_IN_PLACE_EDIT_MODULES = {"lineinfile", "blockinfile", "replace", "ini_file", "copy", "template"}
+# Shell appends such as `echo ... >> ~/.bashrc`
+_SHELL_APPEND_RE = re.compile(r">>\s*[\"']?([^\s\"';|&)]+)")
+# The user's home however a task spells it, so ~/.bashrc matches across roles
+_HOME_PREFIX_RE = re.compile(r"^(?:~|\$HOME|\{\{\s*ansible_env\.HOME\s*\}\}|/home/\{\{[^}]*\}\})(?=/)")
+# dconf is one database per user; gsettings writes to it too
+_DESKTOP_SETTINGS_RE = re.compile(r"\b(?:dconf|gsettings)\b")
+
+_CONDITION_RE = re.compile(r"^(not\s+)?([A-Za-z_]\w*)(?:\s*\|\s*default\(\s*([^)]*?)\s*\))?$")
+_TRUE_STRINGS = {"true", "yes", "on", "1", "y"}
+
+
+def _truthy(value) -> bool:
+    if isinstance(value, str):
+        return value.strip().strip("'\"").lower() in _TRUE_STRINGS
+    return bool(value)
+
+
+def evaluate_condition(when, variables: Dict) -> Optional[bool]:
+    """Value of a simple role `when`, such as `enable_x | default(false)`
+
+    Lists are and-ed. Returns None for anything more complex than a
+    (negated) variable with an optional default.
+    """
+    if when is None:
+        return True
+    if isinstance(when, bool):
+        return when
+    if isinstance(when, list):
+        results = [evaluate_condition(condition, variables) for condition in when]
+        if False in results:
+            return False
+        return None if None in results else True
+
+    match = _CONDITION_RE.match(str(when).strip())
+    if not match:
+        return None
+    negate, name, default = match.groups()
+    if name in variables:
+        if isinstance(variables[name], str) and "{{" in variables[name]:
+            return None
+        value = _truthy(variables[name])
+    elif default is not None:
+        value = _truthy(default)
+    else:
+        return None
+    return not value if negate else value
+
+
+def role_name(entry) -> str:
+    """Role name of a play's or meta file's role entry"""
+    if isinstance(entry, dict):
+        return str(entry.get("role") or entry.get("name") or "")
+    return str(entry)
+
+
+def role_dependencies(roles_dir: Path, name: str) -> List[str]:
+    """Direct dependencies listed in a role's meta/main.yml"""
+    try:
+        with open(Path(roles_dir) / name / "meta" / "main.yml", "r") as f:
+            meta = yaml.safe_load(f)
+    except (OSError, yaml.YAMLError):
+        return []
+    dependencies = meta.get("dependencies") if isinstance(meta, dict) else None
+    return [role_name(entry) for entry in dependencies or [] if role_name(entry)]
+
+
+def _tasks(entries):
+    """Every task of a task list, including those inside blocks"""
+    for task in entries if isinstance(entries, list) else []:
+        if isinstance(task, dict):
+            yield task
+            for key in ("block", "rescue", "always"):
+                yield from _tasks(task.get(key))
+
+
+def _edited_files(task: Dict) -> List[str]:
+    """Files a task rewrites, with the home directory written as ~"""
+    targets: List[str] = []
+    for module, args in task.items():
+        short_name = str(module).rsplit(".", 1)[-1]
+        if short_name in _IN_PLACE_EDIT_MODULES and isinstance(args, dict):
+            target = args.get("path") or args.get("dest")
+            loop = task.get("loop", task.get("with_items"))
+            if isinstance(target, str) and re.fullmatch(r"\{\{\s*item\s*\}\}", target) and isinstance(loop, list):
+                targets.extend(str(item) for item in loop if isinstance(item, str))
+            elif target:
+                targets.append(str(target))
+        elif short_name in ("shell", "command"):
+            command = args.get("cmd") if isinstance(args, dict) else args
+            targets.extend(_SHELL_APPEND_RE.findall(str(command or "")))
+
+    files = [_HOME_PREFIX_RE.sub("~", target.strip()) for target in targets]
+    # Paths still templated after that can't be compared
+    return [path for path in files if path and "{{" not in path and "$" not in path]
+
+
+def role_shared_state(roles_dir: Path, name: str) -> Set[str]:
+    """Files a role's tasks edit, plus "dconf" if it changes desktop settings"""
+    state: Set[str] = set()
+    for path in sorted((Path(roles_dir) / name / "tasks").glob("*.y*ml")):
+        try:
+            text = path.read_text()
+            tasks = yaml.safe_load(text)
+        except (OSError, yaml.YAMLError):
+            continue
+        if _DESKTOP_SETTINGS_RE.search(text):
+            state.add("dconf")
+        for task in _tasks(tasks):
+            state.update(_edited_files(task))
+    return state
+
+
+def build_role_graph(roles: List[str], roles_dir: Path) -> Dict[str, List[str]]:
+    """Roles each of `roles` has to wait for, with `roles` in playbook order
+
+    Dependencies outside `roles` run inside the dependent role's own run, so
+    the search continues through them to whatever they depend on. A role
+    also waits for the roles listed before it that edit any of the same
+    files or desktop settings, so those still apply in playbook order.
+    """
+    scheduled = set(roles)
+    graph: Dict[str, List[str]] = {}
+    for role in roles:
+        waits_for: List[str] = []
+        seen: Set[str] = {role}
+        stack = list(reversed(role_dependencies(roles_dir, role)))
+        while stack:
+            dependency = stack.pop()
+            if dependency in seen:
+                continue
+            seen.add(dependency)
+            if dependency in scheduled:
+                waits_for.append(dependency)
+            else:
+                stack.extend(reversed(role_dependencies(roles_dir, dependency)))
+        graph[role] = waits_for
+
+    shared_state = {role: role_shared_state(roles_dir, role) for role in roles}
+    for position, role in enumerate(roles):
+        for earlier in roles[:position]:
+            if earlier not in graph[role] and shared_state[role] & shared_state[earlier]:
+                graph[role].append(earlier)
+    return graph
+
+
+def execution_waves(graph: Dict[str, List[str]]) -> List[List[str]]:
+    """Roles grouped by the earliest step they can run in, keeping the graph's order
+
+    Raises ValueError if the dependencies form a cycle.
+    """
+    remaining = {role: set(dependencies) for role, dependencies in graph.items()}
+    waves = []
+    done: Set[str] = set()
+    while remaining:
+        wave = [role for role, dependencies in remaining.items() if dependencies <= done]
+        if not wave:
+            raise ValueError(f"Role dependency cycle between: {', '.join(sorted(remaining))}")
+        for role in wave:
+            del remaining[role]
+        done.update(wave)
+        waves.append(wave)
+    return waves
+
+
+def read_extra_vars(command: List[str]) -> Dict:
+    """Variables passed with --extra-vars / -e, as far as they can be read"""
+    variables: Dict = {}
+    for position, arg in enumerate(command[:-1]):
+        if arg not in ("--extra-vars", "-e"):
+            continue
+        value = command[position + 1]
+        try:
+            if value.startswith("@"):
+                with open(value[1:], "r") as f:
+                    loaded = yaml.safe_load(f)
+            elif value.lstrip().startswith("{"):
+                loaded = yaml.safe_load(value)
+            else:
+                loaded = dict(pair.split("=", 1) for pair in value.split() if "=" in pair)
+        except (OSError, yaml.YAMLError):
+            continue
+        if isinstance(loaded, dict):
+            variables.update(loaded)
+    return variables
+
+
+def read_group_vars(directory: Path) -> Dict:
+    """The `all` group variables kept in directory/group_vars"""
+    group_vars = Path(directory) / "group_vars"
+    paths = [group_vars / "all.yml", group_vars / "all.yaml"]
+    if (group_vars / "all").is_dir():
+        paths.extend(sorted((group_vars / "all").glob("*.y*ml")))
+
+    variables: Dict = {}
+    for path in paths:
+        try:
+            with open(path, "r") as f:
+                loaded = yaml.safe_load(f)
+        except (OSError, yaml.YAMLError):
+            continue
+        if isinstance(loaded, dict):
+            variables.update(loaded)
+    return variables
+
+
+def read_play_variables(command: List[str], playbook: Path) -> Dict:
+    """Variables a role `when` can see, in Ansible's order of precedence
+
+    Inventory group_vars, then the playbook's group_vars, then extra vars;
+    host_vars and facts are not considered.
+    """
+    inventories = [command[position + 1] for position, arg in enumerate(command[:-1]) if arg in ("-i", "--inventory")]
+    if not inventories:
+        config = configparser.ConfigParser(interpolation=None)
+        config.read("ansible.cfg")
+        if config.get("defaults", "inventory", fallback=None):
+            inventories = [config.get("defaults", "inventory")]
+
+    variables: Dict = {}
+    for inventory in inventories:
+        path = Path(inventory).expanduser()
+        if path.exists():
+            variables.update(read_group_vars(path if path.is_dir() else path.parent))
+    variables.update(read_group_vars(Path(playbook).parent))
+    variables.update(read_extra_vars(command))
+    return variables
+
+
+class RolePlan:
+    """Which roles of a single-play playbook run on their own, and in what order"""
+
+    def __init__(self, playbook: Path, variables: Optional[Dict] = None, only: Optional[List[str]] = None):
+        self.playbook = Path(playbook)
+        self.roles_dir = self.playbook.parent / "roles"
+
+        with open(self.playbook, "r") as f:
+            plays = yaml.safe_load(f)
+        if not isinstance(plays, list) or len(plays) != 1 or not isinstance(plays[0], dict):
+            raise ValueError(f"{self.playbook} is not a single-play playbook")
+        self.play: Dict = plays[0]
+
+        self.entries: Dict[str, object] = {}
+        self.skipped: List[str] = []
+        # Roles whose condition can't be decided here still get a run, but
+        # dependents keep running them as meta dependencies too
+        self.undecided: List[str] = []
+        for entry in self.play.get("roles") or []:
+            name = role_name(entry)
+            condition = evaluate_condition(entry.get("when") if isinstance(entry, dict) else None, variables or {})
+            if condition is False:
+                self.skipped.append(name)
+                continue
+            if condition is None:
+                self.undecided.append(name)
+            self.entries[name] = entry
+
+        # Enabled roles that aren't run this time are taken as already applied
+        self._standalone = [role for role in self.entries if role not in self.undecided]
+        self.unchanged: List[str] = []
+        if only is not None:
+            self.unchanged = [role for role in self.entries if role not in only]
+            self.entries = {role: entry for role, entry in self.entries.items() if role in only}
+
+        self.graph = build_role_graph(list(self.entries), self.roles_dir)
+        self.waves = execution_waves(self.graph)
+
+    @property
+    def roles(self) -> List[str]:
+        return list(self.entries)
+
+    @property
+    def standalone_roles(self) -> List[str]:
+        """Roles a dependent can rely on having run already"""
+        return list(self._standalone)
+
+    def prepare_play(self) -> Dict:
+        """The play's pre_tasks on their own (lock cleanup, apt cache update)"""
+        return dict(self.play, roles=[], post_tasks=[])
+
+    def role_play(self, role: str) -> Dict:
+        """One role, after the pre_tasks tagged `always` (facts) as a --tags run would have"""
+        pre_tasks = [task for task in self.play.get("pre_tasks") or [] if "always" in self._tags(task)]
+        name = self.play.get("name", "Play")
+        return dict(self.play, name=f"{name} ({role})", pre_tasks=pre_tasks, roles=[self.entries[role]], post_tasks=[])
+
+    def finish_play(self) -> Dict:
+        """The play's post_tasks on their own"""
+        return dict(self.play, pre_tasks=[], roles=[])
+
+    @staticmethod
+    def _tags(task) -> List[str]:
+        tags = task.get("tags", []) if isinstance(task, dict) else []
+        return [tags] if isinstance(tags, str) else list(tags)
+
+
+class RoleScheduler:
+    """Run a RolePlan: pre_tasks, then roles as their dependencies finish, then post_tasks
+
+    `command` is the plain ansible-playbook command for the whole playbook;
+    each run swaps the playbook for a generated one next to it (so
+    playbook-relative group_vars and roles still resolve).
+    """
+
+    def __init__(self, plan: RolePlan, command: List[str], max_parallel: int = DEFAULT_MAX_PARALLEL, output=None):
+        self.plan = plan
+        self.command = command
+        self.max_parallel = max(1, max_parallel)
+        self.output = output or sys.stdout
+        self.results: Dict[str, int] = {}
+        self._output_lock = threading.Lock()
+        self._processes: Dict[str, subprocess.Popen] = {}
+        self._playbooks: List[str] = []
+        self._lock_file: Optional[str] = None
+        self._playbook_position = find_playbook(command)
+
+    def run(self) -> int:
+        """Run every step; returns the first non-zero exit code, or 0"""
+        env = self._environment()
+        try:
+            self._write(f"Role plan: {' | '.join(', '.join(wave) for wave in self.plan.waves)}")
+            if self.plan.skipped:
+                self._write(f"Roles not enabled: {', '.join(self.plan.skipped)}")
+            if self.plan.unchanged:
+                self._write(f"Roles left as applied: {', '.join(self.plan.unchanged)}")
+
+            exit_code = self._run_serial("prepare", self.plan.prepare_play(), env)
+            if exit_code == 0:
+                exit_code = self._run_roles(env)
+            # Post tasks re-enable unattended-upgrades, so they run even after a failure
+            finish_code = self._run_serial("finish", self.plan.finish_play(), env)
+            return exit_code or finish_code
+        finally:
+            self._cleanup()
+
+    def terminate(self) -> None:
+        """Stop every running ansible-playbook"""
+        for process in list(self._processes.values()):
+            if process.poll() is None:
+                process.terminate()
+
+    def _run_serial(self, label: str, play: Dict, env: Dict) -> int:
+        finished: queue.Queue = queue.Queue()
+        self._start(label, play, env, finished)
+        _, exit_code = finished.get()
+        return exit_code
+
+    def _run_roles(self, env: Dict) -> int:
+        waiting = {role: set(dependencies) for role, dependencies in self.plan.graph.items()}
+        finished: queue.Queue = queue.Queue()
+        running: Set[str] = set()
+        exit_code = 0
+
+        while waiting or running:
+            # Start whatever is ready, in playbook order
+            for role in [role for role, dependencies in waiting.items() if not dependencies]:
+                if len(running) >= self.max_parallel:
+                    break
+                del waiting[role]
+                running.add(role)
+                self._start(role, self.plan.role_play(role), env, finished)
+
+            if not running:
+                # Everything left waits on a role that failed
+                for role, dependencies in waiting.items():
+                    self._write(f"[{role}] Skipped: depends on failed {', '.join(sorted(dependencies))}")
+                    self.results[role] = -1
+                break
+
+            role, code = finished.get()
+            running.discard(role)
+            self.results[role] = code
+            if code != 0:
+                self._write(f"[{role}] Exited with code {code}")
+                exit_code = exit_code or code
+                continue
+            for dependencies in waiting.values():
+                dependencies.discard(role)
+
+        return exit_code
+
+    def _start(self, label: str, play: Dict, env: Dict, finished: queue.Queue) -> None:
+        event_fd = env.get("UBOOTU_EVENT_FD")
+        try:
+            command = list(self.command)
+            command[self._playbook_position] = self._write_playbook(label, play)
+            command.extend(["--extra-vars", json.dumps({SCHEDULED_ROLES_VAR: self.plan.standalone_roles})])
+            process = subprocess.Popen(
+                command,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                stdin=subprocess.DEVNULL,
+                env=env,
+                pass_fds=(int(event_fd),) if event_fd and event_fd.isdigit() else (),
+            )
+        except OSError as e:
+            self._write(f"[{label}] Failed to start: {e}")
+            finished.put((label, 1))
+            return
+
+        self._processes[label] = process
+        threading.Thread(
+            target=self._relay, args=(label, process, finished), name=f"ubootu-role-{label}", daemon=True
+        ).start()
+
+    def _relay(self, label: str, process: subprocess.Popen, finished: queue.Queue) -> None:
+        """Copy one run's output, prefixed with its label, then report its exit code"""
+        try:
+            for raw_line in process.stdout:
+                line = raw_line.decode("utf-8", "replace").rstrip()
+                if line:
+                    self._write(f"[{label}] {line}")
+            process.stdout.close()
+        finally:
+            finished.put((label, process.wait()))
+
+    def _write(self, line: str) -> None:
+        with self._output_lock:
+            try:
+                self.output.write(line + "\n")
+                self.output.flush()
+            except (OSError, ValueError):
+                # Nobody is reading any more; the runs themselves carry on
+                pass
+
+    def _write_playbook(self, label: str, play: Dict) -> str:
+        fd, path = tempfile.mkstemp(prefix=f".ubootu-{label}-", suffix=".yml", dir=str(self.plan.playbook.parent))
+        with os.fdopen(fd, "w") as f:
+            yaml.safe_dump([play], f, default_flow_style=False, sort_keys=False)
+        self._playbooks.append(path)
+        return path
+
+    def _environment(self) -> Dict[str, str]:
+        env = os.environ.copy()
+        fd, self._lock_file = tempfile.mkstemp(prefix="ubootu-apt-", suffix=".lock")
+        os.close(fd)
+        env["UBOOTU_APT_LOCK"] = self._lock_file
+
+        plugin_paths = [str(CALLBACK_DIR)]
+        if env.get("ANSIBLE_CALLBACK_PLUGINS"):
+            plugin_paths.append(env["ANSIBLE_CALLBACK_PLUGINS"])
+        env["ANSIBLE_CALLBACK_PLUGINS"] = os.pathsep.join(plugin_paths)
+        for key in ("ANSIBLE_CALLBACKS_ENABLED", "ANSIBLE_CALLBACK_WHITELIST"):
+            enabled = [name for name in env.get(key, "").split(",") if name]
+            env[key] = ",".join(enabled + [APT_LOCK_CALLBACK_NAME])
+        return env
+
+    def _cleanup(self) -> None:
+        for path in self._playbooks + ([self._lock_file] if self._lock_file else []):
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+        self._playbooks = []
+
+
+def find_playbook(command: List[str]) -> Optional[int]:
+    """Position of the playbook argument in an ansible-playbook command"""
+    for position, arg in enumerate(command[1:], 1):
+        if arg.endswith((".yml", ".yaml")) and command[position - 1] not in ("-i", "--inventory", "-e", "--extra-vars"):
+            return position
+    return None
+
+
+def scheduled_command(
+    command: List[str], max_parallel: int = DEFAULT_MAX_PARALLEL, roles: Optional[List[str]] = None
+) -> List[str]:
+    """Wrap an ansible-playbook command so its roles run through the scheduler
+
+    With `roles`, only those roles run; the others are taken as already applied.
+    """
+    wrapper = [sys.executable, "-m", "lib.role_scheduler", "--max-parallel", str(max_parallel)]
+    if roles is not None:
+        wrapper.extend(["--roles", ",".join(roles)])
+    return wrapper + ["--"] + list(command)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run the roles of an ansible-playbook command in dependency order")
+    parser.add_argument("--max-parallel", type=int, default=DEFAULT_MAX_PARALLEL)
+    parser.add_argument("--roles", help="comma-separated roles to run; the rest are left as applied")
+    parser.add_argument("command", nargs=argparse.REMAINDER, help="ansible-playbook command, after --")
+    args = parser.parse_args(argv)
+
+    command = args.command[1:] if args.command[:1] == ["--"] else args.command
+    if not command:
+        parser.error("no ansible-playbook command given")
+
+    playbook_position = find_playbook(command)
+    plan = None
+    only = [role for role in args.roles.split(",") if role] if args.roles is not None else None
+    if playbook_position is not None and not _INSPECT_FLAGS.intersection(command):
+        try:
+            playbook = Path(command[playbook_position])
+            plan = RolePlan(playbook, read_play_variables(command, playbook), only)
+        except (OSError, yaml.YAMLError, ValueError) as e:
+            sys.stderr.write(f"[DEBUG] Running playbook serially: {e}\n")
+
+    if plan is None or (len(plan.roles) < 2 and only is None):
+        # Nothing to run side by side
+        os.execvp(command[0], command)
+
+    scheduler = RoleScheduler(plan, command, args.max_parallel)
+
+    def stop(signum, frame):
+        scheduler.terminate()
+        raise SystemExit(128 + signum)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    return scheduler.run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,23 +5,108 @@ Detects installed packages and system state
 """
 
 import json
+import os
 import re
 import subprocess
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from dataclasses import dataclass, field
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional, Set, Tuple
+from typing import Callable, Dict, List, Optional, Set, Tuple
 
 import yaml
 
+from .dpkg_status import DPKG_STATUS_FILE, read_installed_packages
+
+try:
+    import apt_pkg
+except ImportError:
+    apt_pkg = None
+
+# Never remove essential system packages
+NEVER_REMOVE = {
+    "ubuntu-desktop",
+    "ubuntu-minimal",
+    "ubuntu-standard",
+    "systemd",
+    "systemd-sysv",
+    "init",
+    "linux-image-generic",
+    "linux-headers-generic",
+    "grub-pc",
+    "grub-efi",
+    "grub2-common",
+    "network-manager",
+    "networkd-dispatcher",
+    "apt",
+    "dpkg",
+    "bash",
+    "dash",
+    "coreutils",
+}
+
+
+@dataclass
+class RemovalCandidate:
+    """A package considered for removal and the verdict on it"""
+
+    package: str
+    item_id: str
+    safe: bool
+    reason: str
+
+
+@dataclass
+class RemovalPlan:
+    """Outcome of planning the removal of unchecked menu items"""
+
+    candidates: List[RemovalCandidate] = field(default_factory=list)
+
+    @property
+    def to_remove(self) -> Dict[str, List[str]]:
+        """Packages that are safe to remove, with the reasons for removing them"""
+        packages: Dict[str, List[str]] = {}
+        for candidate in self.candidates:
+            if candidate.safe:
+                packages.setdefault(candidate.package, []).append(f"Unchecked from menu: {candidate.item_id}")
+        return packages
+
+    @property
+    def kept(self) -> Dict[str, str]:
+        """Packages that will be kept, with the reason they can't be removed"""
+        return {candidate.package: candidate.reason for candidate in self.candidates if not candidate.safe}
+
 
 class SystemDiscovery:
     """Discover what's actually installed on the system"""
 
-    def __init__(self):
-        """Initialize the system discovery module"""
+    # Seconds each inventory backend may take before it is treated as empty
+    BACKEND_TIMEOUTS = {"apt": 30, "snap": 15, "flatpak": 15}
+
+    # Files whose mtimes change whenever a backend's inventory changes
+    SNAP_STATE_FILE = "/var/lib/snapd/state.json"
+    FLATPAK_APP_DIRS = ["/var/lib/flatpak/app", "~/.local/share/flatpak/app"]
+
+    # Bump when the cached layout changes
+    CACHE_FORMAT = 1
+
+    def __init__(self, use_cache: bool = False):
+        """Initialize the system discovery module
+
+        Args:
+            use_cache: Reuse inventories from cache_file while their sources are unchanged
+        """
+        self.use_cache = use_cache
         self.installed_packages = {}
+        self.installed_index: Dict[str, List[Tuple[str, str]]] = {}
+        # Backends whose last query failed, with the error; their empty inventory isn't cached
+        self.backend_errors: Dict[str, str] = {}
         self.package_to_menu_map = self._build_package_mapping()
+        self.dpkg_status_file = DPKG_STATUS_FILE
         self.state_file = ".ubootu_system_state.yml"
+        self.cache_file = ".ubootu_discovery_cache.json"
         self.managed_file = ".ubootu_managed.yml"
 
     def _build_package_mapping(self) -> Dict[str, str]:
@@ -110,13 +195,31 @@ class SystemDiscovery:
         }
 
     def get_installed_packages(self) -> Dict[str, Dict]:
-        """Get all installed packages with metadata"""
+        """Get all installed packages with metadata
+
+        Reads the dpkg status file directly, falling back to dpkg-query if it can't be read.
+        """
+        try:
+            packages = read_installed_packages(self.dpkg_status_file)
+        except OSError:
+            packages = self._query_installed_packages()
+        else:
+            for package, info in packages.items():
+                info["menu_id"] = self.package_to_menu_map.get(package)
+
+        self.installed_packages = packages
+        return packages
+
+    def _query_installed_packages(self) -> Dict[str, Dict]:
+        """Get installed packages by running dpkg-query"""
         packages = {}
 
         try:
             # Use dpkg-query to get installed packages
             cmd = ["dpkg-query", "-W", "-f=${binary:Package}|${Version}|${Status}|${Installed-Size}\n"]
-            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+            result = subprocess.run(
+                cmd, capture_output=True, text=True, check=True, timeout=self.BACKEND_TIMEOUTS["apt"]
+            )
 
             for line in result.stdout.strip().split("\n"):
                 if not line:
@@ -138,12 +241,13 @@ class SystemDiscovery:
                             "menu_id": self.package_to_menu_map.get(package),
                         }
 
-        except subprocess.CalledProcessError as e:
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
             print(f"Error getting installed packages: {e}")
+            self.backend_errors["apt"] = str(e)
         except Exception as e:
             print(f"Unexpected error: {e}")
+            self.backend_errors["apt"] = str(e)
 
-        self.installed_packages = packages
         return packages
 
     def get_installed_snaps(self) -> Dict[str, Dict]:
@@ -152,7 +256,9 @@ class SystemDiscovery:
 
         try:
             cmd = ["snap", "list", "--format=json"]
-            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+            result = subprocess.run(
+                cmd, capture_output=True, text=True, check=True, timeout=self.BACKEND_TIMEOUTS["snap"]
+            )
             snap_data = json.loads(result.stdout)
 
             for snap in snap_data:
@@ -165,11 +271,12 @@ class SystemDiscovery:
                     "menu_id": self.package_to_menu_map.get(name),
                 }
 
-        except (subprocess.CalledProcessError, json.JSONDecodeError):
-            # Snap might not be installed or available
-            pass
-        except Exception:
+        except FileNotFoundError:
+            # Snap isn't installed, so there is nothing to list
             pass
+        except Exception as e:
+            # snapd may be down or slow; the empty list isn't the real inventory
+            self.backend_errors["snap"] = str(e)
 
         return snaps
 
@@ -179,7 +286,9 @@ class SystemDiscovery:
 
         try:
             cmd = ["flatpak", "list", "--app", "--columns=application,version,branch"]
-            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+            result = subprocess.run(
+                cmd, capture_output=True, text=True, check=True, timeout=self.BACKEND_TIMEOUTS["flatpak"]
+            )
 
             for line in result.stdout.strip().split("\n"):
                 if not line or line.startswith("Application"):
@@ -201,14 +310,205 @@ class SystemDiscovery:
                         "menu_id": self.package_to_menu_map.get(simple_name),
                     }
 
-        except subprocess.CalledProcessError:
-            # Flatpak might not be installed
-            pass
-        except Exception:
+        except FileNotFoundError:
+            # Flatpak isn't installed, so there is nothing to list
             pass
+        except Exception as e:
+            self.backend_errors["flatpak"] = str(e)
 
         return flatpaks
 
+    def get_inventory(self, force: bool = False) -> Tuple[Dict[str, Dict], Dict[str, Dict], Dict[str, Dict]]:
+        """Get the dpkg, snap and flatpak inventories
+
+        With use_cache, backends whose sources are unchanged since the last scan
+        are served from cache_file and only the rest are queried.
+
+        Args:
+            force: Query every backend even if its cached inventory is current
+
+        Returns:
+            Tuple of (packages, snaps, flatpaks)
+        """
+        backends = {
+            "apt": self.get_installed_packages,
+            "snap": self.get_installed_snaps,
+            "flatpak": self.get_installed_flatpaks,
+        }
+
+        results: Dict[str, Dict[str, Dict]] = {}
+        signatures: Dict[str, List] = {}
+        cached: Dict[str, Dict] = {}
+
+        if self.use_cache:
+            signatures = {name: self._backend_signature(name) for name in backends}
+            if not force:
+                cached = self._load_discovery_cache()
+
+        for name in backends:
+            entry = cached.get(name)
+            if entry and entry.get("signature") == signatures[name]:
+                results[name] = self._tag_menu_ids(name, entry.get("packages", {}))
+
+        stale = {name: query for name, query in backends.items() if name not in results}
+        if stale:
+            queried, failed = self._query_backends(stale)
+            results.update(queried)
+            if self.use_cache:
+                # Failed backends are stored unsigned so the next scan retries them
+                self._save_discovery_cache(
+                    {
+                        name: {"signature": None if name in failed else signatures[name], "packages": results[name]}
+                        for name in backends
+                    }
+                )
+
+        self.installed_packages = results["apt"]
+        return results["apt"], results["snap"], results["flatpak"]
+
+    def _query_backends(
+        self, backends: Dict[str, Callable[[], Dict[str, Dict]]]
+    ) -> Tuple[Dict[str, Dict[str, Dict]], Set[str]]:
+        """Run the given backend queries concurrently
+
+        A backend that fails or outlives its timeout contributes an empty inventory,
+        whether it raised or swallowed the error and noted it in backend_errors.
+
+        Returns:
+            Tuple of (inventories by backend, names of the backends that failed)
+        """
+        results = {}
+        failed = set()
+        for name in backends:
+            self.backend_errors.pop(name, None)
+        pool = ThreadPoolExecutor(max_workers=len(backends), thread_name_prefix="ubootu-discovery")
+        try:
+            futures = [(name, pool.submit(query)) for name, query in backends.items()]
+            for name, future in futures:
+                try:
+                    # subprocess.run enforces the same limit; this covers a stuck thread
+                    results[name] = future.result(timeout=self.BACKEND_TIMEOUTS[name] + 5)
+                except FutureTimeoutError:
+                    print(f"Timed out querying {name} packages")
+                    results[name] = {}
+                    failed.add(name)
+                except Exception as e:
+                    print(f"Error querying {name} packages: {e}")
+                    results[name] = {}
+                    failed.add(name)
+        finally:
+            # Don't wait on a backend that timed out
+            pool.shutdown(wait=False)
+
+        failed.update(name for name in backends if name in self.backend_errors)
+        return results, failed
+
+    def _backend_signature(self, backend: str) -> List[List]:
+        """Paths and mtimes that identify the current state of a backend"""
+        if backend == "apt":
+            paths = [self.dpkg_status_file]
+        elif backend == "snap":
+            paths = [self.SNAP_STATE_FILE]
+        else:
+            paths = [os.path.expanduser(path) for path in self.FLATPAK_APP_DIRS]
+
+        signature = []
+        for path in paths:
+            try:
+                signature.append([path, os.stat(path).st_mtime_ns])
+            except OSError:
+                signature.append([path, None])
+        return signature
+
+    def _tag_menu_ids(self, backend: str, packages: Dict[str, Dict]) -> Dict[str, Dict]:
+        """Refresh menu_id on cached entries in case the package mapping changed"""
+        for name, info in packages.items():
+            key = info.get("simple_name", name) if backend == "flatpak" else name
+            info["menu_id"] = self.package_to_menu_map.get(key)
+        return packages
+
+    def _load_discovery_cache(self) -> Dict[str, Dict]:
+        """Load cached backend inventories, empty if missing or from another format"""
+        try:
+            with open(self.cache_file, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+        if not isinstance(data, dict) or data.get("format") != self.CACHE_FORMAT:
+            return {}
+        backends = data.get("backends")
+        return backends if isinstance(backends, dict) else {}
+
+    def _save_discovery_cache(self, backends: Dict[str, Dict]) -> None:
+        """Write backend inventories to cache_file via a temp file and rename"""
+        temp_file = f"{self.cache_file}.tmp"
+        try:
+            with open(temp_file, "w") as f:
+                json.dump({"format": self.CACHE_FORMAT, "backends": backends}, f)
+            os.replace(temp_file, self.cache_file)
+        except (OSError, TypeError, ValueError) as e:
+            print(f"Error saving discovery cache: {e}")
+            try:
+                os.unlink(temp_file)
+            except OSError:
+                pass
+
+    def map_to_menu_items_async(self, menu_items: List[str]) -> "Future[Dict[str, str]]":
+        """Run map_to_menu_items on a background thread
+
+        Returns:
+            Future resolving to the same status map as map_to_menu_items
+        """
+        future: "Future[Dict[str, str]]" = Future()
+
+        def worker() -> None:
+            if not future.set_running_or_notify_cancel():
+                return
+            try:
+                future.set_result(self.map_to_menu_items(menu_items))
+            except BaseException as e:
+                future.set_exception(e)
+
+        threading.Thread(target=worker, name="ubootu-discovery-scan", daemon=True).start()
+        return future
+
+    @staticmethod
+    def build_installed_index(
+        installed: Dict[str, Dict], snaps: Dict[str, Dict], flatpaks: Dict[str, Dict]
+    ) -> Dict[str, List[Tuple[str, str]]]:
+        """Build a reverse index from menu item ID to the sources it is installed from
+
+        One pass over the inventory; snaps and flatpaks are indexed under both
+        their mapped menu ID and their own (simple) name.
+
+        Returns:
+            Dict mapping menu_item_id to a list of (source, package_name) tuples
+        """
+        index: Dict[str, List[Tuple[str, str]]] = {}
+
+        def add(menu_id: Optional[str], source: str, name: str) -> None:
+            if menu_id:
+                index.setdefault(menu_id, []).append((source, name))
+
+        for pkg_name, pkg_info in installed.items():
+            add(pkg_info.get("menu_id"), "apt", pkg_name)
+
+        for snap_name, snap_info in snaps.items():
+            menu_id = snap_info.get("menu_id")
+            add(menu_id, "snap", snap_name)
+            if snap_name != menu_id:
+                add(snap_name, "snap", snap_name)
+
+        for flatpak_id, flatpak_info in flatpaks.items():
+            menu_id = flatpak_info.get("menu_id")
+            simple_name = flatpak_info.get("simple_name")
+            add(menu_id, "flatpak", flatpak_id)
+            if simple_name != menu_id:
+                add(simple_name, "flatpak", flatpak_id)
+
+        return index
+
     def map_to_menu_items(self, menu_items: List[str]) -> Dict[str, str]:
         """Map installed packages to menu item selections
 
@@ -218,44 +518,21 @@ class SystemDiscovery:
             'not_installed' - package is not installed
             'partial' - some components installed (for groups)
         """
-        status_map = {}
-        installed = self.get_installed_packages()
-        snaps = self.get_installed_snaps()
-        flatpaks = self.get_installed_flatpaks()
-
-        for item_id in menu_items:
-            # Check if this menu item corresponds to any installed package
-            installed_as = []
-
-            # Check regular packages
-            for pkg_name, pkg_info in installed.items():
-                if pkg_info.get("menu_id") == item_id:
-                    installed_as.append(("apt", pkg_name))
-
-            # Check snaps
-            for snap_name, snap_info in snaps.items():
-                if snap_info.get("menu_id") == item_id or snap_name == item_id:
-                    installed_as.append(("snap", snap_name))
-
-            # Check flatpaks
-            for flatpak_id, flatpak_info in flatpaks.items():
-                if flatpak_info.get("menu_id") == item_id or flatpak_info.get("simple_name") == item_id:
-                    installed_as.append(("flatpak", flatpak_id))
-
-            if installed_as:
-                status_map[item_id] = "installed"
-            else:
-                status_map[item_id] = "not_installed"
+        installed, snaps, flatpaks = self.get_inventory()
+
+        # Where each menu item is installed from, kept for callers that need the sources
+        self.installed_index = self.build_installed_index(installed, snaps, flatpaks)
 
-        return status_map
+        return {item_id: "installed" if item_id in self.installed_index else "not_installed" for item_id in menu_items}
 
     def save_system_state(self) -> None:
         """Save current system state to file"""
+        packages, snaps, flatpaks = self.get_inventory()
         state = {
             "timestamp": datetime.now().isoformat(),
-            "packages": self.get_installed_packages(),
-            "snaps": self.get_installed_snaps(),
-            "flatpaks": self.get_installed_flatpaks(),
+            "packages": packages,
+            "snaps": snaps,
+            "flatpaks": flatpaks,
         }
 
         try:
@@ -336,28 +613,6 @@ class SystemDiscovery:
         Returns:
             Tuple of (is_safe, reason)
         """
-        # Never remove essential system packages
-        NEVER_REMOVE = {
-            "ubuntu-desktop",
-            "ubuntu-minimal",
-            "ubuntu-standard",
-            "systemd",
-            "systemd-sysv",
-            "init",
-            "linux-image-generic",
-            "linux-headers-generic",
-            "grub-pc",
-            "grub-efi",
-            "grub2-common",
-            "network-manager",
-            "networkd-dispatcher",
-            "apt",
-            "dpkg",
-            "bash",
-            "dash",
-            "coreutils",
-        }
-
         if package in NEVER_REMOVE:
             return (False, f"{package} is an essential system package")
 
@@ -366,14 +621,7 @@ class SystemDiscovery:
             cmd = ["apt-cache", "rdepends", package]
             result = subprocess.run(cmd, capture_output=True, text=True, check=True)
 
-            rdeps = []
-            for line in result.stdout.split("\n"):
-                line = line.strip()
-                if line and not line.startswith("Reverse Depends:") and not line.startswith(package):
-                    # Skip virtual packages
-                    if not line.startswith("|"):
-                        rdeps.append(line.strip())
-
+            rdeps = self._parse_rdepends(result.stdout, [package]).get(package, [])
             if rdeps:
                 return (False, f"Other packages depend on {package}: {', '.join(rdeps[:3])}")
 
@@ -386,6 +634,113 @@ class SystemDiscovery:
 
         return (True, "Safe to remove")
 
+    def plan_removals(self, item_ids: List[str]) -> RemovalPlan:
+        """Decide which packages of the given menu items can be removed
+
+        Applies the same rules as is_safe_to_remove, but resolves reverse
+        dependencies for every candidate in one query and reads the managed
+        list once.
+        """
+        packages_by_item: Dict[str, List[str]] = {}
+        for pkg_name, menu_id in self.package_to_menu_map.items():
+            packages_by_item.setdefault(menu_id, []).append(pkg_name)
+
+        candidates = [(pkg_name, item_id) for item_id in item_ids for pkg_name in packages_by_item.get(item_id, [])]
+        if self.installed_packages:
+            # Only packages that are actually installed need removing
+            candidates = [
+                (pkg_name, item_id) for pkg_name, item_id in candidates if pkg_name in self.installed_packages
+            ]
+
+        plan = RemovalPlan()
+        to_check = sorted({pkg_name for pkg_name, _ in candidates if pkg_name not in NEVER_REMOVE})
+        rdepends = self.get_reverse_dependencies(to_check) if to_check else {}
+        managed = self.get_managed_packages()
+
+        for pkg_name, item_id in candidates:
+            rdeps = rdepends.get(pkg_name, [])
+            if pkg_name in NEVER_REMOVE:
+                plan.candidates.append(
+                    RemovalCandidate(pkg_name, item_id, False, f"{pkg_name} is an essential system package")
+                )
+            elif rdeps:
+                plan.candidates.append(
+                    RemovalCandidate(
+                        pkg_name, item_id, False, f"Other packages depend on {pkg_name}: {', '.join(rdeps[:3])}"
+                    )
+                )
+            elif pkg_name not in managed:
+                plan.candidates.append(
+                    RemovalCandidate(pkg_name, item_id, False, f"{pkg_name} was not installed by Ubootu")
+                )
+            else:
+                plan.candidates.append(RemovalCandidate(pkg_name, item_id, True, "Safe to remove"))
+
+        return plan
+
+    def get_reverse_dependencies(self, packages: List[str]) -> Dict[str, List[str]]:
+        """Reverse dependencies of several packages, resolved in one pass
+
+        Uses python-apt when it is available, otherwise a single apt-cache call.
+        """
+        if apt_pkg is not None:
+            try:
+                return self._apt_pkg_reverse_dependencies(packages)
+            except Exception as e:
+                print(f"Error reading the APT cache, falling back to apt-cache: {e}")
+
+        try:
+            cmd = ["apt-cache", "rdepends"] + list(packages)
+            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+        except (subprocess.CalledProcessError, OSError):
+            return {}
+
+        return self._parse_rdepends(result.stdout, packages)
+
+    @staticmethod
+    def _apt_pkg_reverse_dependencies(packages: List[str]) -> Dict[str, List[str]]:
+        """Reverse dependencies from the python-apt package cache"""
+        apt_pkg.init()
+        cache = apt_pkg.Cache(None)
+
+        rdepends = {}
+        for package in packages:
+            try:
+                pkg = cache[package]
+            except KeyError:
+                continue
+            names = []
+            for dep in pkg.rev_depends_list:
+                name = dep.parent_pkg.name
+                if name not in names and not name.startswith(package):
+                    names.append(name)
+            rdepends[package] = names
+        return rdepends
+
+    @staticmethod
+    def _parse_rdepends(output: str, packages: List[str]) -> Dict[str, List[str]]:
+        """Parse `apt-cache rdepends` output for one or more packages
+
+        Each package's block starts with its name on an unindented line;
+        alternatives (lines starting with |) are skipped.
+        """
+        rdepends: Dict[str, List[str]] = {package: [] for package in packages}
+        wanted = set(packages)
+        current = packages[0] if len(packages) == 1 else None
+
+        for raw_line in output.split("\n"):
+            line = raw_line.strip()
+            if not line or line.startswith("Reverse Depends:"):
+                continue
+            if not raw_line[:1].isspace() and line in wanted:
+                current = line
+                continue
+            if current is None or line.startswith(current) or line.startswith("|"):
+                continue
+            rdepends[current].append(line)
+
+        return rdepends
+
     def get_orphaned_packages(self, config_selections: List[str]) -> Dict[str, Dict]:
         """Find packages installed but not in current config
 
@@ -423,10 +778,10 @@ class SystemDiscovery:
 
 if __name__ == "__main__":
     # Test the discovery module
-    discovery = SystemDiscovery()
+    discovery = SystemDiscovery(use_cache=True)
 
     print("Scanning system packages...")
-    packages = discovery.get_installed_packages()
+    packages, snaps, _ = discovery.get_inventory()
     print(f"Found {len(packages)} installed packages")
 
     # Show packages that map to menu items
@@ -437,7 +792,6 @@ if __name__ == "__main__":
         print(f"  {pkg} -> {info['menu_id']} (v{info['version']})")
 
     # Check snaps
-    snaps = discovery.get_installed_snaps()
     if snaps:
         print(f"\nFound {len(snaps)} installed snaps")
         for name, info in list(snaps.items())[:5]:
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Write-behind saving of config.yml for the unified TUI
+Coalesces rapid changes and writes atomically on a background thread
+"""
+
+import os
+import stat
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import yaml
+
+
+def write_config_atomic(path: str, config: Dict[str, Any]) -> None:
+    """Write config as YAML to path via a temp file and rename
+
+    Readers only ever see the previous or the new complete file.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix=".ubootu-config-", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w") as f:
+            yaml.dump(config, f, default_flow_style=False)
+            f.flush()
+            os.fsync(f.fileno())
+
+        # Keep the permissions of the file being replaced (mkstemp creates 0600)
+        try:
+            mode = stat.S_IMODE(os.stat(path).st_mode)
+        except OSError:
+            mode = 0o644
+        os.chmod(temp_path, mode)
+
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+class ConfigWriter:
+    """Debounced background writer for configuration files"""
+
+    def __init__(self, delay: float = 0.5):
+        self.delay = delay
+        self.last_error: Optional[Exception] = None
+
+        self._cond = threading.Condition()
+        self._pending: Optional[Tuple[str, Dict[str, Any]]] = None
+        self._deadline = 0.0
+        self._writing = False
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def pending(self) -> bool:
+        """Whether a scheduled write has not reached disk yet"""
+        with self._cond:
+            return self._pending is not None or self._writing
+
+    def schedule(self, path: str, config: Dict[str, Any]) -> None:
+        """Queue config to be written once no new changes arrive for `delay` seconds"""
+        with self._cond:
+            self._pending = (path, config)
+            self._deadline = time.monotonic() + self.delay
+            if self._thread is None or not self._thread.is_alive():
+                self._closed = False
+                self._thread = threading.Thread(target=self._run, name="ubootu-config-writer", daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+
+    def write_now(self, path: str, config: Dict[str, Any]) -> None:
+        """Write config immediately, superseding anything still queued
+
+        Raises whatever the write raises.
+        """
+        with self._cond:
+            self._wait_for_write()
+            self._pending = None
+            self._writing = True
+        try:
+            write_config_atomic(path, config)
+            self.last_error = None
+        finally:
+            self._finish_write()
+
+    def flush(self) -> bool:
+        """Write any queued config now in the calling thread
+
+        Returns False if the last write failed.
+        """
+        with self._cond:
+            self._wait_for_write()
+            pending = self._pending
+            self._pending = None
+            if pending is None:
+                return self.last_error is None
+            self._writing = True
+
+        self._write(*pending)
+        return self.last_error is None
+
+    def close(self) -> bool:
+        """Flush queued changes and stop the background thread"""
+        result = self.flush()
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        return result
+
+    def _wait_for_write(self) -> None:
+        # Caller holds the condition lock
+        while self._writing:
+            self._cond.wait()
+
+    def _finish_write(self) -> None:
+        with self._cond:
+            self._writing = False
+            self._cond.notify_all()
+
+    def _write(self, path: str, config: Dict[str, Any]) -> None:
+        try:
+            write_config_atomic(path, config)
+            self.last_error = None
+        except Exception as e:
+            self.last_error = e
+        finally:
+            self._finish_write()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while self._pending is None and not self._closed:
+                    self._cond.wait()
+                if self._pending is None:
+                    return
+
+                # Restart the wait whenever a newer change pushed the deadline out
+                remaining = self._deadline - time.monotonic()
+                if remaining > 0:
+                    self._cond.wait(remaining)
+                    continue
+
+                pending = self._pending
+                self._pending = None
+                self._writing = True
+
+            self._write(*pending)
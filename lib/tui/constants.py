@@ -36,11 +36,21 @@ SUBTITLE = "Professional Ubuntu Desktop Configuration Tool"
 # Help bar text
 HELP_BAR = "↑↓ Nav  Space Select  → Menu  ← Back  S Save  P Apply  ^D Diff  ^S Scan  ^M Mode  Q Quit"
 HELP_BAR_SUBMENU = "↑↓ Nav  Space Select  → Menu  ← Back  A/D All/None  ^D Diff  ^S Scan  ^M Mode  Q Quit"
+HELP_BAR_SEARCH = "Type to search  ↑↓ Results  Enter Go to item  Esc Cancel"
 
 # Minimum terminal size
 MIN_WIDTH = 80
 MIN_HEIGHT = 24
 
+# First screen row of the menu list (the header and its status lines sit above it)
+MENU_START_Y = 7
+
+# Quiet period before pending selection changes are written to config.yml (seconds)
+AUTOSAVE_DELAY = 0.5
+
+# Input poll interval while the background package scan is running (milliseconds)
+DISCOVERY_POLL_MS = 100
+
 # Dialog dimensions
 DIALOG_WIDTH = 60
 DIALOG_HEIGHT = 10
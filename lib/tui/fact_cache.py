@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Persistent Ansible fact cache for repeat applies
+Points Ansible's jsonfile cache at the Ubootu cache directory and throws the
+cached facts away when they are too old or the kernel or release changed.
+Caching is only switched on through the environment set by FactCache.prepare,
+so runs that skip these checks (setup.sh, bundles, fleet) always gather in full
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+from .menu_cache import get_cache_dir
+
+# Seconds cached facts are trusted
+FACT_CACHE_TTL = 86400
+
+OS_RELEASE_FILE = "/etc/os-release"
+
+
+def get_fact_cache_dir() -> Path:
+    """Directory Ansible's jsonfile cache plugin writes host facts to"""
+    return get_cache_dir() / "facts"
+
+
+def system_fingerprint(os_release: str = OS_RELEASE_FILE) -> str:
+    """Kernel and distribution release the cached facts were gathered on"""
+    digest = hashlib.sha256()
+    uname = os.uname()
+    digest.update(f"{uname.release}\n{uname.version}\n{uname.machine}\n".encode())
+    try:
+        with open(os_release, "rb") as f:
+            digest.update(f.read())
+    except OSError:
+        pass
+    return digest.hexdigest()
+
+
+class FactCache:
+    """The fact cache directory plus a record of when and on what system it was started
+
+    Ansible's own timeout counts from the last write, and every run writes
+    some facts, so the age limit is enforced here from the first write.
+    """
+
+    def __init__(self, cache_dir: Optional[Path] = None, ttl: int = FACT_CACHE_TTL):
+        self.cache_dir = Path(cache_dir) if cache_dir else get_fact_cache_dir()
+        self.ttl = ttl
+        self.state_file = self.cache_dir.with_name(self.cache_dir.name + ".json")
+
+    def is_valid(self, fingerprint: Optional[str] = None) -> bool:
+        """True if the cached facts are young enough and from this kernel and release"""
+        try:
+            with open(self.state_file, "r") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if not isinstance(state, dict) or not isinstance(state.get("created"), (int, float)):
+            return False
+        if time.time() - state["created"] > self.ttl:
+            return False
+        return state.get("fingerprint") == (fingerprint or system_fingerprint())
+
+    def invalidate(self) -> None:
+        """Drop every cached host's facts"""
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        try:
+            self.state_file.unlink()
+        except OSError:
+            pass
+
+    def prepare(self, env: Dict[str, str]) -> bool:
+        """Start a new cache generation if needed and point Ansible at the cache
+
+        Returns False (leaving env alone) if the cache directory can't be created.
+        """
+        fingerprint = system_fingerprint()
+        if not self.is_valid(fingerprint):
+            self.invalidate()
+            try:
+                self.cache_dir.mkdir(parents=True, exist_ok=True)
+                with open(self.state_file, "w") as f:
+                    json.dump({"created": time.time(), "fingerprint": fingerprint}, f)
+            except OSError:
+                return False
+
+        env["ANSIBLE_CACHE_PLUGIN"] = "jsonfile"
+        env["ANSIBLE_CACHE_PLUGIN_CONNECTION"] = str(self.cache_dir)
+        env["ANSIBLE_CACHE_PLUGIN_TIMEOUT"] = str(self.ttl)
+        return True
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Compiled menu catalog cache for the unified TUI
+
+menu_items.py builds every menu entry as dict literals inside one large
+function. The result is marshalled to a cache file keyed on the source
+file's mtime and size, so later launches skip importing (and, when the
+bytecode is stale or missing, compiling) that module entirely.
+
+Run `python -m lib.tui.menu_cache` to build the cache ahead of time.
+"""
+
+import marshal
+import os
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .menu_catalog import MenuItem
+
+# Bump when the cached layout changes
+CACHE_FORMAT = 2
+
+MENU_SOURCE = Path(__file__).with_name("menu_items.py")
+
+
+def get_cache_dir() -> Path:
+    """Per-user cache directory for Ubootu"""
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return Path(base) / "ubootu"
+
+
+def get_cache_path() -> Path:
+    """Location of the compiled catalog for this Python version"""
+    version = f"{sys.version_info.major}{sys.version_info.minor}"
+    return get_cache_dir() / f"menu_catalog.py{version}.marshal"
+
+
+def _source_key(source: Path) -> Optional[Tuple[int, int, int]]:
+    """Cache key for the menu source, None if it can't be read"""
+    try:
+        st = source.stat()
+    except OSError:
+        return None
+    return (CACHE_FORMAT, st.st_mtime_ns, st.st_size)
+
+
+def _read_cache(cache_path: Path, key: Tuple[int, int, int]) -> Optional[List[Dict]]:
+    try:
+        with open(cache_path, "rb") as f:
+            cached_key, items = marshal.load(f)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+
+    if tuple(cached_key) != key or not isinstance(items, list):
+        return None
+    return items
+
+
+def _write_cache(cache_path: Path, key: Tuple[int, int, int], items: List[Dict]) -> bool:
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(prefix=".menu_catalog-", dir=str(cache_path.parent))
+    except OSError:
+        return False
+
+    try:
+        with os.fdopen(fd, "wb") as f:
+            marshal.dump((key, items), f)
+        os.replace(temp_path, cache_path)
+        return True
+    except (OSError, ValueError):
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        return False
+
+
+def build_menu_cache(cache_path: Optional[Path] = None, source: Path = MENU_SOURCE) -> List[MenuItem]:
+    """Run menu_items.load_menu_structure and store the result in the cache"""
+    from .menu_items import load_menu_structure as build_menu_structure
+
+    items = build_menu_structure()
+    key = _source_key(source)
+    if key is not None:
+        _write_cache(cache_path or get_cache_path(), key, [item.to_dict() for item in items])
+    return items
+
+
+def load_menu_structure(cache_path: Optional[Path] = None, source: Path = MENU_SOURCE) -> List[MenuItem]:
+    """Load the menu structure, from the compiled cache when it is current
+
+    The cache is rebuilt automatically whenever menu_items.py changes.
+    """
+    cache_path = cache_path or get_cache_path()
+    key = _source_key(source)
+    if key is not None:
+        items = _read_cache(cache_path, key)
+        if items is not None:
+            return [MenuItem.from_dict(item) for item in items]
+
+    return build_menu_cache(cache_path, source)
+
+
+def main() -> int:
+    """Build the menu cache from the command line"""
+    cache_path = get_cache_path()
+    items = build_menu_cache(cache_path)
+    print(f"Compiled {len(items)} menu items to {cache_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
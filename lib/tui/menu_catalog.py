@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Menu item records and an indexed view over the menu item list
+The index is built once per item list so menu lookups don't rescan every item
+"""
+
+import sys
+from collections.abc import Mapping
+from typing import Any, Dict, FrozenSet, Iterable, Iterator, List, Optional, Set, Tuple
+
+# Keys a menu entry may carry, mapped to the MenuItem attribute holding them
+MENU_ITEM_FIELDS = {
+    "id": "id",
+    "label": "label",
+    "description": "description",
+    "parent": "parent",
+    "icon": "icon",
+    "help": "help",
+    "is_category": "is_category",
+    "children": "children",
+    "default": "default",
+    "is_configurable": "is_configurable",
+    "default_value": "default_value",
+    "config_type": "config_type",
+    "unit": "unit",
+    "options": "options",
+    "values": "value_choices",  # renamed so the mapping's values() method still works
+    "min_value": "min_value",
+    "max_value": "max_value",
+    "step": "step",
+    "ansible_var": "ansible_var",
+}
+
+_FLAG_FIELDS = ("is_category", "is_configurable", "default")
+
+# Key tuples are shared between items with the same shape
+_KEY_SHAPES: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+
+
+class MenuItem(Mapping):
+    """Compact, read-mostly record for one menu entry
+
+    Every field is an attribute (unset flags read False, other unset fields
+    None), while the mapping interface only exposes the keys the entry was
+    defined with, so code written against the original dicts keeps working:
+    item["label"], item.get("icon"), "default_value" in item, dict(item).
+    """
+
+    __slots__ = tuple(MENU_ITEM_FIELDS.values()) + ("_keys", "_extra")
+
+    id: str
+    label: str
+    description: str
+    parent: Optional[str]
+    icon: Optional[str]
+    help: Optional[str]
+    is_category: bool
+    children: Optional[List[str]]
+    default: bool
+    is_configurable: bool
+    default_value: Any
+    config_type: Optional[str]
+    unit: Optional[str]
+    options: Optional[List[Any]]
+    value_choices: Optional[List[Any]]
+    min_value: Any
+    max_value: Any
+    step: Any
+    ansible_var: Optional[str]
+
+    def __init__(self, **fields: Any):
+        for attr in MENU_ITEM_FIELDS.values():
+            object.__setattr__(self, attr, None)
+        for attr in _FLAG_FIELDS:
+            object.__setattr__(self, attr, False)
+        self._keys: Tuple[str, ...] = ()
+        self._extra: Optional[Dict[str, Any]] = None
+
+        for key, value in fields.items():
+            self[key] = value
+
+    @classmethod
+    def from_dict(cls, data: Mapping) -> "MenuItem":
+        """Build a record from a menu entry dict"""
+        return cls(**data)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Plain dict copy of the entry as it was defined"""
+        return {key: self[key] for key in self}
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._keys:
+            return getattr(self, MENU_ITEM_FIELDS[key])
+        if self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        attr = MENU_ITEM_FIELDS.get(key)
+        if attr is None:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+            return
+
+        # Ids are compared constantly, intern them so equal ids share one string
+        if key in ("id", "parent") and isinstance(value, str):
+            value = sys.intern(value)
+        elif key == "children" and value is not None:
+            value = [sys.intern(child) for child in value]
+
+        setattr(self, attr, value)
+        if key not in self._keys:
+            keys = self._keys + (key,)
+            self._keys = _KEY_SHAPES.setdefault(keys, keys)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._keys or (self._extra is not None and key in self._extra)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key in self._keys:
+            return getattr(self, MENU_ITEM_FIELDS[key])
+        if self._extra is not None:
+            return self._extra.get(key, default)
+        return default
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self._keys
+        if self._extra is not None:
+            yield from self._extra
+
+    def __len__(self) -> int:
+        return len(self._keys) + (len(self._extra) if self._extra is not None else 0)
+
+    def __repr__(self) -> str:
+        return f"MenuItem({self.to_dict()!r})"
+
+
+class MenuCatalog:
+    """Index of menu items by id, by parent and by category descendants"""
+
+    def __init__(self, items: List[Dict], category_items: Optional[Dict[str, Set[str]]] = None):
+        self.items = items
+
+        # id -> item (first definition wins, matching a linear scan)
+        self._by_id: Dict[str, Dict] = {}
+        # parent id -> children in definition order (None is the root level)
+        self._children: Dict[Optional[str], List[Dict]] = {}
+        self._leaf_ids: List[str] = []
+        self._search_index = None
+
+        for item in items:
+            item_id = item["id"]
+            if item_id not in self._by_id:
+                self._by_id[item_id] = item
+            self._children.setdefault(item.get("parent"), []).append(item)
+            if not item.get("is_category"):
+                self._leaf_ids.append(item_id)
+
+        if category_items is None:
+            category_items = self.build_category_items(items)
+        self.category_items = category_items
+
+        # Descendant leaf sets per category, precomputed for the whole tree
+        self._descendants: Dict[str, FrozenSet[str]] = {}
+        containing: Dict[str, List[str]] = {}
+        for category_id in category_items:
+            for leaf_id in self.descendant_leaves(category_id):
+                containing.setdefault(leaf_id, []).append(category_id)
+
+        # leaf id -> every category whose descendants include it
+        self._containing: Dict[str, Tuple[str, ...]] = {
+            leaf_id: tuple(category_ids) for leaf_id, category_ids in containing.items()
+        }
+
+    @staticmethod
+    def build_category_items(items: Iterable[Dict]) -> Dict[str, Set[str]]:
+        """Map each category with children to the set of its child ids"""
+        category_items = {}
+        for item in items:
+            if item.get("is_category"):
+                children = item.get("children", [])
+                if children:
+                    category_items[item["id"]] = set(children)
+        return category_items
+
+    def get(self, item_id: str) -> Optional[Dict]:
+        """Get an item by id"""
+        return self._by_id.get(item_id)
+
+    def __contains__(self, item_id: str) -> bool:
+        return item_id in self._by_id
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def children(self, parent_id: Optional[str]) -> List[Dict]:
+        """Get the items whose parent is parent_id, in definition order
+
+        The returned list is shared with the index and must not be modified.
+        """
+        return self._children.get(parent_id, [])
+
+    @property
+    def leaf_ids(self) -> List[str]:
+        """Ids of every non-category item"""
+        return self._leaf_ids
+
+    def descendant_leaves(self, category_id: str) -> FrozenSet[str]:
+        """Get all non-category descendant item ids of a category"""
+        descendants = self._descendants.get(category_id)
+        if descendants is None:
+            descendants = self._collect_descendants(category_id, set())
+        return descendants
+
+    def _collect_descendants(self, category_id: str, visiting: Set[str]) -> FrozenSet[str]:
+        """Walk the category tree, memoizing every category on the way"""
+        cached = self._descendants.get(category_id)
+        if cached is not None:
+            return cached
+
+        visiting.add(category_id)
+        leaves: Set[str] = set()
+        for child_id in self.category_items.get(category_id, ()):
+            child = self._by_id.get(child_id)
+            if child is None:
+                continue
+            if child.get("is_category"):
+                # Guard against malformed catalogs that loop back on themselves
+                if child_id not in visiting:
+                    leaves.update(self._collect_descendants(child_id, visiting))
+            else:
+                leaves.add(child_id)
+        visiting.discard(category_id)
+
+        result = frozenset(leaves)
+        self._descendants[category_id] = result
+        return result
+
+    def categories_containing(self, item_id: str) -> Tuple[str, ...]:
+        """Get every category whose descendant leaves include item_id"""
+        return self._containing.get(item_id, ())
+
+    def ancestors(self, item_id: str) -> List[str]:
+        """Ids of the categories above an item, outermost first"""
+        chain: List[str] = []
+        item = self._by_id.get(item_id)
+        parent_id = item.get("parent") if item is not None else None
+        while parent_id and parent_id in self._by_id and parent_id not in chain:
+            chain.append(parent_id)
+            parent_id = self._by_id[parent_id].get("parent")
+        chain.reverse()
+        return chain
+
+    @property
+    def search_index(self) -> "MenuSearchIndex":
+        """Word index over ids, labels, descriptions and help text, built on first use"""
+        if self._search_index is None:
+            from .menu_search import MenuSearchIndex
+
+            self._search_index = MenuSearchIndex(self.items)
+        return self._search_index
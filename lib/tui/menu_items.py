@@ -4,10 +4,12 @@ Menu item definitions for the unified TUI
 All menu structure and items are defined here
 """
 
-from typing import Dict, List
+from typing import List
 
+from .menu_catalog import MenuItem
 
-def load_menu_structure() -> List[Dict]:
+
+def load_menu_structure() -> List[MenuItem]:
     """Load and return the complete menu structure"""
     items = []
 
@@ -4044,4 +4046,4 @@ Features:
         if not cat.get("children"):
             cat["children"] = []
 
-    return items
+    return [MenuItem.from_dict(item) for item in items]
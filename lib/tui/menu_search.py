@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Search index over the menu catalog
+Inverted index of words from item ids, labels, descriptions and help text
+with prefix matching and a typo-tolerant fallback
+"""
+
+import re
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional
+
+# How much a word counts depending on the field it came from
+FIELD_WEIGHTS = (("id", 3), ("label", 3), ("description", 2), ("help", 1))
+
+# Multipliers for how a query term matched a word
+EXACT_MATCH = 3
+PREFIX_MATCH = 2
+FUZZY_MATCH = 1
+
+# Query terms shorter than this are only prefix-matched
+FUZZY_MIN_LENGTH = 3
+
+_WORD_RE = re.compile(r"[a-z0-9+#]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase words of a text, so an id like ai-ml gives ai and ml"""
+    return _WORD_RE.findall(text.lower())
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Levenshtein distance counting adjacent transpositions as one edit
+
+    Stops early and returns limit + 1 once the distance must exceed limit.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+
+    previous_previous: Optional[List[int]] = None
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i] + [0] * len(b)
+        for j, char_b in enumerate(b, 1):
+            cost = 0 if char_a == char_b else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if previous_previous is not None and j > 1 and char_a == b[j - 2] and a[i - 2] == char_b:
+                current[j] = min(current[j], previous_previous[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous_previous, previous = previous, current
+    return previous[-1]
+
+
+class MenuSearchIndex:
+    """Ranked lookup of menu items by the words in their text
+
+    Every query term has to match (as a whole word, a word prefix, or a word
+    within one or two typos); items are ranked by where and how well their
+    terms matched, then by catalog order.
+    """
+
+    def __init__(self, items: Iterable[Dict]):
+        # word -> item id -> best field weight the word appears in
+        self._postings: Dict[str, Dict[str, int]] = {}
+        # item id -> catalog position and lowercased label, for ranking
+        self._order: Dict[str, int] = {}
+        self._labels: Dict[str, str] = {}
+
+        for item in items:
+            item_id = item["id"]
+            if item_id in self._order:
+                continue
+            self._order[item_id] = len(self._order)
+            self._labels[item_id] = (item.get("label") or item_id).lower()
+
+            for field, weight in FIELD_WEIGHTS:
+                value = item.get(field)
+                if not value:
+                    continue
+                words = tokenize(value)
+                if field == "id":
+                    # Whole ids as typed, e.g. "ai-ml"
+                    words.append(value.lower())
+                for word in words:
+                    postings = self._postings.setdefault(word, {})
+                    if postings.get(item_id, 0) < weight:
+                        postings[item_id] = weight
+
+        self._words = sorted(self._postings)
+        # First letter -> words, the candidates for typo matching
+        self._by_initial: Dict[str, List[str]] = {}
+        for word in self._words:
+            self._by_initial.setdefault(word[0], []).append(word)
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[str]:
+        """Ids of the items matching every word of the query, best first"""
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        scores: Optional[Dict[str, int]] = None
+        for term in terms:
+            term_scores = self._match_term(term)
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {
+                    item_id: score + term_scores[item_id] for item_id, score in scores.items() if item_id in term_scores
+                }
+            if not scores:
+                return []
+
+        phrase = query.strip().lower()
+        ranked = sorted(
+            scores,
+            key=lambda item_id: (
+                # Labels that start with what was typed come first
+                not self._labels[item_id].startswith(phrase),
+                -scores[item_id],
+                self._order[item_id],
+            ),
+        )
+        return ranked[:limit] if limit is not None else ranked
+
+    def _match_term(self, term: str) -> Dict[str, int]:
+        """Best score per item for one query term"""
+        scores: Dict[str, int] = {}
+
+        # Words sharing the prefix sit together in the sorted word list
+        start = bisect_left(self._words, term)
+        for position in range(start, len(self._words)):
+            word = self._words[position]
+            if not word.startswith(term):
+                break
+            quality = EXACT_MATCH if word == term else PREFIX_MATCH
+            self._add_postings(scores, word, quality)
+
+        if scores or len(term) < FUZZY_MIN_LENGTH:
+            return scores
+
+        # Nothing starts with the term: allow a typo or two, also against word prefixes while still typing
+        limit = 1 if len(term) <= 5 else 2
+        letters = set(term)
+        # Many words share their first letters; compare each distinct stem once
+        stem_matches: Dict[str, bool] = {}
+        for word in self._by_initial.get(term[0], ()):
+            # Each edit accounts for at most one of the term's letters missing from the word
+            if len(letters.difference(word)) > limit:
+                continue
+            stem = word[: len(term)]
+            matched = stem_matches.get(stem)
+            if matched is None:
+                matched = stem_matches[stem] = edit_distance(term, stem, limit) <= limit
+            if not matched and len(word) <= len(term) + limit:
+                matched = edit_distance(term, word, limit) <= limit
+            if matched:
+                self._add_postings(scores, word, FUZZY_MATCH)
+        return scores
+
+    def _add_postings(self, scores: Dict[str, int], word: str, quality: int) -> None:
+        for item_id, weight in self._postings[word].items():
+            score = weight * quality
+            if scores.get(item_id, 0) < score:
+                scores[item_id] = score
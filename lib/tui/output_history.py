@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Bounded output history for the progress dialog
+Keeps the newest lines in memory and spills older ones to a temporary file
+"""
+
+import sys
+import tempfile
+from array import array
+from collections import deque
+from itertools import islice
+from typing import Iterable, List, Optional
+
+# Lines kept in memory; older lines are read back from the spill file
+OUTPUT_HISTORY_LINES = 2000
+
+# Lines read from the spill file per step while searching
+SEARCH_BLOCK_LINES = 4096
+
+
+class OutputHistory:
+    """Append-only line history with a fixed-size in-memory tail
+
+    Lines are numbered from 0 for the whole run. The newest `capacity` lines
+    live in a deque; lines pushed out of it are written to an anonymous
+    temporary file and located through an offset table, so scrollback and
+    search cover the full run while memory stays bounded. If the spill file
+    can't be created, older lines are dropped instead.
+    """
+
+    def __init__(self, capacity: int = OUTPUT_HISTORY_LINES):
+        self.capacity = max(1, capacity)
+        self._recent: deque = deque(maxlen=self.capacity)
+        self._spill = None
+        self._spill_failed = False
+        # Byte offset of each spilled line, plus the end offset of the last one
+        self._offsets = array("Q", [0])
+        self._dropped = 0
+        self._total = 0
+
+    def __len__(self) -> int:
+        return self._total
+
+    @property
+    def first_available(self) -> int:
+        """Index of the oldest line that can still be read"""
+        return self._dropped
+
+    @property
+    def spilled(self) -> int:
+        """Number of lines held in the spill file"""
+        return len(self._offsets) - 1
+
+    def append(self, line: str) -> None:
+        self.extend([line])
+
+    def extend(self, lines: Iterable[str]) -> None:
+        lines = list(lines)
+        if not lines:
+            return
+
+        overflow = len(self._recent) + len(lines) - self.capacity
+        if overflow > 0:
+            evicted = [self._recent.popleft() for _ in range(min(overflow, len(self._recent)))]
+            # A batch larger than the whole buffer also evicts its own first lines
+            evicted.extend(lines[: overflow - len(evicted)])
+            self._spill_lines(evicted)
+
+        self._recent.extend(lines)
+        self._total += len(lines)
+
+    def tail(self, count: int) -> List[str]:
+        """The newest `count` lines"""
+        return self.window(max(0, self._total - count), count)
+
+    def window(self, start: int, count: int) -> List[str]:
+        """Up to `count` lines starting at line `start`"""
+        start = max(start, self._dropped)
+        end = min(self._total, start + max(0, count))
+        if start >= end:
+            return []
+
+        memory_start = self._total - len(self._recent)
+        lines = []
+        if start < memory_start:
+            lines.extend(self._read_spilled(start - self._dropped, min(end, memory_start) - self._dropped))
+            start = memory_start
+        if start < end:
+            lines.extend(islice(self._recent, start - memory_start, end - memory_start))
+        return lines
+
+    def find(self, text: str, start: int, backwards: bool = True) -> Optional[int]:
+        """Index of the nearest line containing `text` (case-insensitive)
+
+        Searches from `start` towards older lines when backwards, newer ones
+        otherwise; the line at `start` itself is included.
+        """
+        needle = text.lower()
+        if not needle or self._total == 0:
+            return None
+
+        start = min(max(start, self._dropped), self._total - 1)
+        if backwards:
+            block_end = start + 1
+            while block_end > self._dropped:
+                block_start = max(self._dropped, block_end - SEARCH_BLOCK_LINES)
+                block = self.window(block_start, block_end - block_start)
+                for offset in range(len(block) - 1, -1, -1):
+                    if needle in block[offset].lower():
+                        return block_start + offset
+                block_end = block_start
+        else:
+            block_start = start
+            while block_start < self._total:
+                block = self.window(block_start, SEARCH_BLOCK_LINES)
+                for offset, line in enumerate(block):
+                    if needle in line.lower():
+                        return block_start + offset
+                block_start += len(block)
+        return None
+
+    def clear(self) -> None:
+        """Forget all lines and remove the spill file"""
+        self.close()
+        self._recent.clear()
+        self._offsets = array("Q", [0])
+        self._spill_failed = False
+        self._dropped = 0
+        self._total = 0
+
+    def close(self) -> None:
+        if self._spill is not None:
+            try:
+                self._spill.close()
+            except OSError:
+                pass
+            self._spill = None
+
+    def _spill_lines(self, lines: List[str]) -> None:
+        if self._spill is None and not self._spill_failed:
+            try:
+                self._spill = tempfile.TemporaryFile(mode="w+b", prefix="ubootu-output-")
+            except OSError as e:
+                sys.stderr.write(f"[DEBUG] Output history spill file unavailable: {e}\n")
+                self._spill_failed = True
+
+        if self._spill is None:
+            self._dropped += len(lines)
+            return
+
+        data = bytearray()
+        offsets = self._offsets
+        position = offsets[-1]
+        for line in lines:
+            encoded = line.replace("\n", " ").encode("utf-8", "replace") + b"\n"
+            data += encoded
+            position += len(encoded)
+            offsets.append(position)
+
+        try:
+            self._spill.seek(0, 2)
+            self._spill.write(data)
+        except OSError as e:
+            # Disk full or similar: give up on the older history rather than the run
+            sys.stderr.write(f"[DEBUG] Output history spill failed: {e}\n")
+            self.close()
+            self._spill_failed = True
+            self._dropped += len(offsets) - 1
+            self._offsets = array("Q", [0])
+
+    def _read_spilled(self, start: int, end: int) -> List[str]:
+        """Spilled lines start..end, counted from the first spilled line"""
+        if self._spill is None or start >= end:
+            return []
+
+        self._spill.flush()
+        self._spill.seek(self._offsets[start])
+        data = self._spill.read(self._offsets[end] - self._offsets[start])
+        return data.decode("utf-8", "replace").split("\n")[: end - start]
@@ -5,18 +5,43 @@ Progress dialog for showing real-time command output in TUI
 
 import curses
 import errno
+import json
 import os
 import queue
+import re
+import select
 import signal
 import subprocess
 import sys
 import threading
 import time
-from typing import Callable, List, Optional
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 from .constants import DIALOG_HEIGHT, DIALOG_WIDTH
+from .fact_cache import FactCache
+from .output_history import OutputHistory
+from .task_estimator import TaskEstimator
 from .utils import draw_box, draw_centered_text, get_dialog_position
 
+# Bundled Ansible callback that streams progress events as JSON lines
+EVENT_CALLBACK_NAME = "ubootu_events"
+EVENT_CALLBACK_DIR = Path(__file__).resolve().parents[2] / "callback_plugins"
+
+# Pipe reads are batched: up to this many bytes per read, polled at this interval (seconds)
+READ_CHUNK_SIZE = 65536
+READ_POLL_INTERVAL = 0.5
+
+# Seconds without output or events before a run is considered stuck (long for large package updates)
+ACTIVITY_TIMEOUT = 300
+
+_ANSI_ESCAPE_RE = re.compile(r"\x1b\[[0-9;]*m")
+
+
+def _is_ansible_command(command: List[str]) -> bool:
+    """ansible-playbook itself, or a wrapper such as the role scheduler running it"""
+    return any(os.path.basename(arg).startswith("ansible-playbook") for arg in command)
+
 
 class ProgressDialog:
     """Show progress of long-running operations in TUI"""
@@ -24,7 +49,11 @@ class ProgressDialog:
     def __init__(self, stdscr):
         self.stdscr = stdscr
         self.height, self.width = stdscr.getmaxyx()
-        self.output_lines: List[str] = []
+        self.output_history = OutputHistory()
+        self.scroll_offset = 0  # Lines between the bottom of the view and the newest line; 0 follows output
+        self.search_text = ""
+        self.search_match: Optional[int] = None
+        self.search_status = ""
         self.is_running = False
         self.exit_code: Optional[int] = None
         self.output_queue = queue.Queue()
@@ -37,6 +66,17 @@ class ProgressDialog:
         self.success_details = {}  # Track what succeeded
         self.failure_details = {}  # Track what failed
         self.current_task_name = ""  # Store full task name for categorization
+        self.events_enabled = False  # Progress comes from the JSON event stream, not stdout
+        self.task_durations: Dict[str, float] = {}  # Seconds spent per task, from events
+        self.lines_read = 0  # Non-empty output lines and events seen in the current run
+        self.last_activity_time = time.time()  # Last output line or event, shared by both readers
+        self.started_tasks: List[str] = []  # Task names in the order they started, from events
+
+        # Progress estimate (filled in by a background --list-tasks pass when a config hash is given)
+        self.estimator: Optional[TaskEstimator] = None
+        self.expected_total: Optional[int] = None
+        self.expected_task_names: Optional[List[str]] = None
+        self.duration_history: Dict[str, float] = {}
 
         # Smart refresh tracking
         self.last_output_count = 0
@@ -46,18 +86,45 @@ class ProgressDialog:
         self.needs_redraw = True
 
     def run_command(
-        self, command: List[str], title: str = "Processing...", show_output: bool = True, sudo_dialog=None, env=None
+        self,
+        command: List[str],
+        title: str = "Processing...",
+        show_output: bool = True,
+        sudo_dialog=None,
+        env=None,
+        estimate_key: Optional[str] = None,
     ) -> int:
-        """Run a command and show progress in dialog"""
+        """Run a command and show progress in dialog
+
+        For ansible-playbook runs, estimate_key (the config hash) enables a real
+        percentage and ETA from the expected task list and previous runs.
+        """
         sys.stderr.write(f"\n[DEBUG] ProgressDialog.run_command called at {time.strftime('%H:%M:%S')}\n")
         sys.stderr.write(f"[DEBUG] Command: {' '.join(command[:3])}...\n")
         sys.stderr.flush()
 
         self.is_running = True
         self.exit_code = None
-        self.output_lines = []
+        self.output_history.clear()
+        self.scroll_offset = 0
+        self.search_match = None
+        self.search_status = ""
         self.current_task = "Initializing Ansible..."
         self.completed_tasks = 0
+        self.started_tasks = []
+        self.task_durations = {}
+        self.expected_total = None
+        self.expected_task_names = None
+
+        is_ansible = _is_ansible_command(command)
+        if estimate_key and is_ansible:
+            if self.estimator is None:
+                self.estimator = TaskEstimator()
+            estimate_thread = threading.Thread(
+                target=self._estimate_tasks, args=(command, env, estimate_key), name="ubootu-task-estimate"
+            )
+            estimate_thread.daemon = True
+            estimate_thread.start()
 
         # Use fullscreen mode with small margins
         dialog_height = self.height - 2
@@ -76,15 +143,18 @@ class ProgressDialog:
             new_lines_added = False
             while not self.output_queue.empty():
                 try:
-                    line = self.output_queue.get_nowait()
-                    self.output_lines.append(line)
-                    new_lines_added = True
-                    # Keep only last N lines that fit in dialog
-                    max_lines = dialog_height - 6
-                    if len(self.output_lines) > max_lines:
-                        self.output_lines = self.output_lines[-max_lines:]
+                    item = self.output_queue.get_nowait()
                 except queue.Empty:
                     break
+                # The Ansible reader hands over whole batches of lines
+                batch = item if isinstance(item, list) else [item]
+                self.output_history.extend(batch)
+                if self.scroll_offset:
+                    # Keep a scrolled-back view on the same lines
+                    self.scroll_offset += len(batch)
+                new_lines_added = True
+
+            max_output_lines = dialog_height - 7 if self.is_running else dialog_height - 4
 
             # Check if we need to redraw
             if (
@@ -103,12 +173,13 @@ class ProgressDialog:
                 # Skip the rest if nothing changed
                 self.stdscr.timeout(100)
                 key = self.stdscr.getch()
-                if key != -1 and not self.is_running:
-                    break
+                if key != -1 and not self._handle_output_key(key, max_output_lines, y + dialog_height - 3, x + 3):
+                    if not self.is_running:
+                        break
                 continue
 
             # Update tracking variables
-            self.last_output_count = len(self.output_lines)
+            self.last_output_count = len(self.output_history)
             self.last_task = self.current_task
             self.last_completed_tasks = self.completed_tasks
 
@@ -128,9 +199,7 @@ class ProgressDialog:
 
                 # Show task count and progress bar if available
                 if self.completed_tasks > 0:
-                    # Estimate total tasks (can be refined based on playbook analysis)
-                    estimated_total = max(self.completed_tasks + 10, 50)  # Rough estimate
-                    percentage = min(100, int((self.completed_tasks / estimated_total) * 100))
+                    percentage, eta = self._progress_estimate()
 
                     # Draw progress bar
                     bar_width = min(50, dialog_width - 20)
@@ -144,6 +213,8 @@ class ProgressDialog:
                     if self.failed_tasks > 0:
                         count_text += f", {self.failed_tasks} failed"
                     count_text += f" | {progress_bar}"
+                    if eta is not None:
+                        count_text += f" ETA {self._format_duration(eta)}"
 
                     try:
                         self.stdscr.addstr(task_y + 1, x + 3, count_text)
@@ -153,19 +224,14 @@ class ProgressDialog:
             # Adjust output area to make room for task info
             if show_output:
                 output_y = y + 5 if self.is_running else y + 2
-                max_output_lines = dialog_height - 7 if self.is_running else dialog_height - 4
-
-                # Keep only last N lines that fit
-                if len(self.output_lines) > max_output_lines:
-                    self.output_lines = self.output_lines[-max_output_lines:]
+                view_start = self._view_start(max_output_lines)
 
-                for i, line in enumerate(self.output_lines):
-                    if i >= max_output_lines:
-                        break
+                for i, line in enumerate(self.output_history.window(view_start, max_output_lines)):
                     # Truncate long lines to fit
                     display_line = line[: dialog_width - 6]
+                    attr = curses.A_REVERSE if view_start + i == self.search_match else curses.A_NORMAL
                     try:
-                        self.stdscr.addstr(output_y + i, x + 3, display_line)
+                        self.stdscr.addstr(output_y + i, x + 3, display_line, attr)
                     except curses.error:
                         pass
 
@@ -190,9 +256,19 @@ class ProgressDialog:
                     except:
                         self.stdscr.addstr(status_y, x + 3, status)
 
+            # Scrollback position or last search result, right of the status
+            scroll_text = self._scroll_status(max_output_lines)
+            if scroll_text:
+                try:
+                    self.stdscr.addstr(
+                        status_y, x + 3 + len(status) + 3, scroll_text[: dialog_width - len(status) - 12]
+                    )
+                except curses.error:
+                    pass
+
             # Draw continue prompt if done
             if not self.is_running:
-                prompt = "Press any key to continue..."
+                prompt = "PgUp/PgDn Scroll  / Search  Any other key to continue..."
                 prompt_y = y + dialog_height - 2
                 draw_centered_text(self.stdscr, prompt_y, prompt, x, dialog_width)
 
@@ -201,8 +277,9 @@ class ProgressDialog:
             # Check for user input
             self.stdscr.timeout(100)  # 100ms timeout
             key = self.stdscr.getch()
-            if key != -1 and not self.is_running:
-                break
+            if key != -1 and not self._handle_output_key(key, max_output_lines, status_y, x + 3):
+                if not self.is_running:
+                    break
 
         # Reset timeout
         self.stdscr.timeout(-1)
@@ -210,8 +287,155 @@ class ProgressDialog:
         # Wait for thread to complete
         cmd_thread.join(timeout=1.0)
 
+        # Learn task counts and durations from successful runs
+        if estimate_key and is_ansible and self.exit_code == 0 and self.estimator is not None:
+            try:
+                self.estimator.record_run(estimate_key, self._processed_tasks(), self.task_durations)
+            except Exception as e:
+                sys.stderr.write(f"[DEBUG] Could not record task history: {e}\n")
+                sys.stderr.flush()
+
         return self.exit_code if self.exit_code is not None else 1
 
+    def _view_start(self, page_size: int) -> int:
+        """Index of the first output line shown, clamping the scroll offset"""
+        total = len(self.output_history)
+        oldest = self.output_history.first_available
+        self.scroll_offset = max(0, min(self.scroll_offset, total - oldest - page_size))
+        return max(oldest, total - self.scroll_offset - page_size)
+
+    def _scroll_status(self, page_size: int) -> str:
+        if self.search_status:
+            return self.search_status
+        if not self.scroll_offset:
+            return ""
+        total = len(self.output_history)
+        start = self._view_start(page_size)
+        end = min(total, start + page_size)
+        return f"Lines {start + 1}-{end} of {total} (End to follow)"
+
+    def _handle_output_key(self, key: int, page_size: int, prompt_y: int, prompt_x: int) -> bool:
+        """Scrollback and search keys for the output area
+
+        Returns True if the key was used, so it doesn't also close the dialog.
+        """
+        page_size = max(1, page_size)
+        if key in (curses.KEY_PPAGE, curses.KEY_UP, ord("k")):
+            step = page_size if key == curses.KEY_PPAGE else 1
+            self.scroll_offset += step
+        elif key in (curses.KEY_NPAGE, curses.KEY_DOWN, ord("j")):
+            step = page_size if key == curses.KEY_NPAGE else 1
+            self.scroll_offset = max(0, self.scroll_offset - step)
+        elif key == curses.KEY_HOME:
+            self.scroll_offset = len(self.output_history)
+        elif key == curses.KEY_END:
+            self.scroll_offset = 0
+            self.search_match = None
+            self.search_status = ""
+        elif key == ord("/"):
+            text = self._prompt_search(prompt_y, prompt_x)
+            if text:
+                self.search_text = text
+                self._search_output(page_size, backwards=True)
+        elif key in (ord("n"), ord("N")) and self.search_text:
+            # n looks further back, N towards newer output
+            self._search_output(page_size, backwards=key == ord("n"))
+        else:
+            return False
+
+        self._view_start(page_size)
+        self.needs_redraw = True
+        return True
+
+    def _search_output(self, page_size: int, backwards: bool = True):
+        """Move the view to the next line matching search_text"""
+        if self.search_match is not None:
+            start = self.search_match - 1 if backwards else self.search_match + 1
+        else:
+            start = len(self.output_history) - 1 if backwards else self._view_start(page_size)
+
+        match = self.output_history.find(self.search_text, start, backwards) if start >= 0 else None
+        if match is None:
+            self.search_status = f"Not found: {self.search_text}"
+            return
+
+        self.search_match = match
+        self.search_status = f"Match at line {match + 1}: {self.search_text}"
+        # Put the match in the middle of the view where possible
+        end = min(len(self.output_history), match + page_size - page_size // 2)
+        self.scroll_offset = len(self.output_history) - end
+
+    def _prompt_search(self, y: int, x: int) -> Optional[str]:
+        """Read a search string on the status line; None if cancelled"""
+        text = ""
+        self.stdscr.timeout(-1)
+        try:
+            while True:
+                prompt = f"Search: {text}"
+                try:
+                    self.stdscr.move(y, x)
+                    self.stdscr.clrtoeol()
+                    self.stdscr.addstr(y, x, prompt[: self.width - x - 4])
+                except curses.error:
+                    pass
+                self.stdscr.refresh()
+
+                key = self.stdscr.getch()
+                if key in (10, 13, curses.KEY_ENTER):
+                    return text
+                if key == 27:  # ESC
+                    return None
+                if key in (curses.KEY_BACKSPACE, 127, 8):
+                    text = text[:-1]
+                elif 32 <= key < 127:
+                    text += chr(key)
+        finally:
+            self.stdscr.timeout(100)
+
+    def _estimate_tasks(self, command: List[str], env, estimate_key: str):
+        """Load the expected task list and duration history in the background"""
+        try:
+            self.duration_history = self.estimator.load_durations()
+            self.expected_task_names = self.estimator.expected_tasks(command, estimate_key, env)
+            self.expected_total = self.estimator.expected_count(command, estimate_key, env)
+            self.needs_redraw = True
+        except Exception as e:
+            sys.stderr.write(f"[DEBUG] Task estimate failed: {e}\n")
+            sys.stderr.flush()
+
+    def _processed_tasks(self) -> int:
+        """Task results seen so far, whatever their outcome"""
+        return self.completed_tasks + self.skipped_tasks + self.failed_tasks
+
+    def _progress_estimate(self) -> Tuple[int, Optional[float]]:
+        """Percentage done and seconds remaining (None if unknown)"""
+        processed = self._processed_tasks()
+        if not self.expected_total:
+            # No task list yet - rough guess that never claims to be nearly done
+            estimated_total = max(self.completed_tasks + 10, 50)
+            return min(100, int((self.completed_tasks / estimated_total) * 100)), None
+
+        # Includes and loops can add results beyond the listed tasks
+        total = max(self.expected_total, processed + 1)
+        percentage = min(99, int(processed / total * 100))
+
+        eta = None
+        if self.expected_task_names:
+            eta = TaskEstimator.estimate_remaining(
+                self.expected_task_names, self.started_tasks, self.duration_history, self.task_durations
+            )
+        return percentage, eta
+
+    @staticmethod
+    def _format_duration(seconds: float) -> str:
+        """Compact duration like 4m 05s"""
+        seconds = int(round(seconds))
+        if seconds >= 3600:
+            return f"{seconds // 3600}h {seconds % 3600 // 60:02d}m"
+        if seconds >= 60:
+            return f"{seconds // 60}m {seconds % 60:02d}s"
+        return f"{seconds}s"
+
     def _run_command_thread(self, command: List[str], sudo_dialog=None, env=None):
         """Run command in background thread"""
         try:
@@ -221,7 +445,7 @@ class ProgressDialog:
                 f.write(f"Command: {' '.join(command)}\n")
 
             # Special handling for ansible-playbook
-            if "ansible-playbook" in command[0]:
+            if _is_ansible_command(command):
                 self._run_ansible_playbook(command, env)
             else:
                 # Run non-ansible commands normally
@@ -310,8 +534,10 @@ class ProgressDialog:
         env["ANSIBLE_UNBUFFERED"] = "1"  # Unbuffered Ansible output
         env["ANSIBLE_PIPE_FAILURES"] = "False"  # Don't treat pipe failures as fatal
 
-        # Display task information with cleaner output
-        env["ANSIBLE_STDOUT_CALLBACK"] = "oneline"  # Single line output per task
+        # Progress is reported as JSON events on a dedicated pipe; stdout keeps warnings and errors
+        event_fds = self._open_event_pipe(env)
+        if not event_fds:
+            env["ANSIBLE_STDOUT_CALLBACK"] = "oneline"  # Single line output per task
         env["ANSIBLE_DISPLAY_SKIPPED_HOSTS"] = "True"  # Show skipped tasks (oneline keeps it compact)
         env["ANSIBLE_DISPLAY_OK_HOSTS"] = "True"  # Show OK tasks (oneline keeps it compact)
         # Don't set result format - let oneline handle it
@@ -327,6 +553,9 @@ class ProgressDialog:
         env["LANG"] = "C.UTF-8"  # Consistent locale
         env["LC_ALL"] = "C.UTF-8"
 
+        # Reuse facts gathered by earlier applies while they are fresh
+        FactCache().prepare(env)
+
         # Show initial messages
         self.output_queue.put("Starting Ansible configuration...")
         self.output_queue.put(f"Running command: {' '.join(command[:3])}...")
@@ -343,6 +572,10 @@ class ProgressDialog:
 
         # Use subprocess.Popen with proper pipe handling to prevent broken pipe errors
         # Set up process with explicit error handling
+        event_thread = None
+        # Reset before the event reader starts, since it counts and timestamps events too
+        self.lines_read = 0
+        self.last_activity_time = time.time()
         try:
             sys.stderr.write(f"[DEBUG] About to start subprocess.Popen at {time.strftime('%H:%M:%S')}\n")
             sys.stderr.flush()
@@ -352,13 +585,20 @@ class ProgressDialog:
                 stdout=subprocess.PIPE,
                 stderr=subprocess.STDOUT,
                 stdin=subprocess.DEVNULL,  # Prevent stdin issues
-                text=True,
-                bufsize=0,  # Unbuffered to prevent pipe blocking
-                universal_newlines=True,
+                bufsize=0,  # Raw pipe; output is read and decoded in bulk
                 env=env,
                 preexec_fn=os.setsid,  # Create new process group to prevent signal issues
+                pass_fds=(event_fds[1],) if event_fds else (),
             )
 
+            if event_fds:
+                # Only Ansible holds the write end now, so the reader sees EOF when it exits
+                os.close(event_fds[1])
+                event_thread = threading.Thread(
+                    target=self._consume_events, args=(event_fds[0],), name="ubootu-ansible-events", daemon=True
+                )
+                event_thread.start()
+
             sys.stderr.write(f"[DEBUG] Process started with PID: {process.pid}\n")
             sys.stderr.flush()
 
@@ -375,117 +615,65 @@ class ProgressDialog:
 
                 f.write(traceback.format_exc())
 
+            if event_fds:
+                for fd in event_fds:
+                    try:
+                        os.close(fd)
+                    except OSError:
+                        pass
+                self.events_enabled = False
+
             self.output_queue.put(f"ERROR: Failed to start Ansible process: {str(e)}")
             self.exit_code = 1
             return
 
-        # Read output line by line in real-time with improved timeout handling
-        last_output_time = time.time()
-        timeout_seconds = 300  # 5 minutes maximum (increased for large package updates)
+        # Read output in bulk from a non-blocking pipe, with improved timeout handling
+        timeout_seconds = ACTIVITY_TIMEOUT
         warning_threshold = 90  # Warn after 90 seconds of no output
         last_warning_time = 0
         task_start_time = time.time()
         max_total_time = 1800  # 30 minutes absolute maximum
-        lines_read = 0
+        waiting_hint_shown_at = None  # Activity time the waiting hint was last shown for
 
         sys.stderr.write(f"[DEBUG] Starting output read loop at {time.strftime('%H:%M:%S')}\n")
         sys.stderr.flush()
 
+        # One buffered handle for the whole run instead of reopening per line
+        try:
+            run_log = open(emergency_log, "a", buffering=READ_CHUNK_SIZE)
+        except OSError:
+            run_log = None
+
         try:
+            stdout_fd = process.stdout.fileno()
+            os.set_blocking(stdout_fd, False)
+            pending = bytearray()
+
             while True:
                 try:
-                    # Read line with timeout protection
-                    line = process.stdout.readline()
-                    if not line:
-                        # Check if process is still running
-                        poll_result = process.poll()
-                        if poll_result is not None:
-                            # Process has terminated
-                            sys.stderr.write(f"[DEBUG] Process terminated with code: {poll_result}\n")
-                            sys.stderr.flush()
-
-                            # If no lines were read, this is suspicious
-                            if lines_read == 0:
-                                self.output_queue.put("ERROR: Process exited without producing any output")
-                                self.output_queue.put(f"Exit code was: {poll_result}")
-                                self.exit_code = poll_result
-
-                            # Process has terminated, drain any remaining output
-                            remaining = process.stdout.read()
-                            if remaining:
-                                for remaining_line in remaining.splitlines():
-                                    if remaining_line.strip():
-                                        self.output_queue.put(remaining_line.strip())
-                            break
-                        # Empty line but process still running
-                        time.sleep(0.1)
-                        continue
-
-                    # Check if this is a hung process waiting for password
-                    current_time = time.time()
-                    if current_time - last_output_time > 5 and current_time - last_output_time < 10:
-                        # Check if ansible is waiting for password
+                    ready, _, _ = select.select([stdout_fd], [], [], READ_POLL_INTERVAL)
+                    chunk = b""
+                    if ready:
                         try:
-                            # Non-blocking check of process state
-                            import select
-
-                            if process.stdout and select.select([process.stdout], [], [], 0)[0]:
-                                # There's data available, continue normally
-                                pass
-                            else:
-                                # No data available, might be waiting
-                                if process.poll() is None:
-                                    # Process still running but no output
-                                    self.output_queue.put("INFO: Process appears to be waiting...")
-                                    self.output_queue.put("If stuck at password prompt, check sudo configuration")
-                        except:
-                            pass
-                        continue
+                            chunk = os.read(stdout_fd, READ_CHUNK_SIZE)
+                        except BlockingIOError:
+                            chunk = None
+                        if chunk == b"":
+                            # EOF - every writer has closed the pipe
+                            break
+                    elif process.poll() is not None:
+                        # Exited, but something it spawned may still hold the pipe open
+                        sys.stderr.write(f"[DEBUG] Process terminated with code: {process.returncode}\n")
+                        sys.stderr.flush()
+                        break
 
-                    if line:
-                        line = line.rstrip()
-                        if line:
-                            lines_read += 1
-                            last_output_time = time.time()
-
-                            # Skip ANSI escape sequences
-                            import re
-
-                            clean_line = re.sub(r"\x1b\[[0-9;]*m", "", line)
-
-                            # DEBUG: Log first few lines and any errors
-                            if lines_read <= 5 or "error" in clean_line.lower() or "fail" in clean_line.lower():
-                                sys.stderr.write(f"[DEBUG] Line {lines_read}: {clean_line[:100]}\n")
-                                sys.stderr.flush()
-
-                            # Skip massive facts output to prevent overflow
-                            if '"ansible_facts"' in clean_line or len(clean_line) > 500:
-                                # For very long lines (facts), just show a summary
-                                if '"ansible_facts"' in clean_line:
-                                    sys.stderr.write(f"[DEBUG] Skipping facts line, length: {len(clean_line)}\n")
-                                    sys.stderr.flush()
-                                    self.output_queue.put("✓ Gathered system facts")
-                                    self.current_task = "System facts gathered"
-                                elif "SUCCESS" in clean_line and len(clean_line) > 500:
-                                    # This is likely a facts SUCCESS line with JSON
-                                    self.output_queue.put("✓ Facts gathering completed")
-                                # Skip the actual facts data
-                                continue
-
-                            # Parse ansible output and decide what to show
-                            formatted_line = self._parse_ansible_output(clean_line)
-                            if formatted_line:
-                                self.output_queue.put(formatted_line)
-                            elif not self._should_suppress_line(clean_line):
-                                # Only show the line if it's not suppressed
-                                self.output_queue.put(clean_line)
-
-                            # Debug log output
-                            try:
-                                with open("/tmp/ubootu_emergency.log", "a") as f:
-                                    f.write(f"[{time.strftime('%H:%M:%S')}] {clean_line}\n")
-                            except:
-                                pass
+                    if chunk:
+                        pending += chunk
+                        end = pending.rfind(b"\n")
+                        if end != -1:
+                            text = pending[:end].decode("utf-8", "replace")
+                            del pending[: end + 1]
+                            self._ingest_output(text, run_log)
 
                 except (IOError, BrokenPipeError) as e:
                     # Handle broken pipe errors gracefully
@@ -501,10 +689,21 @@ class ProgressDialog:
                         raise
 
                 # Check for warnings and timeouts
+                # Output and events both count as activity; with events on, stdout is mostly silent
                 current_time = time.time()
-                time_since_output = current_time - last_output_time
+                time_since_output = current_time - self.last_activity_time
                 total_time = current_time - task_start_time
 
+                # Quiet early on usually means a prompt nobody can answer
+                if (
+                    5 < time_since_output < 10
+                    and waiting_hint_shown_at != self.last_activity_time
+                    and process.poll() is None
+                ):
+                    self.output_queue.put("INFO: Process appears to be waiting...")
+                    self.output_queue.put("If stuck at password prompt, check sudo configuration")
+                    waiting_hint_shown_at = self.last_activity_time
+
                 # Show warning for slow operations
                 if time_since_output > warning_threshold and current_time - last_warning_time > warning_threshold:
                     self.output_queue.put(f"INFO: Task running for {time_since_output:.0f}s - {self.current_task}")
@@ -523,7 +722,7 @@ class ProgressDialog:
 
                 # No output timeout (5 minutes)
                 if time_since_output > timeout_seconds:
-                    self.output_queue.put(f"ERROR: No output for {timeout_seconds} seconds")
+                    self.output_queue.put(f"ERROR: No output or progress for {timeout_seconds} seconds")
                     self.output_queue.put(f"Current task: {self.current_task}")
                     self.output_queue.put("This usually indicates the process is stuck waiting for input.")
                     self.output_queue.put("Terminating process...")
@@ -539,11 +738,25 @@ class ProgressDialog:
                     self.exit_code = -1
                     return
 
+            # Whatever is left without a trailing newline
+            if pending:
+                self._ingest_output(pending.decode("utf-8", "replace"), run_log)
+
+            if self.lines_read == 0:
+                # If no lines were read, this is suspicious
+                exit_code = process.wait()
+                self.output_queue.put("ERROR: Process exited without producing any output")
+                self.output_queue.put(f"Exit code was: {exit_code}")
+                self.exit_code = exit_code
+
         except Exception as e:
             self.output_queue.put(f"ERROR reading output: {str(e)}")
             self.output_queue.put("This may indicate a configuration or permission issue")
             self.exit_code = 1
             return
+        finally:
+            if run_log is not None:
+                run_log.close()
 
         # Wait for process to complete and get exit code
         try:
@@ -556,8 +769,12 @@ class ProgressDialog:
         # Now wait for process to fully terminate
         self.exit_code = process.wait()
 
+        # Let the last events (play recap) land before the summary is built
+        if event_thread is not None:
+            event_thread.join(timeout=2.0)
+
         sys.stderr.write(f"[DEBUG] Process exited with code: {self.exit_code}\n")
-        sys.stderr.write(f"[DEBUG] Total lines read: {lines_read}\n")
+        sys.stderr.write(f"[DEBUG] Total lines read: {self.lines_read}\n")
         sys.stderr.flush()
 
         # Log final exit code
@@ -565,7 +782,7 @@ class ProgressDialog:
             with open("/tmp/ubootu_emergency.log", "a") as f:
                 f.write(f"\n[{time.strftime('%H:%M:%S')}] === Process completed ===\n")
                 f.write(f"Exit code: {self.exit_code}\n")
-                f.write(f"Lines read: {lines_read}\n")
+                f.write(f"Lines read: {self.lines_read}\n")
                 f.write(f"Timestamp: {time.strftime('%Y-%m-%d %H:%M:%S')}\n")
         except:
             pass
@@ -574,6 +791,66 @@ class ProgressDialog:
         if self.exit_code != 0:
             self.output_queue.put(f"\nDEBUG: Ansible exited with code {self.exit_code}")
 
+    def _ingest_output(self, text: str, run_log=None) -> bool:
+        """Filter a block of complete output lines and queue them as one batch
+
+        Returns True if the block contained any non-empty lines.
+        """
+        # Strip ANSI escape sequences from the whole block at once
+        lines = [line.rstrip() for line in _ANSI_ESCAPE_RE.sub("", text).split("\n")]
+        lines = [line for line in lines if line]
+        if not lines:
+            return False
+
+        first_line = self.lines_read
+        self.lines_read += len(lines)
+        self.last_activity_time = time.time()
+
+        # DEBUG: Log the first few lines
+        for number, clean_line in enumerate(lines[: max(0, 5 - first_line)], first_line + 1):
+            sys.stderr.write(f"[DEBUG] Line {number}: {clean_line[:100]}\n")
+        sys.stderr.flush()
+
+        batch = []
+        for clean_line in lines:
+            # Skip massive facts output to prevent overflow
+            if '"ansible_facts"' in clean_line or len(clean_line) > 500:
+                # For very long lines (facts), just show a summary
+                if '"ansible_facts"' in clean_line:
+                    batch.append("✓ Gathered system facts")
+                    self.current_task = "System facts gathered"
+                elif "SUCCESS" in clean_line:
+                    # This is likely a facts SUCCESS line with JSON
+                    batch.append("✓ Facts gathering completed")
+                # Skip the actual facts data
+                continue
+
+            if self.events_enabled:
+                # Task results arrive as events; stdout only carries warnings and errors
+                batch.append(clean_line)
+                continue
+
+            # Parse ansible output and decide what to show
+            formatted_line = self._parse_ansible_output(clean_line)
+            if formatted_line:
+                batch.append(formatted_line)
+            elif not self._should_suppress_line(clean_line):
+                # Only show the line if it's not suppressed
+                batch.append(clean_line)
+
+        if batch:
+            self.output_queue.put(batch)
+
+        # Debug log output, one buffered write per block
+        if run_log is not None:
+            timestamp = time.strftime("%H:%M:%S")
+            try:
+                run_log.write("".join(f"[{timestamp}] {line}\n" for line in lines))
+            except (OSError, ValueError):
+                pass
+
+        return True
+
     def _run_regular_command(self, command: List[str], env=None):
         """Run regular (non-ansible) commands"""
         # Set up environment
@@ -660,41 +937,7 @@ class ProgressDialog:
             if match:
                 task_name = match.group(1)
                 self.current_task_name = task_name  # Store for categorization
-                # Make task names more user-friendly
-                if "Gathering Facts" in task_name:
-                    self.current_task = "Gathering system information..."
-                elif "apt" in task_name.lower():
-                    if "update" in task_name.lower():
-                        if "retry" in task_name.lower():
-                            self.current_task = "Retrying package list update..."
-                        else:
-                            self.current_task = "Updating package lists..."
-                    elif "install" in task_name.lower():
-                        # Try to extract package name
-                        if ":" in task_name:
-                            pkg_part = task_name.split(":")[-1].strip()
-                            self.current_task = f"Installing {pkg_part}..."
-                        else:
-                            self.current_task = "Installing packages..."
-                elif "git" in task_name.lower():
-                    self.current_task = "Cloning repositories..."
-                elif "file" in task_name.lower() or "directory" in task_name.lower():
-                    self.current_task = "Creating directories..."
-                elif "template" in task_name.lower():
-                    self.current_task = "Configuring applications..."
-                elif "service" in task_name.lower():
-                    self.current_task = "Managing services..."
-                elif "download" in task_name.lower() or "get_url" in task_name.lower():
-                    self.current_task = "Downloading files..."
-                else:
-                    # Clean up the task name - keep it concise
-                    clean_name = task_name
-                    if ":" in clean_name:
-                        clean_name = clean_name.split(":")[-1].strip()
-                    # Truncate long task names
-                    if len(clean_name) > 50:
-                        clean_name = clean_name[:47] + "..."
-                    self.current_task = clean_name + "..." if not clean_name.endswith("...") else clean_name
+                self.current_task = self._describe_task(task_name)
         # Check for ok/changed/failed - handle lines with timestamps like "[16:11:58] ok: [localhost]"
         elif " ok: " in line or line.startswith("ok: "):
             self.completed_tasks += 1
@@ -789,6 +1032,171 @@ class ProgressDialog:
         # Return None to indicate no custom formatting needed
         return None
 
+    def _describe_task(self, task_name: str) -> str:
+        """User-friendly description of what a task is doing"""
+        lower_name = task_name.lower()
+        if "Gathering Facts" in task_name:
+            return "Gathering system information..."
+        elif "apt" in lower_name:
+            if "update" in lower_name:
+                if "retry" in lower_name:
+                    return "Retrying package list update..."
+                return "Updating package lists..."
+            elif "install" in lower_name:
+                # Try to extract package name
+                if ":" in task_name:
+                    pkg_part = task_name.split(":")[-1].strip()
+                    return f"Installing {pkg_part}..."
+                return "Installing packages..."
+            return self.current_task
+        elif "git" in lower_name:
+            return "Cloning repositories..."
+        elif "file" in lower_name or "directory" in lower_name:
+            return "Creating directories..."
+        elif "template" in lower_name:
+            return "Configuring applications..."
+        elif "service" in lower_name:
+            return "Managing services..."
+        elif "download" in lower_name or "get_url" in lower_name:
+            return "Downloading files..."
+
+        # Clean up the task name - keep it concise
+        clean_name = task_name
+        if ":" in clean_name:
+            clean_name = clean_name.split(":")[-1].strip()
+        # Truncate long task names
+        if len(clean_name) > 50:
+            clean_name = clean_name[:47] + "..."
+        return clean_name + "..." if not clean_name.endswith("...") else clean_name
+
+    def _open_event_pipe(self, env: Dict[str, str]) -> Optional[tuple]:
+        """Create the pipe the bundled callback writes events to and point Ansible at it
+
+        Returns (read_fd, write_fd), or None to fall back to parsing stdout.
+        """
+        self.events_enabled = False
+        if not (EVENT_CALLBACK_DIR / f"{EVENT_CALLBACK_NAME}.py").exists():
+            return None
+
+        try:
+            read_fd, write_fd = os.pipe()
+        except OSError as e:
+            sys.stderr.write(f"[DEBUG] Could not create event pipe: {e}\n")
+            sys.stderr.flush()
+            return None
+
+        plugin_paths = [str(EVENT_CALLBACK_DIR)]
+        if env.get("ANSIBLE_CALLBACK_PLUGINS"):
+            plugin_paths.append(env["ANSIBLE_CALLBACK_PLUGINS"])
+        env["ANSIBLE_CALLBACK_PLUGINS"] = os.pathsep.join(plugin_paths)
+        env["ANSIBLE_STDOUT_CALLBACK"] = EVENT_CALLBACK_NAME
+        env["UBOOTU_EVENT_FD"] = str(write_fd)
+
+        self.events_enabled = True
+        return read_fd, write_fd
+
+    def _consume_events(self, read_fd: int):
+        """Read JSON events from the callback pipe until Ansible closes it"""
+        try:
+            with os.fdopen(read_fd, "r", encoding="utf-8", errors="replace") as events:
+                for line in events:
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        continue
+                    if isinstance(event, dict):
+                        self._handle_event(event)
+        except Exception as e:
+            sys.stderr.write(f"[DEBUG] Event stream error: {e}\n")
+            sys.stderr.flush()
+
+    def _handle_event(self, event: Dict[str, Any]):
+        """Update counters and output from one callback event"""
+        self.lines_read += 1
+        self.last_activity_time = time.time()
+        kind = event.get("event")
+
+        if kind == "play_start":
+            self.current_task = "Starting configuration..."
+        elif kind == "task_start":
+            self.current_task_name = event.get("task", "")
+            self.started_tasks.append(self.current_task_name)
+            self.current_task = self._describe_task(self.current_task_name)
+        elif kind == "result":
+            self._handle_result_event(event)
+        elif kind == "item":
+            line = self._format_event_line(event)
+            if line:
+                self.output_queue.put(line)
+        elif kind == "stats":
+            self.current_task = "Finalizing configuration..."
+
+    def _handle_result_event(self, event: Dict[str, Any]):
+        """Count one task result for one host"""
+        status = event.get("status")
+        task_name = event.get("task", "")
+
+        if "duration" in event:
+            self.task_durations[task_name] = self.task_durations.get(task_name, 0.0) + float(event["duration"])
+
+        if status in ("ok", "changed") or (status == "failed" and event.get("ignore_errors")):
+            self.completed_tasks += 1
+            self._categorize_success(task_name)
+        elif status in ("failed", "unreachable"):
+            self.failed_tasks += 1
+            self._categorize_failure(task_name)
+        elif status == "skipped":
+            self.skipped_tasks += 1
+            self._categorize_skip(self._skip_category(event))
+
+        # Loop results were already shown item by item
+        if not event.get("loop"):
+            line = self._format_event_line(event)
+            if line:
+                self.output_queue.put(line)
+
+    def _skip_category(self, event: Dict[str, Any]) -> str:
+        """Summary category for a skipped result"""
+        condition = event.get("false_condition", "")
+        if not condition:
+            return "Other conditions"
+        if "selected_items" in condition:
+            return "Not selected in menu"
+        if "desktop_environment" in condition:
+            return "Desktop environment mismatch"
+        if "enable_" in condition or "install_" in condition:
+            return "Feature not enabled"
+        return "Conditional check failed"
+
+    def _format_event_line(self, event: Dict[str, Any]) -> Optional[str]:
+        """Output line for a result or item event, in the same style as the oneline parser"""
+        task_display = event.get("task", "")
+        if ":" in task_display:
+            task_display = task_display.split(":")[-1].strip()
+        if "item" in event:
+            task_display = f"{task_display}: {event['item']}"
+
+        status = event.get("status")
+        if status == "ok":
+            return f"OK [{task_display}]"
+        if status == "changed":
+            return f"CHANGED [{task_display}]"
+        if status == "skipped":
+            reasons = {
+                "Not selected in menu": "Not selected",
+                "Desktop environment mismatch": "Wrong desktop environment",
+                "Feature not enabled": "Feature disabled",
+                "Conditional check failed": "Condition failed",
+            }
+            return f"SKIPPED [{task_display}] - {reasons.get(self._skip_category(event), 'Condition not met')}"
+        if status in ("failed", "unreachable"):
+            error_msg = event.get("msg", "")
+            if len(error_msg) > 50:
+                error_msg = error_msg[:47] + "..."
+            prefix = "IGNORED" if event.get("ignore_errors") else "FAILED"
+            return f"{prefix} [{task_display}]" + (f" - {error_msg}" if error_msg else "")
+        return None
+
     def _should_suppress_line(self, line: str) -> bool:
         """Determine if a line should be suppressed from output"""
         # Don't suppress our formatted lines
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Selection state for the unified TUI
+Keeps the config.yml selection layout plus incrementally maintained counters
+"""
+
+from collections.abc import MutableMapping
+from typing import Dict, FrozenSet, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+from .menu_catalog import MenuCatalog
+
+
+class SelectionState(MutableMapping):
+    """Mapping of selection entries with O(1) membership and category counts
+
+    Entries use the same layout config.yml is saved from:
+    - item_id -> True/False for items selected directly
+    - category_id -> set of selected item ids for items selected through a category
+
+    Set values are handed out as frozensets; use add() and discard() to change them
+    so the counters stay in step.
+    """
+
+    def __init__(self, entries: Optional[Dict[str, Union[bool, Iterable[str]]]] = None):
+        self._entries: Dict[str, Union[bool, Set[str]]] = {}
+        # item id -> entry keys currently selecting it
+        self._owners: Dict[str, Set[str]] = {}
+        # category id -> number of selected descendant items
+        self._category_counts: Dict[str, int] = {}
+        self._catalog: Optional[MenuCatalog] = None
+
+        if entries:
+            self.update(entries)
+
+    # Mapping interface
+
+    def __getitem__(self, key: str) -> Union[bool, FrozenSet[str]]:
+        value = self._entries[key]
+        if isinstance(value, set):
+            return frozenset(value)
+        return value
+
+    def __setitem__(self, key: str, value: Union[bool, Iterable[str]]) -> None:
+        if key in self._entries:
+            del self[key]
+
+        if isinstance(value, (set, frozenset, list, tuple)):
+            members = set(value)
+            self._entries[key] = members
+            for item_id in members:
+                self._acquire(item_id, key)
+        else:
+            self._entries[key] = bool(value)
+            if value:
+                self._acquire(key, key)
+
+    def __delitem__(self, key: str) -> None:
+        value = self._entries.pop(key)
+        if isinstance(value, set):
+            for item_id in value:
+                self._release(item_id, key)
+        elif value:
+            self._release(key, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __repr__(self) -> str:
+        return f"SelectionState({self._entries!r})"
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._owners.clear()
+        self._category_counts.clear()
+
+    # Incremental updates
+
+    def add(self, key: str, item_id: str) -> None:
+        """Add item_id to the set stored under key, creating it if needed"""
+        members = self._entries.get(key)
+        if not isinstance(members, set):
+            if key in self._entries:
+                del self[key]
+            members = set()
+            self._entries[key] = members
+        if item_id not in members:
+            members.add(item_id)
+            self._acquire(item_id, key)
+
+    def discard(self, item_ids: Iterable[str], keep: Optional[str] = None) -> None:
+        """Deselect item_ids wherever they are stored
+
+        Sets left empty are dropped and direct selections become False. The entry
+        named by keep, if any, is left untouched.
+        """
+        for item_id in item_ids:
+            owners = self._owners.get(item_id)
+            if not owners:
+                continue
+            for key in list(owners):
+                if key == keep:
+                    continue
+                value = self._entries[key]
+                if isinstance(value, set):
+                    value.discard(item_id)
+                    self._release(item_id, key)
+                    if not value:
+                        del self._entries[key]
+                else:
+                    self._entries[key] = False
+                    self._release(item_id, key)
+
+    # Queries
+
+    def is_selected(self, item_id: str) -> bool:
+        """Check if an item is selected directly or through any category"""
+        return bool(self._owners.get(item_id))
+
+    def selected_items(self) -> Set[str]:
+        """Get every selected item id"""
+        return set(self._owners)
+
+    def config_items(self) -> List[str]:
+        """Get ids in config.yml order: category ids followed by their items, direct selections as-is"""
+        result = []
+        for key, value in self._entries.items():
+            if isinstance(value, set):
+                result.append(key)
+                result.extend(value)
+            elif value:
+                result.append(key)
+        return result
+
+    def bind(self, catalog: MenuCatalog) -> None:
+        """Attach the catalog used for category counts, recounting if it changed"""
+        if catalog is self._catalog:
+            return
+
+        self._catalog = catalog
+        self._category_counts = {}
+        for item_id, owners in self._owners.items():
+            if owners:
+                for category_id in catalog.categories_containing(item_id):
+                    self._category_counts[category_id] = self._category_counts.get(category_id, 0) + 1
+
+    def counts(self, category_id: str) -> Tuple[int, int]:
+        """Get (selected, total) descendant item counts for a category"""
+        if self._catalog is None:
+            return 0, 0
+        total = len(self._catalog.descendant_leaves(category_id))
+        return self._category_counts.get(category_id, 0), total
+
+    def _acquire(self, item_id: str, key: str) -> None:
+        owners = self._owners.get(item_id)
+        if owners is None:
+            owners = self._owners[item_id] = set()
+        newly_selected = not owners
+        owners.add(key)
+        if newly_selected and self._catalog is not None:
+            for category_id in self._catalog.categories_containing(item_id):
+                self._category_counts[category_id] = self._category_counts.get(category_id, 0) + 1
+
+    def _release(self, item_id: str, key: str) -> None:
+        owners = self._owners.get(item_id)
+        if not owners or key not in owners:
+            return
+        owners.discard(key)
+        if not owners:
+            del self._owners[item_id]
+            if self._catalog is not None:
+                for category_id in self._catalog.categories_containing(item_id):
+                    self._category_counts[category_id] -= 1
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Task count and duration estimates for Ansible runs
+Feeds the progress bar percentage and ETA in ProgressDialog
+"""
+
+import hashlib
+import json
+import os
+import subprocess
+import tempfile
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from .menu_cache import get_cache_dir
+
+# How many configurations keep a cached task list
+MAX_CACHED_PLANS = 20
+
+# Weight of the newest run when updating a task's historical duration
+DURATION_WEIGHT = 0.5
+
+LIST_TASKS_TIMEOUT = 120
+
+
+def _read_json(path: Path) -> Dict:
+    try:
+        with open(path, "r") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _write_json(path: Path, data: Dict) -> None:
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(prefix=f".{path.name}-", dir=str(path.parent))
+    except OSError:
+        return
+
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f)
+        os.replace(temp_path, path)
+    except (OSError, TypeError, ValueError):
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+
+
+def parse_task_list(output: str) -> List[str]:
+    """Task names from `ansible-playbook --list-tasks` output, in run order"""
+    tasks = []
+    in_tasks = False
+    tasks_indent = 0
+
+    for line in output.splitlines():
+        stripped = line.strip()
+        if not stripped:
+            continue
+
+        indent = len(line) - len(line.lstrip())
+        if stripped == "tasks:":
+            in_tasks = True
+            tasks_indent = indent
+            continue
+
+        if in_tasks and indent > tasks_indent:
+            # "role : task name<TAB>TAGS: [...]"
+            name = stripped.split("TAGS:")[0].strip()
+            if name:
+                tasks.append(name)
+        else:
+            in_tasks = False
+
+    return tasks
+
+
+class TaskEstimator:
+    """Expected task list per configuration and per-task historical durations"""
+
+    def __init__(self, cache_dir: Optional[Path] = None, playbook_dir: Optional[Path] = None):
+        self.cache_dir = Path(cache_dir) if cache_dir else get_cache_dir()
+        self.playbook_dir = Path(playbook_dir) if playbook_dir else Path(".")
+        self.plans_file = self.cache_dir / "task_plans.json"
+        self.durations_file = self.cache_dir / "task_durations.json"
+
+    def plan_key(self, config_hash: str) -> str:
+        """Cache key for a configuration and the current playbook and role files"""
+        digest = hashlib.sha256(config_hash.encode())
+        paths = [self.playbook_dir / "site.yml"]
+        roles_dir = self.playbook_dir / "roles"
+        if roles_dir.is_dir():
+            paths.extend(sorted(roles_dir.glob("*/tasks/*.yml")))
+            paths.extend(sorted(roles_dir.glob("*/meta/main.yml")))
+
+        for path in paths:
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            digest.update(f"{path}:{st.st_mtime_ns}:{st.st_size}\n".encode())
+        return digest.hexdigest()
+
+    def expected_tasks(self, command: List[str], config_hash: str, env: Optional[Dict] = None) -> Optional[List[str]]:
+        """Task names the playbook is expected to run, from cache or `--list-tasks`
+
+        Returns None if the task list could not be determined.
+        """
+        key = self.plan_key(config_hash)
+        plan = _read_json(self.plans_file).get(key)
+        if isinstance(plan, dict) and isinstance(plan.get("tasks"), list):
+            return plan["tasks"]
+
+        tasks = self._list_tasks(command, env)
+        if tasks is not None:
+            self._store_plan(key, {"tasks": tasks})
+        return tasks
+
+    def expected_count(self, command: List[str], config_hash: str, env: Optional[Dict] = None) -> Optional[int]:
+        """Number of task results to expect, preferring the count seen on the last identical run
+
+        Dynamic includes and loops are invisible to `--list-tasks`, so the
+        recorded count from a finished run is more accurate when there is one.
+        """
+        plan = _read_json(self.plans_file).get(self.plan_key(config_hash))
+        if isinstance(plan, dict) and isinstance(plan.get("actual"), int):
+            return plan["actual"]
+
+        tasks = self.expected_tasks(command, config_hash, env)
+        return len(tasks) if tasks is not None else None
+
+    def record_run(self, config_hash: str, task_results: int, durations: Dict[str, float]) -> None:
+        """Remember how many task results a finished run produced and how long its tasks took"""
+        key = self.plan_key(config_hash)
+        plan = _read_json(self.plans_file).get(key)
+        plan = plan if isinstance(plan, dict) else {}
+        plan["actual"] = task_results
+        self._store_plan(key, plan)
+
+        history = self.load_durations()
+        for task_name, seconds in durations.items():
+            previous = history.get(task_name)
+            if previous is None:
+                history[task_name] = round(seconds, 3)
+            else:
+                history[task_name] = round(DURATION_WEIGHT * seconds + (1 - DURATION_WEIGHT) * previous, 3)
+        _write_json(self.durations_file, history)
+
+    def load_durations(self) -> Dict[str, float]:
+        """Historical seconds per task name"""
+        return {
+            name: float(seconds)
+            for name, seconds in _read_json(self.durations_file).items()
+            if isinstance(seconds, (int, float))
+        }
+
+    @staticmethod
+    def estimate_remaining(
+        expected: List[str],
+        started: Iterable[str],
+        history: Dict[str, float],
+        current_durations: Optional[Dict[str, float]] = None,
+    ) -> Optional[float]:
+        """Seconds left for the expected tasks that have not started yet
+
+        Tasks without history are costed at the average known duration.
+        Returns None when there is nothing to base an estimate on.
+        """
+        known = list(history.values()) or list((current_durations or {}).values())
+        if not known:
+            return None
+        average = sum(known) / len(known)
+
+        remaining = Counter(expected)
+        remaining.subtract(Counter(started))
+        return sum(history.get(name, average) * count for name, count in remaining.items() if count > 0)
+
+    def _list_tasks(self, command: List[str], env: Optional[Dict]) -> Optional[List[str]]:
+        # Same playbook, inventory and extra vars; only listing, so drop output-only flags
+        list_command = [arg for arg in command if arg not in ("--diff", "-v", "-vv", "-vvv")] + ["--list-tasks"]
+        run_env = os.environ.copy()
+        if env:
+            run_env.update(env)
+
+        try:
+            result = subprocess.run(
+                list_command,
+                capture_output=True,
+                text=True,
+                check=True,
+                timeout=LIST_TASKS_TIMEOUT,
+                env=run_env,
+                stdin=subprocess.DEVNULL,
+            )
+        except (OSError, subprocess.CalledProcessError, subprocess.TimeoutExpired):
+            return None
+
+        tasks = parse_task_list(result.stdout)
+        return tasks or None
+
+    def _store_plan(self, key: str, plan: Dict) -> None:
+        plans = _read_json(self.plans_file)
+        plans.pop(key, None)
+        plans[key] = plan
+        # Oldest entries first; drop them beyond the limit
+        while len(plans) > MAX_CACHED_PLANS:
+            plans.pop(next(iter(plans)))
+        _write_json(self.plans_file, plans)
@@ -7,26 +7,37 @@ Single consistent curses-based menu implementation
 import curses
 import time
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Set, Union
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
 
 import yaml
 
 from .constants import *
+from .config_writer import ConfigWriter
 from .dialogs import ConfirmDialog, HelpDialog, MessageDialog, SelectDialog, SliderDialog, SpinnerDialog
-from .menu_items import load_menu_structure
+from .menu_cache import load_menu_structure
+from .menu_catalog import MenuCatalog
 from .progress_dialog import ProgressDialog
+from .selection_state import SelectionState
 from .sudo_dialog import SudoDialog
 from .utils import *
 
 # Import missing dependencies
 try:
-    from .menu_items import load_menu_structure
+    from .menu_cache import load_menu_structure
 except ImportError:
     # Fallback for testing
     def load_menu_structure():
         return []
 
 
+try:
+    from ..delta_planner import load_config, plan_delta
+    from ..role_scheduler import scheduled_command
+except ImportError:
+    # Loaded as the top-level tui package, with lib/ itself on sys.path
+    from delta_planner import load_config, plan_delta
+    from role_scheduler import scheduled_command
+
 # Import system discovery for package detection
 try:
     import os
@@ -52,7 +63,7 @@ class UnifiedMenu:
         # Menu state
         self.current_menu = "root"
         self.current_index = 0
-        self.selections: Dict[str, Union[bool, Set[str]]] = {}
+        self.selections = SelectionState()
         self.configurable_values: Dict[str, Any] = {}
         self.breadcrumb: List[str] = ["Root"]
 
@@ -60,22 +71,42 @@ class UnifiedMenu:
         self.items: List[Dict] = []
         self.menu_stack: List[str] = []
         self.category_items: Dict[str, Set[str]] = {}
+        self._catalog: Optional[MenuCatalog] = None
 
         # Configuration
         self.config_file = "config.yml"
+        self._config_writer = ConfigWriter(AUTOSAVE_DELAY)
 
         # Track application state
         self.config_applied = False  # Track if current config was applied
         self.applied_config_hash = None  # Hash of last applied config
         self.saved_config_hash = None  # Hash of last saved config
+        self.applied_data_hash = None  # Hash of the selections in the last applied config
         self.changes_since_apply = False  # Track if any changes made since last apply
         self.applied_state_file = ".ubootu_applied.yml"  # File to store last applied config
 
         # System discovery
-        self.discovery = SystemDiscovery() if SystemDiscovery else None
+        self.discovery = SystemDiscovery(use_cache=True) if SystemDiscovery else None
         self.system_state = {}  # Current system state
+        self._discovery_future = None  # Background scan started by start_system_scan
+        self.removal_plan = None  # Last strict-mode removal plan, with reasons for kept packages
         self.operation_mode = "additive"  # 'additive' or 'strict'
 
+        # "/" search mode: query typed so far, matching items and the highlighted result
+        self.search_active = False
+        self.search_query = ""
+        self.search_results: List[Dict] = []
+        self.search_index = 0
+
+        # Rendering: sub-windows for each screen region and what was last drawn in them
+        self.header_win = None
+        self.list_win = None
+        self.help_win = None
+        self._full_redraw = True
+        self._header_state: Optional[Tuple] = None
+        self._help_state: Optional[Tuple] = None
+        self._row_cache: Dict[int, Tuple[str, bool]] = {}
+
         # Initialize curses
         try:
             curses.curs_set(0)  # Hide cursor
@@ -89,13 +120,29 @@ class UnifiedMenu:
 
         # Build category mappings AFTER items are fully loaded
         # This ensures we get the final children arrays, not the initial empty ones
-        self.category_items = {}
-        for item in self.items:
-            if item.get("is_category"):
-                # Get all children (both categories and items)
-                children = item.get("children", [])
-                if children:
-                    self.category_items[item["id"]] = set(children)
+        self._catalog = MenuCatalog(self.items)
+        self.category_items = self._catalog.category_items
+
+    @property
+    def catalog(self) -> MenuCatalog:
+        """Index over the current items, rebuilt whenever items or category_items are replaced"""
+        catalog = getattr(self, "_catalog", None)
+        if catalog is None or catalog.items is not self.items or catalog.category_items is not self.category_items:
+            catalog = MenuCatalog(self.items, self.category_items)
+            self._catalog = catalog
+        return catalog
+
+    @property
+    def selections(self) -> SelectionState:
+        """Current selections; assigning a plain dict converts it to a SelectionState"""
+        state = getattr(self, "_selections", None)
+        if state is None:
+            state = self._selections = SelectionState()
+        return state
+
+    @selections.setter
+    def selections(self, value: Dict[str, Union[bool, Set[str]]]) -> None:
+        self._selections = value if isinstance(value, SelectionState) else SelectionState(value)
 
     def load_defaults(self) -> None:
         """Load default selections from menu items"""
@@ -108,9 +155,7 @@ class UnifiedMenu:
 
                 if parent and parent in self.category_items:
                     # Item is part of a category
-                    if parent not in self.selections:
-                        self.selections[parent] = set()
-                    self.selections[parent].add(item_id)
+                    self.selections.add(parent, item_id)
                 else:
                     # Top-level item
                     self.selections[item_id] = True
@@ -124,9 +169,12 @@ class UnifiedMenu:
         if not self.discovery:
             return
 
+        # This scan supersedes any background one still running
+        self._discovery_future = None
+
         try:
             # Get all menu item IDs
-            all_item_ids = [item["id"] for item in self.items if not item.get("is_category")]
+            all_item_ids = list(self.catalog.leaf_ids)
             # Map to system packages
             self.system_state = self.discovery.map_to_menu_items(all_item_ids)
         except Exception as e:
@@ -134,6 +182,45 @@ class UnifiedMenu:
             sys.stderr.flush()
             self.system_state = {}
 
+    def start_system_scan(self) -> None:
+        """Start scanning installed packages in the background
+
+        The menu stays usable meanwhile; poll_system_scan picks up the result.
+        """
+        if not self.discovery:
+            return
+
+        try:
+            self._discovery_future = self.discovery.map_to_menu_items_async(list(self.catalog.leaf_ids))
+        except Exception as e:
+            sys.stderr.write(f"[DEBUG] Error starting system scan: {e}\n")
+            sys.stderr.flush()
+            self._discovery_future = None
+
+    @property
+    def system_scan_pending(self) -> bool:
+        """Whether a background scan has not finished yet"""
+        future = getattr(self, "_discovery_future", None)
+        return future is not None and not future.done()
+
+    def poll_system_scan(self) -> bool:
+        """Apply the background scan result if it has finished
+
+        Returns True if system_state was updated.
+        """
+        future = getattr(self, "_discovery_future", None)
+        if future is None or not future.done():
+            return False
+
+        self._discovery_future = None
+        try:
+            self.system_state = future.result()
+        except Exception as e:
+            sys.stderr.write(f"[DEBUG] Error refreshing system state: {e}\n")
+            sys.stderr.flush()
+            self.system_state = {}
+        return True
+
     def get_item_sync_status(self, item_id: str) -> str:
         """Get sync status for an item
 
@@ -176,6 +263,7 @@ class UnifiedMenu:
             applied_hash = self._get_file_hash(self.applied_state_file)
             self.changes_since_apply = current_hash != applied_hash
             self.applied_config_hash = applied_hash
+            self.applied_data_hash = None  # Recomputed from the applied file on next save
         elif Path(self.config_file).exists():
             # Config exists but never applied
             self.changes_since_apply = True
@@ -222,34 +310,24 @@ class UnifiedMenu:
             # Load selected items
             selected = config.get("selected_items", [])
             if isinstance(selected, list):
-                # First pass: identify all categories and their descendants
-                category_descendants = {}
-                for item_id in selected:
-                    if item_id in self.category_items:
-                        # Get all descendants for this category
-                        descendants = self.get_all_descendant_items(item_id)
-                        category_descendants[item_id] = descendants
+                catalog = self.catalog
+                selected_set = set(selected)
+
+                # First pass: identify all categories and the items they cover
+                selected_categories = [item_id for item_id in selected if item_id in self.category_items]
+                covered = set()
+                for cat_id in selected_categories:
+                    covered.update(catalog.descendant_leaves(cat_id))
 
                 # Second pass: build selection structure
                 for item_id in selected:
                     # Check if it's a category
                     if item_id in self.category_items:
-                        # Find all its descendants that are in the selected list
-                        self.selections[item_id] = set()
-                        descendants = category_descendants.get(item_id, set())
-                        for desc in descendants:
-                            if desc in selected:
-                                self.selections[item_id].add(desc)
-                    else:
-                        # For non-category items, only add as direct selection if not part of any category
-                        is_in_category = False
-                        for cat_id, desc_set in category_descendants.items():
-                            if item_id in desc_set and cat_id in selected:
-                                is_in_category = True
-                                break
-
-                        if not is_in_category:
-                            self.selections[item_id] = True
+                        # Keep the descendants that are in the selected list
+                        self.selections[item_id] = selected_set.intersection(catalog.descendant_leaves(item_id))
+                    elif item_id not in covered:
+                        # Non-category items only become direct selections if no selected category covers them
+                        self.selections[item_id] = True
 
             # Load configurable values
             configurable = config.get("configurable_items", {})
@@ -269,11 +347,15 @@ class UnifiedMenu:
     def save_configuration(self, silent: bool = False) -> bool:
         """Save current configuration to file
 
+        Silent saves are the auto-save path: they are handed to the background
+        writer, which coalesces bursts of changes into one atomic write once
+        input goes quiet. Explicit saves write immediately.
+
         Args:
-            silent: If True, don't show error messages
+            silent: If True, don't show error messages and write in the background
 
         Returns:
-            True if save was successful, False otherwise
+            True if save was successful (or queued), False otherwise
         """
         config = {
             "metadata": {"version": "1.0", "created_by": "ubootu_unified_tui"},
@@ -281,32 +363,32 @@ class UnifiedMenu:
             "configurable_items": {},
         }
 
-        # Save selections
-        for item_id, value in self.selections.items():
-            if isinstance(value, set):
-                # Category with selected children
-                config["selected_items"].append(item_id)
-                config["selected_items"].extend(list(value))
-            elif value:
-                config["selected_items"].append(item_id)
+        # Save selections (categories are followed by their selected children)
+        config["selected_items"] = self.selections.config_items()
 
         # Save configurable values
         for item_id, value in self.configurable_values.items():
             config["configurable_items"][item_id] = {"id": item_id, "value": value}
 
+        config_hash = self._get_config_hash()
+
         try:
-            # Write to file
-            with open(self.config_file, "w") as f:
-                yaml.dump(config, f, default_flow_style=False)
+            if silent:
+                # Nothing changed since the last save, skip the write entirely
+                if config_hash != self.saved_config_hash or not Path(self.config_file).exists():
+                    self._config_writer.schedule(self.config_file, config)
+            else:
+                self._config_writer.write_now(self.config_file, config)
 
             # Update saved config hash
-            self.saved_config_hash = self._get_config_hash()
+            self.saved_config_hash = config_hash
 
             # Update changes_since_apply by comparing with applied state
             if self.applied_config_hash:
                 # We have a previously applied config, check if current matches it
-                current_hash = self._get_file_hash(self.config_file)
-                self.changes_since_apply = current_hash != self.applied_config_hash
+                if self.applied_data_hash is None:
+                    self.applied_data_hash = self._get_saved_config_hash(self.applied_state_file)
+                self.changes_since_apply = config_hash != self.applied_data_hash
             else:
                 # Never applied before, so we have changes if there's content
                 self.changes_since_apply = bool(config["selected_items"] or config["configurable_items"])
@@ -320,68 +402,48 @@ class UnifiedMenu:
                 dialog.show("Save Error", f"Could not save configuration:\n{str(e)}", "error")
             return False
 
+    def flush_configuration(self) -> bool:
+        """Write any pending auto-save to disk now
+
+        Returns:
+            True if config.yml is up to date, False if the write failed
+        """
+        if self._config_writer.flush():
+            return True
+
+        MessageDialog(self.stdscr).show(
+            "Save Error", f"Could not save configuration:\n{self._config_writer.last_error}", "error"
+        )
+        return False
+
     def get_current_items(self) -> List[Dict]:
         """Get items for current menu level"""
         if self.current_menu == "root":
-            return [item for item in self.items if item.get("parent") is None]
+            return self.catalog.children(None)
         else:
-            return [item for item in self.items if item.get("parent") == self.current_menu]
+            return self.catalog.children(self.current_menu)
 
     def get_all_descendant_items(self, category_id: str) -> Set[str]:
         """Get all non-category descendant items recursively"""
-        descendants = set()
-
-        # Get direct children
-        children = self.category_items.get(category_id, set())
-
-        for child_id in children:
-            # Find the child item
-            child = next((item for item in self.items if item["id"] == child_id), None)
-            if child:
-                if child.get("is_category"):
-                    # Recursively get descendants of subcategory
-                    descendants.update(self.get_all_descendant_items(child_id))
-                else:
-                    # It's a regular item
-                    descendants.add(child_id)
-
-        return descendants
+        return set(self.catalog.descendant_leaves(category_id))
 
     def is_item_selected(self, item_id: str) -> bool:
         """Check if an item is selected through any parent in the hierarchy"""
-        # Direct selection (top-level items)
-        if item_id in self.selections and self.selections[item_id] is True:
-            return True
+        return self.selections.is_selected(item_id)
 
-        # Check if item is in any category's selection set
-        for cat_id, selections in self.selections.items():
-            if isinstance(selections, set) and item_id in selections:
-                return True
+    def get_category_counts(self, category_id: str) -> Tuple[int, int]:
+        """Get (selected, total) counts of a category's descendant items"""
+        selections = self.selections
+        selections.bind(self.catalog)
+        return selections.counts(category_id)
 
-        return False
-
-    def get_selection_indicator(self, item_id: str, selections: Set[str]) -> str:
+    def get_selection_indicator(self, item_id: str, selections: Optional[Set[str]] = None) -> str:
         """Get selection indicator for a category"""
-        # Get all descendant items (recursive)
-        all_items = self.get_all_descendant_items(item_id)
+        selected_count, total = self.get_category_counts(item_id)
 
-        if not all_items:
+        if not total:
             return INDICATOR_NONE
 
-        # Count selected items
-        selected_count = 0
-        for item in all_items:
-            # Check if item is selected directly
-            if item in self.selections:
-                selected_count += 1
-            else:
-                # Check if selected through any parent category
-                for parent_id, parent_selections in self.selections.items():
-                    if isinstance(parent_selections, set) and item in parent_selections:
-                        selected_count += 1
-                        break
-
-        total = len(all_items)
         if selected_count == 0:
             return INDICATOR_NONE
         elif selected_count == total:
@@ -390,15 +452,30 @@ class UnifiedMenu:
             return INDICATOR_PARTIAL
 
     def render(self) -> None:
-        """Render the current menu state"""
-        self.stdscr.clear()
+        """Render the current menu state
 
+        Only the regions and menu rows whose content changed since the last
+        frame are redrawn, and the result goes out in a single doupdate().
+        """
         # Check terminal size
-        self.height, self.width = self.stdscr.getmaxyx()
+        height, width = self.stdscr.getmaxyx()
+        if (height, width) != (self.height, self.width):
+            self.height, self.width = height, width
+            self.invalidate()
+
         if self.height < MIN_HEIGHT or self.width < MIN_WIDTH:
+            self.stdscr.erase()
             self.render_size_error()
+            self.stdscr.refresh()
+            # Lay everything out again once the terminal is big enough
+            self.invalidate()
             return
 
+        if self._full_redraw:
+            self._layout()
+            self.stdscr.erase()
+            self.stdscr.noutrefresh()
+
         # Draw header
         self.render_header()
 
@@ -408,7 +485,23 @@ class UnifiedMenu:
         # Draw help bar
         self.render_help_bar()
 
-        self.stdscr.refresh()
+        self._full_redraw = False
+        curses.doupdate()
+
+    def invalidate(self) -> None:
+        """Redraw the whole screen on the next render, e.g. after a dialog drew over it"""
+        self._full_redraw = True
+        self._header_state = None
+        self._help_state = None
+        self._row_cache = {}
+
+    def _layout(self) -> None:
+        """Create the header, menu list and help bar sub-windows for the current size"""
+        list_height = self.height - MENU_START_Y - 1
+        self.header_win = self.stdscr.derwin(MENU_START_Y - 1, self.width, 0, 0)
+        # The list box's bottom edge shares the help bar's top row; the help bar is drawn last
+        self.list_win = self.stdscr.derwin(list_height, self.width, MENU_START_Y - 1, 0)
+        self.help_win = self.stdscr.derwin(3, self.width, self.height - 3, 0)
 
     def render_size_error(self) -> None:
         """Render terminal size error"""
@@ -416,14 +509,46 @@ class UnifiedMenu:
         draw_centered_text(self.stdscr, self.height // 2, msg, bold=True)
 
     def render_header(self) -> None:
-        """Render the header section"""
+        """Render the header section if its status or breadcrumb changed"""
+        status_line = self._status_line()
+        if self.search_active:
+            count = len(self.search_results)
+            breadcrumb_text = f"Search: {self.search_query}_  ({count} match{'es' if count != 1 else ''})"
+        else:
+            breadcrumb_text = " > ".join(self.breadcrumb) if len(self.breadcrumb) > 1 else ""
+        state = (status_line, breadcrumb_text, self.search_active)
+        if state == self._header_state:
+            return
+        self._header_state = state
+
+        win = self.header_win
+        win.erase()
+
         # Draw title box
-        draw_box(self.stdscr, 0, 0, 4, self.width, TITLE)
+        draw_box(win, 0, 0, 4, self.width, TITLE)
 
         # Draw subtitle
-        draw_centered_text(self.stdscr, 2, SUBTITLE)
+        draw_centered_text(win, 2, SUBTITLE)
 
         # Draw status line
+        try:
+            win.addstr(4, 2, status_line[: self.width - 4])
+        except curses.error:
+            pass
+
+        # Draw the search prompt, or the breadcrumb if not at root
+        if self.search_active:
+            try:
+                win.addstr(5, 2, breadcrumb_text[: self.width - 4], curses.A_BOLD)
+            except curses.error:
+                pass
+        elif breadcrumb_text:
+            draw_centered_text(win, 5, breadcrumb_text)
+
+        win.noutrefresh()
+
+    def _status_line(self) -> str:
+        """Config, system sync and mode status shown under the title"""
         status_parts = []
 
         # Config status
@@ -443,52 +568,91 @@ class UnifiedMenu:
                 status_parts.append(f"System: Out of sync ({needs_install} to install, {orphaned} orphaned)")
             else:
                 status_parts.append("System: In sync")
+        elif self.system_scan_pending:
+            status_parts.append("System: Scanning...")
 
         # Operation mode
         mode_text = "Strict" if self.operation_mode == "strict" else "Additive"
         status_parts.append(f"Mode: {mode_text}")
 
-        status_line = " | ".join(status_parts)
-        try:
-            self.stdscr.addstr(4, 2, status_line[: self.width - 4])
-        except curses.error:
-            pass
-
-        # Draw breadcrumb if not at root
-        if len(self.breadcrumb) > 1:
-            breadcrumb_text = " > ".join(self.breadcrumb)
-            draw_centered_text(self.stdscr, 5, breadcrumb_text)
+        return " | ".join(status_parts)
 
     def render_menu_items(self) -> None:
-        """Render the menu items"""
-        items = self.get_current_items()
-        if not items:
-            return
+        """Render the menu rows whose text or highlight changed"""
+        if self.search_active:
+            items, cursor = self.search_results, self.search_index
+        else:
+            items, cursor = self.get_current_items(), self.current_index
+            if not items:
+                return
 
-        # Calculate menu area
-        start_y = 7
-        menu_height = self.height - start_y - 3  # Leave room for help bar
+        win = self.list_win
+        menu_height = self.height - MENU_START_Y - 3  # Leave room for help bar
 
-        # Draw menu box
-        draw_box(self.stdscr, start_y - 1, 2, menu_height + 2, self.width - 4)
+        # The box only needs drawing on a full redraw; rows are updated inside it
+        if not self._row_cache:
+            draw_box(win, 0, 2, menu_height + 2, self.width - 4)
 
         # Draw items
-        visible_start = max(0, self.current_index - menu_height // 2)
-        visible_end = min(len(items), visible_start + menu_height)
+        visible_start = max(0, cursor - menu_height // 2)
+        blank = " " * (self.width - 10)
+        touched = False
+
+        for row in range(menu_height):
+            index = visible_start + row
+            if index < len(items):
+                item = items[index]
+                context = self._search_context(item) if self.search_active else None
+                state = (self.format_menu_item(item, context), index == cursor)
+            else:
+                item = None
+                state = ("", False)
+
+            if self._row_cache.get(row) == state:
+                continue
+            self._row_cache[row] = state
+            touched = True
 
-        for i, item in enumerate(items[visible_start:visible_end]):
-            y = start_y + i
-            self.render_menu_item(y, item, visible_start + i == self.current_index)
+            if item is not None:
+                self.render_menu_item(row + 1, item, state[1], win, state[0])
+            else:
+                try:
+                    win.addstr(row + 1, 4, blank)
+                except curses.error:
+                    pass
 
-    def render_menu_item(self, y: int, item: Dict, selected: bool) -> None:
-        """Render a single menu item"""
+        if touched:
+            win.noutrefresh()
+
+    def render_menu_item(self, y: int, item: Dict, selected: bool, win=None, text: Optional[str] = None) -> None:
+        """Render a single menu item, on stdscr unless another window is given"""
+        win = win if win is not None else self.stdscr
         x = 4
         max_width = self.width - 8
 
+        if text is None:
+            text = self.format_menu_item(item)
+
+        # Draw with selection highlight
+        try:
+            if selected:
+                win.attron(curses.A_REVERSE)
+
+            win.addstr(y, x, text.ljust(max_width - 2))
+
+            if selected:
+                win.attroff(curses.A_REVERSE)
+        except curses.error:
+            pass
+
+    def format_menu_item(self, item: Dict, context: Optional[str] = None) -> str:
+        """Text of a menu row: indicator, label and description (or the given context) if it fits"""
+        max_width = self.width - 8
+
         # Build item text
         if item.get("is_category"):
             # Category with selection indicator
-            indicator = self.get_selection_indicator(item["id"], self.selections.get(item["id"], set()))
+            indicator = self.get_selection_indicator(item["id"])
             icon = item.get("icon", "")
             text = f"{indicator} {icon} {item['label']}"
         else:
@@ -515,35 +679,33 @@ class UnifiedMenu:
                     text = f"  {checkbox} {item['label']}"
 
         # Add description on same line if space allows
-        description = item.get("description", "")
+        description = context if context is not None else item.get("description", "")
         if description and len(text) + len(description) + 3 < max_width:
             text += f" - {description}"
 
         # Truncate if needed
-        text = truncate_text(text, max_width)
-
-        # Draw with selection highlight
-        try:
-            if selected:
-                self.stdscr.attron(curses.A_REVERSE)
-
-            self.stdscr.addstr(y, x, text.ljust(max_width - 2))
-
-            if selected:
-                self.stdscr.attroff(curses.A_REVERSE)
-        except curses.error:
-            pass
+        return truncate_text(text, max_width)
 
     def render_help_bar(self) -> None:
         """Render the help bar at bottom"""
-        y = self.height - 2
-        help_text = HELP_BAR_SUBMENU if self.current_menu != "root" else HELP_BAR
+        if self.search_active:
+            help_text = HELP_BAR_SEARCH
+        else:
+            help_text = HELP_BAR_SUBMENU if self.current_menu != "root" else HELP_BAR
+        if self._help_state == (help_text,):
+            return
+        self._help_state = (help_text,)
 
-        draw_box(self.stdscr, y - 1, 0, 3, self.width)
-        draw_centered_text(self.stdscr, y, help_text)
+        win = self.help_win
+        draw_box(win, 0, 0, 3, self.width)
+        draw_centered_text(win, 1, help_text)
+        win.noutrefresh()
 
     def navigate(self, key: int) -> Optional[str]:
         """Handle navigation keys and return action"""
+        if self.search_active:
+            return self.handle_search_key(key)
+
         items = self.get_current_items()
 
         # Handle navigation keys that should work even in empty menus
@@ -556,6 +718,11 @@ class UnifiedMenu:
                 # At root level, go back to main menu
                 return "main_menu"
 
+        # Search the whole catalog
+        elif key_matches(key, KEY_BINDINGS["search"]):
+            self.start_search()
+            return "search"
+
         # Go to main menu (M key)
         elif key_matches(key, KEY_BINDINGS["main_menu"]):
             return "main_menu"
@@ -647,27 +814,21 @@ class UnifiedMenu:
 
         if item.get("is_category"):
             # Toggle all items in this category
-            descendants = self.get_all_descendant_items(item_id)
+            descendants = self.catalog.descendant_leaves(item_id)
             if descendants:
                 # Check if ANY descendants are currently selected anywhere
-                any_selected = any(self.is_item_selected(desc_id) for desc_id in descendants)
+                any_selected, _ = self.get_category_counts(item_id)
 
                 if any_selected:
                     # Deselect all descendants from wherever they are stored
-                    for cat_id, selections in list(self.selections.items()):
-                        if isinstance(selections, set):
-                            # Remove descendants from this category's selections
-                            selections.difference_update(descendants)
-                            # If category is now empty, remove it
-                            if not selections:
-                                del self.selections[cat_id]
+                    self.selections.discard(descendants)
 
                     # Also remove this category itself if it's a key
                     if item_id in self.selections:
                         del self.selections[item_id]
                 else:
                     # Select all descendants under this category
-                    self.selections[item_id] = descendants.copy()
+                    self.selections[item_id] = descendants
 
                 # Auto-save after selection change (will update changes_since_apply)
                 self.save_configuration(silent=True)
@@ -683,20 +844,13 @@ class UnifiedMenu:
 
         if is_currently_selected:
             # Remove from ALL categories that contain it
-            for cat_id, selections in list(self.selections.items()):
-                if isinstance(selections, set) and item_id in selections:
-                    selections.remove(item_id)
-                    # If category is now empty, remove it
-                    if not selections:
-                        del self.selections[cat_id]
+            self.selections.discard([item_id])
         else:
             # Add to immediate parent
             parent = item.get("parent")
             if parent and parent in self.category_items:
                 # Item is part of a category
-                if parent not in self.selections:
-                    self.selections[parent] = set()
-                self.selections[parent].add(item_id)
+                self.selections.add(parent, item_id)
             else:
                 # Top-level item
                 self.selections[item_id] = True
@@ -748,6 +902,9 @@ class UnifiedMenu:
             dialog = InputDialog(self.stdscr)
             new_value = dialog.show(item["label"], item.get("description", "Enter value:"), str(current_value))
 
+        # The dialog drew over the menu
+        self.invalidate()
+
         # Update value if changed
         if new_value is not None:
             self.configurable_values[item_id] = new_value
@@ -758,13 +915,13 @@ class UnifiedMenu:
         """Select all items in current category and all subcategories"""
         if self.current_menu == "root":
             # At root level, select all non-category items recursively
-            for item in self.items:
-                if item.get("is_category") and item.get("parent") is None:
+            for item in self.catalog.children(None):
+                if item.get("is_category"):
                     # Get all descendant items for each root category
                     descendants = self.get_all_descendant_items(item["id"])
                     if descendants:
                         self.selections[item["id"]] = descendants
-                elif not item.get("is_category") and item.get("parent") is None:
+                else:
                     # Direct root-level items
                     self.selections[item["id"]] = True
         else:
@@ -773,11 +930,7 @@ class UnifiedMenu:
             if descendants:
                 # First, remove these items from any other categories
                 # This ensures they're only stored in one place
-                for cat_id, selections in list(self.selections.items()):
-                    if isinstance(selections, set) and cat_id != self.current_menu:
-                        selections.difference_update(descendants)
-                        if not selections:
-                            del self.selections[cat_id]
+                self.selections.discard(descendants, keep=self.current_menu)
 
                 # Now add them to the current category
                 self.selections[self.current_menu] = descendants
@@ -792,25 +945,19 @@ class UnifiedMenu:
             self.selections.clear()
         else:
             # Get all items that should be deselected (all descendants of current menu)
-            items_to_deselect = self.get_all_descendant_items(self.current_menu)
+            items_to_deselect = self.catalog.descendant_leaves(self.current_menu)
 
             if items_to_deselect:
                 # Remove these items from ALL categories that contain them
-                for cat_id, selections in list(self.selections.items()):
-                    if isinstance(selections, set):
-                        # Remove any items that are descendants of current menu
-                        selections.difference_update(items_to_deselect)
-                        # If category is now empty, remove it
-                        if not selections:
-                            del self.selections[cat_id]
+                self.selections.discard(items_to_deselect)
 
             # Also remove the current category itself if it exists as a key
             if self.current_menu in self.selections:
                 del self.selections[self.current_menu]
 
             # Clear any direct subcategory selections
-            for item in self.items:
-                if item.get("is_category") and item.get("parent") == self.current_menu:
+            for item in self.catalog.children(self.current_menu):
+                if item.get("is_category"):
                     if item["id"] in self.selections:
                         del self.selections[item["id"]]
 
@@ -824,8 +971,8 @@ class UnifiedMenu:
             del self.selections[category_id]
 
         # Clear subcategory selections
-        for item in self.items:
-            if item.get("is_category") and item.get("parent") == category_id:
+        for item in self.catalog.children(category_id):
+            if item.get("is_category"):
                 self._clear_category_selections(item["id"])
 
     def enter_submenu(self, menu_id: str) -> None:
@@ -835,10 +982,9 @@ class UnifiedMenu:
         self.current_index = 0
 
         # Update breadcrumb
-        for item in self.items:
-            if item["id"] == menu_id:
-                self.breadcrumb.append(item["label"])
-                break
+        item = self.catalog.get(menu_id)
+        if item is not None:
+            self.breadcrumb.append(item["label"])
 
     def go_back(self) -> None:
         """Go back to previous menu"""
@@ -847,6 +993,81 @@ class UnifiedMenu:
             self.current_index = 0
             self.breadcrumb.pop()
 
+    def start_search(self) -> None:
+        """Enter search mode with an empty query"""
+        self.search_active = True
+        self.search_query = ""
+        self.search_results = []
+        self.search_index = 0
+
+    def end_search(self) -> None:
+        """Leave search mode, keeping the menu position"""
+        self.search_active = False
+        self.search_query = ""
+        self.search_results = []
+        self.search_index = 0
+
+    def update_search(self, query: str) -> None:
+        """Run the query against the catalog index and highlight the best match"""
+        self.search_query = query
+        catalog = self.catalog
+        self.search_results = [catalog.get(item_id) for item_id in catalog.search_index.search(query)]
+        self.search_index = 0
+
+    def handle_search_key(self, key: int) -> Optional[str]:
+        """Handle a key in search mode and return the action"""
+        if key == 27:  # ESC
+            self.end_search()
+            return "search_cancel"
+
+        if key in (10, 13, curses.KEY_ENTER):
+            if self.search_results:
+                self.jump_to_item(self.search_results[self.search_index]["id"])
+                self.end_search()
+                return "search_jump"
+            return None
+
+        count = len(self.search_results)
+        page = max(1, self.height - MENU_START_Y - 3)
+        if key == curses.KEY_UP:
+            if count:
+                self.search_index = (self.search_index - 1) % count
+        elif key == curses.KEY_DOWN:
+            if count:
+                self.search_index = (self.search_index + 1) % count
+        elif key == curses.KEY_PPAGE:
+            self.search_index = max(0, self.search_index - page)
+        elif key == curses.KEY_NPAGE:
+            self.search_index = max(0, min(count - 1, self.search_index + page))
+        elif key in (curses.KEY_BACKSPACE, 127, 8):
+            self.update_search(self.search_query[:-1])
+        elif 32 <= key < 127:
+            self.update_search(self.search_query + chr(key))
+        else:
+            return None
+        return "search_update"
+
+    def jump_to_item(self, item_id: str) -> None:
+        """Open the menu holding an item and put the cursor on it"""
+        catalog = self.catalog
+        item = catalog.get(item_id)
+        if item is None:
+            return
+
+        chain = catalog.ancestors(item_id)
+        self.menu_stack = ["root"] + chain[:-1]
+        self.current_menu = chain[-1] if chain else "root"
+        self.breadcrumb = ["Root"] + [catalog.get(category_id)["label"] for category_id in chain]
+
+        siblings = self.get_current_items()
+        self.current_index = next((i for i, sibling in enumerate(siblings) if sibling["id"] == item_id), 0)
+
+    def _search_context(self, item: Dict) -> str:
+        """Where a search result lives, shown in place of its description"""
+        catalog = self.catalog
+        labels = [catalog.get(category_id)["label"] for category_id in catalog.ancestors(item["id"])]
+        return f"in {' > '.join(labels)}" if labels else "in Root"
+
     def toggle_operation_mode(self) -> None:
         """Toggle between additive and strict operation modes"""
         if self.operation_mode == "additive":
@@ -890,13 +1111,7 @@ class UnifiedMenu:
         self.refresh_system_state()
 
         # Build current selections set
-        current_selections = set()
-        for item_id, value in self.selections.items():
-            if isinstance(value, set):
-                current_selections.add(item_id)
-                current_selections.update(value)
-            elif value:
-                current_selections.add(item_id)
+        current_selections = set(self.selections.config_items())
 
         # Get system state
         to_install = []
@@ -986,29 +1201,20 @@ class UnifiedMenu:
                 last_applied = yaml.safe_load(f) or {}
 
             last_selections = set(last_applied.get("selected_items", []))
-            current_selections = set()
-
             # Build current selections
-            for item_id, value in self.selections.items():
-                if isinstance(value, set):
-                    current_selections.add(item_id)
-                    current_selections.update(value)
-                elif value:
-                    current_selections.add(item_id)
-
-            # Find items that were selected but are no longer
-            removed_items = last_selections - current_selections
-
-            # Map to actual packages
-            for item_id in removed_items:
-                # Check if package is installed and safe to remove
-                if self.system_state.get(item_id) == "installed":
-                    # Map item_id to package name(s)
-                    for pkg_name, menu_id in self.discovery.package_to_menu_map.items():
-                        if menu_id == item_id:
-                            is_safe, reason = self.discovery.is_safe_to_remove(pkg_name)
-                            if is_safe:
-                                packages_to_remove[pkg_name] = [f"Unchecked from menu: {item_id}"]
+            current_selections = set(self.selections.config_items())
+
+            # Find installed items that were selected but are no longer
+            removed_items = sorted(
+                item_id
+                for item_id in last_selections - current_selections
+                if self.system_state.get(item_id) == "installed"
+            )
+
+            # Resolve every candidate package in one pass
+            if removed_items:
+                self.removal_plan = self.discovery.plan_removals(removed_items)
+                packages_to_remove = self.removal_plan.to_remove
 
         except Exception as e:
             sys.stderr.write(f"[DEBUG] Error getting packages to remove: {e}\n")
@@ -1024,9 +1230,15 @@ class UnifiedMenu:
         sys.stderr.write(f"\n[DEBUG] apply_configuration called at {time.strftime('%H:%M:%S')}\n")
         sys.stderr.flush()
 
+        # Make sure config.yml reflects the latest selections before Ansible reads it
+        self.flush_configuration()
+
         # Check for packages to remove in strict mode
         packages_to_remove = self.get_packages_to_remove()
 
+        # Roles the changes since the last apply can affect (None runs everything)
+        delta_plan = self._plan_delta(packages_to_remove)
+
         # Create sudo dialog
         sudo_dialog = SudoDialog(self.stdscr)
         progress_dialog = ProgressDialog(self.stdscr)
@@ -1045,6 +1257,9 @@ class UnifiedMenu:
                 confirm_message += f"  ... and {len(packages_to_remove) - 5} more\n"
             confirm_message += "\n"
 
+        if delta_plan is not None:
+            confirm_message += f"Only the parts affected by your changes will run: {', '.join(delta_plan.roles)}\n\n"
+
         confirm_message += (
             "• Requires administrator (sudo) access\n"
             "• May take several minutes depending on selections\n"
@@ -1118,11 +1333,9 @@ class UnifiedMenu:
         import tempfile
 
         with tempfile.NamedTemporaryFile(mode="w", suffix=".ini", delete=False) as inv_file:
-            inv_file.write(
-                """[local]
+            inv_file.write("""[local]
 localhost ansible_connection=local ansible_python_interpreter=/usr/bin/python3
-"""
-            )
+""")
             temp_inventory = inv_file.name
 
         try:
@@ -1141,8 +1354,11 @@ localhost ansible_connection=local ansible_python_interpreter=/usr/bin/python3
             sys.stderr.write(f"[DEBUG] Inventory: {temp_inventory}\n")
             sys.stderr.flush()
 
-            # Build complete ansible command with all variables
-            ansible_cmd = self._build_ansible_command(temp_inventory, password_file)
+            # Build complete ansible command with all variables; independent roles run side by side
+            delta_roles = delta_plan.roles if delta_plan is not None else None
+            ansible_cmd = scheduled_command(
+                self._build_ansible_command(temp_inventory, password_file), roles=delta_roles
+            )
 
             result = progress_dialog.run_command(
                 ansible_cmd,
@@ -1150,6 +1366,7 @@ localhost ansible_connection=local ansible_python_interpreter=/usr/bin/python3
                 show_output=True,
                 sudo_dialog=sudo_dialog,
                 env=env,
+                estimate_key=self._get_config_hash() + (f":{','.join(delta_roles)}" if delta_roles else ""),
             )
 
             sys.stderr.write(f"[DEBUG] progress_dialog.run_command returned: {result}\n")
@@ -1180,6 +1397,7 @@ localhost ansible_connection=local ansible_python_interpreter=/usr/bin/python3
 
             # Update applied config tracking
             self.applied_config_hash = self._get_file_hash(self.applied_state_file)
+            self.applied_data_hash = None  # Recomputed from the applied file on next save
             self.config_applied = True
             self.changes_since_apply = False  # Reset change tracking after successful apply
 
@@ -1246,25 +1464,41 @@ localhost ansible_connection=local ansible_python_interpreter=/usr/bin/python3
         # Initialize state tracking to determine if changes need applying
         self.initialize_state_tracking()
 
-        # Refresh system state
-        self.refresh_system_state()
+        # Scan installed packages in the background so the menu paints immediately
+        self.start_system_scan()
 
         exit_code = 1  # Default to cancelled
 
+        # Whatever was on screen before (main menu, splash) is not ours to keep
+        self.invalidate()
+
         while True:
+            self.poll_system_scan()
             self.render()
 
             try:
+                # Wake up periodically until the scan lands so its indicators appear without a keypress
+                self.stdscr.timeout(DISCOVERY_POLL_MS if self.system_scan_pending else -1)
                 key = self.stdscr.getch()
+                # Dialogs opened from here expect blocking input
+                self.stdscr.timeout(-1)
             except KeyboardInterrupt:
                 # Ctrl+C pressed - exit with cancel
                 exit_code = 1
                 break
 
+            if key == -1:
+                # Poll timeout, nothing pressed
+                continue
+
             action = self.navigate(key)
+            if action not in (None, "navigate", "select", "search_update"):
+                # Dialogs and menu changes draw over or replace the whole screen
+                self.invalidate()
 
             if action == "quit":
                 # User wants to quit - check state
+                self.flush_configuration()
                 current_hash = self._get_config_hash()
                 saved_hash = self._get_saved_config_hash()
 
@@ -1353,6 +1587,10 @@ localhost ansible_connection=local ansible_python_interpreter=/usr/bin/python3
             elif key == curses.KEY_RESIZE:
                 self.height, self.width = self.stdscr.getmaxyx()
 
+        # Write out auto-saves still waiting for the quiet period
+        self.flush_configuration()
+        self._config_writer.close()
+
         return exit_code
 
     def validate_config(self, config: Dict) -> bool:
@@ -1393,13 +1631,7 @@ localhost ansible_connection=local ansible_python_interpreter=/usr/bin/python3
     def _get_config_data(self) -> Dict[str, Any]:
         """Get current configuration as a dictionary"""
         # Build selected items list
-        selected_items = []
-        for item_id, value in self.selections.items():
-            if isinstance(value, bool) and value:
-                selected_items.append(item_id)
-            elif isinstance(value, set):
-                selected_items.append(item_id)
-                selected_items.extend(list(value))
+        selected_items = self.selections.config_items()
 
         # Build configurable items
         configurable_items = {}
@@ -1418,13 +1650,14 @@ localhost ansible_connection=local ansible_python_interpreter=/usr/bin/python3
         config_str = json.dumps(config_data, sort_keys=True)
         return hashlib.sha256(config_str.encode()).hexdigest()
 
-    def _get_saved_config_hash(self) -> Optional[str]:
-        """Get hash of saved configuration from file"""
-        if not Path(self.config_file).exists():
+    def _get_saved_config_hash(self, filepath: Optional[str] = None) -> Optional[str]:
+        """Get hash of saved configuration from file (config.yml by default)"""
+        filepath = filepath or self.config_file
+        if not Path(filepath).exists():
             return None
 
         try:
-            with open(self.config_file, "r") as f:
+            with open(filepath, "r") as f:
                 config = yaml.safe_load(f) or {}
 
             # Extract relevant parts
@@ -1446,14 +1679,7 @@ localhost ansible_connection=local ansible_python_interpreter=/usr/bin/python3
         extra_vars = {}
 
         # Add selected items as a simple list
-        selected_items = []
-        for item_id, value in self.selections.items():
-            if isinstance(value, bool) and value:
-                selected_items.append(item_id)
-            elif isinstance(value, set):
-                selected_items.extend(list(value))
-
-        extra_vars["selected_items"] = selected_items
+        extra_vars["selected_items"] = sorted(self.selections.selected_items())
 
         # Add packages to remove (if in strict mode)
         packages_to_remove = self.get_packages_to_remove()
@@ -1546,6 +1772,24 @@ localhost ansible_connection=local ansible_python_interpreter=/usr/bin/python3
 
         return vars_file
 
+    def _plan_delta(self, packages_to_remove: Dict[str, List[str]]):
+        """Roles affected by the changes since the last successful apply, or None to run them all"""
+        current = load_config(self.config_file)
+        if current is None:
+            return None
+
+        try:
+            return plan_delta(
+                load_config(self.applied_state_file),
+                current,
+                Path("site.yml"),
+                var_name=self._get_ansible_var_name,
+                extra_words=["packages_to_remove"] if packages_to_remove else None,
+            )
+        except OSError as e:
+            sys.stderr.write(f"[DEBUG] Delta planning failed, applying everything: {e}\n")
+            return None
+
     def _build_ansible_command(self, temp_inventory: str = None, password_file: str = None) -> List[str]:
         """Build the complete ansible-playbook command with all options"""
         # Create extra vars file
@@ -4,6 +4,7 @@ Utility functions for the unified TUI
 """
 
 import curses
+from functools import lru_cache
 from typing import Optional, Tuple
 
 
@@ -12,32 +13,43 @@ def center_text(width: int, text: str) -> int:
     return max(0, (width - len(text)) // 2)
 
 
+@lru_cache(maxsize=128)
+def box_title(title: str, width: int) -> Tuple[int, str]:
+    """Offset and padded text of a box title, cached per title and box width"""
+    text = f" {title} "
+    return center_text(width, text), text[: width - 2]
+
+
 def draw_box(stdscr, y: int, x: int, height: int, width: int, title: Optional[str] = None) -> None:
-    """Draw a box with optional title using single-line characters"""
+    """Draw a box with optional title using single-line characters
+
+    A box filling the whole window is drawn with one border() call; any other
+    box with two hline() and two vline() runs plus its four corners.
+    """
     try:
-        # Draw corners
-        stdscr.addch(y, x, curses.ACS_ULCORNER)
-        stdscr.addch(y, x + width - 1, curses.ACS_URCORNER)
-        stdscr.addch(y + height - 1, x, curses.ACS_LLCORNER)
-        stdscr.addch(y + height - 1, x + width - 1, curses.ACS_LRCORNER)
-
-        # Draw horizontal lines
-        for i in range(1, width - 1):
-            stdscr.addch(y, x + i, curses.ACS_HLINE)
-            stdscr.addch(y + height - 1, x + i, curses.ACS_HLINE)
-
-        # Draw vertical lines
-        for i in range(1, height - 1):
-            stdscr.addch(y + i, x, curses.ACS_VLINE)
-            stdscr.addch(y + i, x + width - 1, curses.ACS_VLINE)
+        if y == 0 and x == 0 and (height, width) == tuple(stdscr.getmaxyx()):
+            stdscr.border()
+        else:
+            # Draw horizontal and vertical lines
+            stdscr.hline(y, x + 1, curses.ACS_HLINE, width - 2)
+            stdscr.hline(y + height - 1, x + 1, curses.ACS_HLINE, width - 2)
+            stdscr.vline(y + 1, x, curses.ACS_VLINE, height - 2)
+            stdscr.vline(y + 1, x + width - 1, curses.ACS_VLINE, height - 2)
+
+            # Draw corners
+            stdscr.addch(y, x, curses.ACS_ULCORNER)
+            stdscr.addch(y, x + width - 1, curses.ACS_URCORNER)
+            stdscr.addch(y + height - 1, x, curses.ACS_LLCORNER)
+            try:
+                stdscr.addch(y + height - 1, x + width - 1, curses.ACS_LRCORNER)
+            except curses.error:
+                # The bottom-right cell of a window is written, but the cursor can't advance past it
+                pass
 
         # Draw title if provided
         if title:
-            title = f" {title} "
-            title_x = x + center_text(width, title)
-            stdscr.attron(curses.A_BOLD)
-            stdscr.addstr(y, title_x, title[: width - 2])
-            stdscr.attroff(curses.A_BOLD)
+            title_x, title_text = box_title(title, width)
+            stdscr.addstr(y, x + title_x, title_text, curses.A_BOLD)
 
     except curses.error:
         pass
@@ -0,0 +1,90 @@
+# Ubootu GitHub release lookup with a shared on-disk cache
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+DOCUMENTATION = """
+    name: github_release
+    short_description: Latest GitHub release of one or more repositories, cached between applies
+    description:
+      - Returns the latest release of each repository, shaped like a registered uri result
+        (C(json), C(failed), C(status)) so tasks can keep reading C(<var>.json.assets).
+      - Releases are cached under ~/.cache/ubootu/github-releases and revalidated with ETags once
+        they are older than I(ttl) seconds. All terms are resolved concurrently in one pass.
+      - A term may be a dict with a C(repo) key; it is returned as the result's C(item), like a loop item.
+      - With ubootu_bundle_dir set, releases come from the offline bundle's cache without any request.
+    options:
+      _terms:
+        description: Repositories as "owner/name" strings or dicts with a repo key
+        required: true
+      ttl:
+        description: Seconds a cached release is used without asking GitHub
+        type: int
+        default: 3600
+      allow_failures:
+        description: Return failed results (failed=true) instead of failing the task
+        type: bool
+        default: false
+      api_url:
+        description: GitHub API base URL; defaults to UBOOTU_GITHUB_API_URL or api.github.com
+        type: str
+"""
+
+EXAMPLES = """
+- name: Get latest jq release
+  ansible.builtin.set_fact:
+    jq_release: "{{ lookup('github_release', 'jqlang/jq') }}"
+
+- name: Get latest releases of several tools at once
+  ansible.builtin.set_fact:
+    tool_releases: "{{ query('github_release', [{'name': 'fd', 'repo': 'sharkdp/fd'}], allow_failures=true) }}"
+"""
+
+import os
+import sys
+
+from ansible.errors import AnsibleError
+from ansible.module_utils.common.text.converters import to_native
+from ansible.plugins.lookup import LookupBase
+
+# The release cache lives in the repository's lib package, one level up from this plugin
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from lib.github_releases import GITHUB_API_URL, RELEASE_CACHE_TTL, ReleaseCache, ReleaseResolver  # noqa: E402
+from lib.offline_bundle import RELEASES_DIR  # noqa: E402
+
+
+class LookupModule(LookupBase):
+    def run(self, terms, variables=None, **kwargs):
+        items = []
+        for term in terms:
+            items.extend(term if isinstance(term, list) else [term])
+
+        repos = []
+        for item in items:
+            repo = item.get("repo") if isinstance(item, dict) else item
+            if not repo or "/" not in str(repo):
+                raise AnsibleError("github_release: expected 'owner/name', got %r" % (item,))
+            repos.append(str(repo))
+
+        api_url = kwargs.get("api_url") or os.environ.get("UBOOTU_GITHUB_API_URL") or GITHUB_API_URL
+        bundle_dir = (variables or {}).get("ubootu_bundle_dir")
+        if bundle_dir:
+            bundle_dir = self._templar.template(bundle_dir)
+            resolver = ReleaseResolver(ReleaseCache(os.path.join(bundle_dir, RELEASES_DIR)), offline=True)
+        else:
+            resolver = ReleaseResolver(ReleaseCache(ttl=int(kwargs.get("ttl", RELEASE_CACHE_TTL))), api_url=api_url)
+        results = resolver.resolve_all(repos)
+
+        for item, result in zip(items, results):
+            if result["failed"] and not kwargs.get("allow_failures", False):
+                raise AnsibleError("github_release: %s: %s" % (result["repo"], to_native(result["msg"])))
+            if result.get("stale"):
+                self._display.warning("github_release: using cached %s release: %s" % (result["repo"], result["msg"]))
+            if isinstance(item, dict):
+                result["item"] = item
+        return results
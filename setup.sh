@@ -186,6 +186,9 @@ install_prerequisites() {
         }
     fi
     
+    # Pre-compile the TUI menu catalog so the first launch doesn't have to
+    python3 -m lib.tui.menu_cache >/dev/null 2>&1 || true
+    
     print_success "Prerequisites installed"
 }
 
@@ -875,6 +878,53 @@ main() {
             backup_config
             exit 0
             ;;
+        --fleet)
+            # Apply to every host of an inventory: ./setup.sh --fleet -i inventories/production [-c config.yml] [-f 20]
+            shift
+            if ! command -v ansible-playbook &> /dev/null; then
+                print_error "Ansible is required on this machine to run a fleet apply"
+                exit 1
+            fi
+            python3 -m lib.fleet "$@"
+            exit 0
+            ;;
+        --export-bundle)
+            if [[ -z "${2:-}" ]] || [[ -z "${3:-}" ]]; then
+                print_error "Usage: $0 --export-bundle <config.yml> <bundle-dir> [--apply]"
+                exit 1
+            fi
+            check_ubuntu
+            explain_sudo_requirement
+            install_prerequisites
+            export_args=("$2" "$3")
+            if [[ "${4:-}" == "--apply" ]]; then
+                export_args+=(--apply)
+            fi
+            print_info "Recording what $2 installs and downloading it into $3..."
+            python3 -m lib.offline_bundle export "${export_args[@]}" -- --ask-become-pass
+            print_success "Offline bundle written to $3"
+            exit 0
+            ;;
+        --bundle)
+            if [[ -z "${2:-}" ]] || [[ ! -f "$2/bundle.json" ]]; then
+                print_error "Please provide an offline bundle directory"
+                exit 1
+            fi
+            export UBOOTU_BUNDLE_DIR="$(realpath "$2")"
+            check_ubuntu
+            explain_sudo_requirement
+            print_info "Using the offline bundle in $UBOOTU_BUNDLE_DIR..."
+            sudo python3 -m lib.offline_bundle activate "$UBOOTU_BUNDLE_DIR"
+            # Give apt its own sources back however the apply ends
+            trap 'sudo python3 -m lib.offline_bundle deactivate' EXIT
+            install_prerequisites
+            if [[ -f "$UBOOTU_BUNDLE_DIR/collections/requirements.yml" ]]; then
+                (cd "$UBOOTU_BUNDLE_DIR/collections" && ansible-galaxy collection install --offline -r requirements.yml)
+            fi
+            cp "$UBOOTU_BUNDLE_DIR/config.yml" config.yml
+            run_playbooks "--extra-vars ubootu_bundle_dir=$UBOOTU_BUNDLE_DIR"
+            exit 0
+            ;;
     esac
     
     # Interactive mode
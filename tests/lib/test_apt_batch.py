@@ -0,0 +1,147 @@
+"""
+Unit tests for apt_batch
+"""
+
+import importlib.util
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+import yaml
+
+from lib.apt_batch import changed_packages, deb_packages, package_name, package_results
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+
+INSTALL_OUTPUT = """\
+Reading package lists...
+Building dependency tree...
+tree is already the newest version (2.1.1-2).
+The following NEW packages will be installed:
+  libncursesw6 ncdu ranger
+0 upgraded, 3 newly installed, 0 to remove and 4 not upgraded.
+Selecting previously unselected package libncursesw6:amd64.
+Preparing to unpack .../libncursesw6_6.4-2_amd64.deb ...
+Unpacking libncursesw6:amd64 (6.4-2) ...
+Preparing to unpack .../ncdu_1.19-0.1_amd64.deb ...
+Unpacking ncdu (1.19-0.1) ...
+Preparing to unpack .../ranger_1.9.3-5_all.deb ...
+Unpacking ranger (1.9.3-5) ...
+Setting up libncursesw6:amd64 (6.4-2) ...
+Setting up ncdu (1.19-0.1) ...
+Setting up ranger (1.9.3-5) ...
+Processing triggers for man-db (2.12.0-4build2) ...
+"""
+
+DEB_OUTPUT = """\
+Preparing to unpack /tmp/ripgrep.deb ...
+Unpacking ripgrep (14.1.0-1) ...
+Preparing to unpack /tmp/fd.deb ...
+Unpacking fd-find (9.0.0-1) over (8.7.0-1) ...
+Setting up ripgrep (14.1.0-1) ...
+Setting up fd-find (9.0.0-1) ...
+"""
+
+
+def test_package_name():
+    assert package_name("tree") == "tree"
+    assert package_name("nodejs=20.11.1-1nodesource1") == "nodejs"
+    assert package_name("docker-ce>=5:24") == "docker-ce"
+    assert package_name("libc6:i386") == "libc6"
+
+
+def test_changed_packages():
+    assert changed_packages(INSTALL_OUTPUT) == {"libncursesw6": "installed", "ncdu": "installed", "ranger": "installed"}
+    assert changed_packages("Removing nano (7.2-1) ...\nPurging configuration files for nano (7.2-1) ...\n") == {
+        "nano": "removed"
+    }
+    assert changed_packages("") == {}
+
+
+def test_results_are_attributed_per_package():
+    results = package_results(["tree", "ncdu", "ranger=1.9.3-5"], {"changed": True, "stdout": INSTALL_OUTPUT})
+
+    assert results == [
+        {"item": "tree", "status": "ok"},
+        {"item": "ncdu", "status": "changed"},
+        {"item": "ranger=1.9.3-5", "status": "changed"},
+    ]
+    # Nothing to attribute a reported change to: every package counts as changed
+    assert {entry["status"] for entry in package_results(["a", "b"], {"changed": True})} == {"changed"}
+    assert {entry["status"] for entry in package_results(["a", "b"], {"changed": False, "stdout": ""})} == {"ok"}
+
+
+def test_deb_files_are_attributed_by_file_name():
+    assert deb_packages(DEB_OUTPUT) == {"ripgrep.deb": "ripgrep", "fd.deb": "fd-find"}
+
+    results = package_results(["/tmp/ripgrep.deb", "/tmp/fd.deb", "/tmp/bat.deb"], {"stdout": DEB_OUTPUT}, debs=True)
+    assert [entry["status"] for entry in results] == ["changed", "changed", "ok"]
+
+
+def test_roles_have_no_per_item_apt_loops():
+    """apt runs once per task, with the packages batched, rather than once per loop item"""
+
+    def tasks(entries):
+        for task in entries or []:
+            if isinstance(task, dict):
+                yield task
+                for key in ("block", "rescue", "always"):
+                    yield from tasks(task.get(key))
+
+    for path in (REPO_ROOT / "roles").glob("*/tasks/*.yml"):
+        for task in tasks(yaml.safe_load(path.read_text())):
+            if "apt" in task or "ansible.builtin.apt" in task:
+                assert not ({"loop", "with_items"} & set(task)), f"{path}: {task.get('name')}"
+
+
+def run_action(args, apt):
+    """Run the apt_batch action plugin with apt answered by apt(module_args)"""
+    pytest.importorskip("ansible")
+    spec = importlib.util.spec_from_file_location("apt_batch_action", REPO_ROOT / "action_plugins" / "apt_batch.py")
+    plugin = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(plugin)
+
+    action = plugin.ActionModule.__new__(plugin.ActionModule)
+    action._task = MagicMock(args=args)
+    action._play_context = MagicMock(check_mode=False)
+    calls = []
+
+    def execute_module(module_name, module_args, task_vars):
+        calls.append(module_args)
+        return apt(module_args)
+
+    action._execute_module = execute_module
+    with patch.object(plugin.ActionBase, "run", return_value={}):
+        return action.run(task_vars={}), calls
+
+
+def test_nothing_selected_skips_apt():
+    result, calls = run_action({"deb": [], "state": "present"}, lambda args: {"failed": True})
+
+    assert calls == []
+    assert result == {"changed": False, "package_results": []}
+
+
+def test_nothing_selected_still_runs_cache_options():
+    result, calls = run_action({"name": [], "autoremove": "yes"}, lambda args: {"changed": True})
+
+    assert calls == [{"autoremove": "yes"}]
+    assert result["changed"] and result["package_results"] == []
+
+
+def test_failed_batch_is_retried_per_package():
+    def apt(args):
+        if "bogus" in args["name"]:
+            return {"failed": True, "msg": "No package matching 'bogus' is available"}
+        return {"changed": True, "stdout": "Setting up ncdu (1.19-0.1) ...\n"}
+
+    result, calls = run_action({"name": ["tree", "bogus", "ncdu"], "state": "present"}, apt)
+
+    assert [call["name"] for call in calls] == [["tree", "bogus", "ncdu"], ["tree"], ["bogus"], ["ncdu"]]
+    assert result["failed"] and result["changed"]
+    assert result["msg"] == "Failed to install: bogus"
+    assert result["package_results"] == [
+        {"item": "tree", "status": "ok"},
+        {"item": "bogus", "status": "failed", "msg": "No package matching 'bogus' is available"},
+        {"item": "ncdu", "status": "changed"},
+    ]
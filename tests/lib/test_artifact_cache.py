@@ -0,0 +1,169 @@
+"""
+Unit tests for artifact_cache, against a local HTTP server
+"""
+
+import hashlib
+import os
+import threading
+import time
+import urllib.error
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+from lib.artifact_cache import EVICTION_GRACE_PERIOD, ArtifactCache, ChecksumMismatch, artifact_key, parse_checksum
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+
+
+class FileServer(BaseHTTPRequestHandler):
+    """Serves the server's `files` dict with ETags and counts full downloads"""
+
+    def do_GET(self):
+        body = self.server.files.get(self.path)
+        if body is None:
+            self.send_response(404)
+            self.end_headers()
+            return
+        etag = '"%s"' % hashlib.md5(body).hexdigest()
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.server.downloads.append(self.path)
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FileServer)
+    server.files = {"/tool.deb": b"deb v1" * 100, "/mirror/tool.deb": b"deb v1" * 100, "/app.AppImage": b"x" * 4000}
+    server.downloads = []
+    server.url = f"http://127.0.0.1:{server.server_port}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ArtifactCache(tmp_path / "artifacts")
+
+
+def sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def test_checksums_and_keys():
+    assert parse_checksum(None) is None
+    assert parse_checksum("SHA256: ABC") == ("sha256", "abc")
+    with pytest.raises(ValueError):
+        parse_checksum("sha256:https://example.invalid/SHA256SUMS")
+    with pytest.raises(ValueError):
+        parse_checksum("crc99:abc")
+    assert artifact_key("https://a/b") != artifact_key("https://a/b", "sha256:abc")
+
+
+def test_download_is_stored_by_content_and_reused(server, cache):
+    url = f"{server.url}/tool.deb"
+    first = cache.fetch(url)
+
+    assert first.status == "downloaded"
+    assert first.path == cache.blob_path(sha256(server.files["/tool.deb"]))
+    assert first.path.read_bytes() == server.files["/tool.deb"]
+
+    # Without a checksum the copy is revalidated; unchanged means no second download
+    second = cache.fetch(url)
+    assert second.status == "revalidated" and second.path == first.path
+    assert server.downloads == ["/tool.deb"]
+
+    # A new file behind the same URL replaces it
+    server.files["/tool.deb"] = b"deb v2"
+    assert cache.fetch(url).path.read_bytes() == b"deb v2"
+
+
+def test_checksummed_artifact_needs_no_request(server, cache):
+    body = server.files["/tool.deb"]
+    checksum = f"sha256:{sha256(body)}"
+    cache.fetch(f"{server.url}/tool.deb", checksum)
+
+    # The same content under another URL is found by its checksum
+    mirrored = cache.fetch(f"{server.url}/mirror/tool.deb", checksum)
+    assert mirrored.status == "hit"
+    assert server.downloads == ["/tool.deb"]
+
+    md5 = f"md5:{hashlib.md5(body).hexdigest()}"
+    assert cache.fetch(f"{server.url}/mirror/tool.deb", md5).status == "downloaded"
+    assert cache.get(f"{server.url}/mirror/tool.deb", md5).status == "hit"
+
+
+def test_checksum_mismatch_is_not_cached(server, cache):
+    with pytest.raises(ChecksumMismatch):
+        cache.fetch(f"{server.url}/tool.deb", "sha256:" + "0" * 64)
+
+    assert cache.size() == 0
+    assert not [path for path in cache.blobs_dir.iterdir()]
+
+
+def test_cached_copy_is_used_when_the_server_is_gone(server, cache):
+    url = f"{server.url}/tool.deb"
+    cached = cache.fetch(url)
+    server.shutdown()
+    server.server_close()
+
+    assert cache.fetch(url, timeout=2).path == cached.path
+    assert cache.fetch(url, offline=True).status == "hit"
+    with pytest.raises(FileNotFoundError):
+        cache.fetch(f"{server.url}/app.AppImage", offline=True)
+    with pytest.raises(urllib.error.URLError):
+        cache.fetch(f"{server.url}/app.AppImage", timeout=2)
+
+
+def test_least_recently_used_artifacts_are_evicted(server, tmp_path):
+    cache = ArtifactCache(tmp_path / "artifacts", max_size=5000)
+    deb = cache.fetch(f"{server.url}/tool.deb")
+    server.files["/other.deb"] = b"y" * 600
+    other = cache.fetch(f"{server.url}/other.deb")
+
+    # tool.deb is used again, so other.deb is now the least recently used
+    old = time.time() - EVICTION_GRACE_PERIOD - 60
+    os.utime(other.path, (old, old))
+    cache.fetch(f"{server.url}/tool.deb")
+
+    appimage = cache.fetch(f"{server.url}/app.AppImage")
+    assert appimage.path.exists() and deb.path.exists()
+    assert not other.path.exists()
+    assert cache.size() <= 5000
+    # An evicted artifact is simply downloaded again
+    assert cache.fetch(f"{server.url}/other.deb").status == "downloaded"
+
+
+def test_recently_used_artifacts_survive_eviction(server, tmp_path):
+    """An artifact another apply just fetched is kept even when the cache is over its limit"""
+    other_run = ArtifactCache(tmp_path / "artifacts")
+    deb = other_run.fetch(f"{server.url}/tool.deb")
+
+    cache = ArtifactCache(tmp_path / "artifacts", max_size=4000)
+    cache.fetch(f"{server.url}/app.AppImage")
+    assert deb.path.exists()
+    assert cache.size() > 4000
+
+    # Once it has aged past the grace period it is evicted like any other
+    old = time.time() - EVICTION_GRACE_PERIOD - 1
+    os.utime(deb.path, (old, old))
+    assert cache.evict() == [deb.sha256]
+
+
+def test_roles_download_through_the_cache():
+    for path in (REPO_ROOT / "roles").glob("*/*/*.yml"):
+        text = path.read_text()
+        assert "get_url:" not in text.replace("cached_get_url:", ""), path
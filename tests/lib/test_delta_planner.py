@@ -0,0 +1,116 @@
+"""
+Unit tests for delta_planner
+"""
+
+from pathlib import Path
+
+import pytest
+import yaml
+
+from lib.delta_planner import RoleReferenceIndex, config_delta, load_config, plan_delta, playbook_roles
+
+APPLIED = {
+    "metadata": {"version": "1.0"},
+    "selected_items": ["git", "vim"],
+    "configurable_items": {"swappiness": {"value": 10}},
+}
+
+
+@pytest.fixture
+def site(tmp_path):
+    """A playbook with two roles, plus one role it doesn't list"""
+    tasks = {
+        "common": "- name: Tune swap\n  sysctl: {name: vm.swappiness, value: '{{ system_swappiness }}'}\n",
+        "apps": "- name: Install\n  apt: {name: ghostty}\n  when: \"'ghostty' in selected_items\"\n",
+        "unused": "- name: Install\n  apt: {name: helm}\n",
+    }
+    for role, text in tasks.items():
+        (tmp_path / "roles" / role / "tasks").mkdir(parents=True)
+        (tmp_path / "roles" / role / "tasks" / "main.yml").write_text(text)
+    (tmp_path / "roles" / "apps" / "templates").mkdir()
+    (tmp_path / "roles" / "apps" / "templates" / "remove.sh.j2").write_text("{{ packages_to_remove | join(' ') }}\n")
+
+    site = tmp_path / "site.yml"
+    site.write_text(yaml.safe_dump([{"hosts": "all", "roles": ["common", {"role": "apps", "tags": ["apps"]}]}]))
+    return site
+
+
+def with_changes(selected=None, swappiness=10, **other):
+    config = {
+        "metadata": APPLIED["metadata"],
+        "selected_items": selected if selected is not None else APPLIED["selected_items"],
+        "configurable_items": {"swappiness": {"value": swappiness}},
+    }
+    config.update(other)
+    return config
+
+
+def var_name(item_id):
+    return f"system_{item_id}"
+
+
+class TestConfigDelta:
+    def test_selection_and_value_changes(self):
+        delta = config_delta(APPLIED, with_changes(["git", "ghostty"], swappiness=60))
+
+        assert delta.added == {"ghostty"}
+        assert delta.removed == {"vim"}
+        assert delta.changed_values == {"swappiness"}
+        assert delta.items == {"ghostty", "vim", "swappiness"}
+        assert not delta.other_keys
+
+    def test_other_settings_are_reported(self):
+        delta = config_delta(APPLIED, with_changes(theme="dark"))
+
+        assert delta.other_keys == {"theme"}
+        assert config_delta(APPLIED, with_changes()).empty
+
+    def test_load_config(self, tmp_path):
+        path = tmp_path / "applied.yml"
+        assert load_config(str(path)) is None
+        path.write_text("- not a mapping\n")
+        assert load_config(str(path)) is None
+        path.write_text(yaml.safe_dump(APPLIED))
+        assert load_config(str(path)) == APPLIED
+
+
+class TestPlanDelta:
+    def test_item_maps_to_the_roles_that_mention_it(self, site):
+        plan = plan_delta(APPLIED, with_changes(["git", "vim", "ghostty"]), site)
+
+        assert plan.roles == ["apps"]
+        assert plan.reasons == {"apps": ["ghostty"]}
+
+    def test_value_change_maps_through_the_variable_name(self, site):
+        plan = plan_delta(APPLIED, with_changes(swappiness=60), site, var_name=var_name)
+
+        assert plan.roles == ["common"]
+        assert plan.reasons == {"common": ["swappiness"]}
+
+    def test_extra_words(self, site):
+        plan = plan_delta(
+            APPLIED, with_changes(["git", "vim", "ghostty"], swappiness=60), site, var_name, ["packages_to_remove"]
+        )
+
+        assert plan.roles == ["apps", "common"]
+        assert plan.reasons["apps"] == ["ghostty", "packages_to_remove"]
+
+    def test_roles_outside_the_playbook_are_ignored(self, site):
+        assert playbook_roles(site) == ["common", "apps"]
+        assert "unused" in RoleReferenceIndex(site.parent / "roles").roles_for("helm")
+        assert plan_delta(APPLIED, with_changes(["git", "vim", "helm"]), site) is None
+
+    @pytest.mark.parametrize(
+        "applied, current",
+        [
+            (None, with_changes(["git", "ghostty"])),
+            (APPLIED, with_changes()),
+            (APPLIED, with_changes(["git", "vim", "ghostty"], theme="dark")),
+            (APPLIED, with_changes(["git", "vim", "not-mentioned"])),
+            (APPLIED, with_changes(["git", "vim", "ghostty", "not-mentioned"])),
+            (APPLIED, with_changes(["git", "ghostty"])),
+        ],
+        ids=["never-applied", "unchanged", "other-setting", "unreferenced-item", "mixed", "mixed-removal"],
+    )
+    def test_full_apply_cases(self, site, applied, current):
+        assert plan_delta(applied, current, site) is None
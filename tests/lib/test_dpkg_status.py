@@ -0,0 +1,146 @@
+"""
+Unit tests for dpkg_status
+"""
+
+import shutil
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from lib.dpkg_status import DPKG_STATUS_FILE, iter_status_stanzas, read_installed_packages
+
+STATUS_FIXTURE = """\
+Package: dpkg
+Essential: yes
+Status: install ok installed
+Priority: required
+Section: admin
+Installed-Size: 6733
+Maintainer: Ubuntu Developers <ubuntu-devel-discuss@lists.ubuntu.com>
+Architecture: amd64
+Multi-Arch: foreign
+Version: 1.21.1ubuntu2.3
+Description: Debian package management system
+ This package provides the low-level infrastructure for handling the
+ installation and removal of Debian software packages.
+ .
+ Package: not-a-real-field
+
+Package: libc6
+Status: install ok installed
+Installed-Size: 13592
+Architecture: amd64
+Multi-Arch: same
+Version: 2.35-0ubuntu3.6
+Description: GNU C Library: Shared libraries
+
+Package: libc6
+Status: install ok installed
+Installed-Size: 12056
+Architecture: i386
+Multi-Arch: same
+Version: 2.35-0ubuntu3.6
+Description: GNU C Library: Shared libraries
+
+Package: steam-libs
+Status: install ok installed
+Architecture: i386
+Version: 1:1.0.0.74
+Description: Steam runtime libraries
+
+
+Package: tzdata
+Status: install ok installed
+Installed-Size: 3879
+Architecture: all
+Multi-Arch: foreign
+Version: 2024a-0ubuntu0.22.04
+Conffiles:
+ /etc/timezone abcdef
+
+Package: vim
+Status: deinstall ok config-files
+Architecture: amd64
+Version: 2:8.2.3995-1ubuntu2.15
+
+Package: nano
+Status: hold ok half-installed
+Architecture: amd64
+Version: 6.2-1
+"""
+
+
+@pytest.fixture
+def status_file(tmp_path):
+    """dpkg status fixture covering multi-arch, config-files and half-installed packages"""
+    path = tmp_path / "status"
+    path.write_text(STATUS_FIXTURE)
+    return path
+
+
+class TestDpkgStatus:
+    """Test the dpkg status file reader"""
+
+    def test_iter_status_stanzas(self, status_file):
+        """Test each stanza yields its wanted fields only"""
+        stanzas = list(iter_status_stanzas(str(status_file)))
+
+        assert [fields["package"] for fields in stanzas] == [
+            "dpkg",
+            "libc6",
+            "libc6",
+            "steam-libs",
+            "tzdata",
+            "vim",
+            "nano",
+        ]
+        assert stanzas[0] == {
+            "package": "dpkg",
+            "status": "install ok installed",
+            "installed_size": "6733",
+            "architecture": "amd64",
+            "multi_arch": "foreign",
+            "version": "1.21.1ubuntu2.3",
+        }
+
+    def test_read_installed_packages(self, status_file):
+        """Test only installed packages are kept, named like ${binary:Package}"""
+        packages = read_installed_packages(str(status_file))
+
+        assert sorted(packages) == ["dpkg", "libc6:amd64", "libc6:i386", "steam-libs:i386", "tzdata"]
+        assert packages["dpkg"] == {"version": "1.21.1ubuntu2.3", "status": "installed", "size": "6733"}
+        assert packages["steam-libs:i386"]["size"] == ""
+
+    def test_empty_status_file(self, tmp_path):
+        """Test an empty database has no packages"""
+        path = tmp_path / "status"
+        path.write_bytes(b"")
+
+        assert read_installed_packages(str(path)) == {}
+
+    def test_missing_status_file_raises(self, tmp_path):
+        """Test an unreadable database raises so callers can fall back to dpkg-query"""
+        with pytest.raises(OSError):
+            read_installed_packages(str(tmp_path / "missing"))
+
+    @pytest.mark.skipif(
+        not Path(DPKG_STATUS_FILE).exists() or shutil.which("dpkg-query") is None, reason="requires dpkg"
+    )
+    def test_matches_dpkg_query(self):
+        """Test the reader agrees with dpkg-query on this system"""
+        output = subprocess.run(
+            ["dpkg-query", "-W", "-f=${binary:Package}|${Version}|${Status}\n"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+
+        expected = {}
+        for line in output.splitlines():
+            package, version, status = line.split("|")
+            if "install ok installed" in status:
+                expected[package] = version
+
+        packages = read_installed_packages()
+        assert {package: info["version"] for package, info in packages.items()} == expected
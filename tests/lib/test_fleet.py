@@ -0,0 +1,151 @@
+"""
+Unit tests for fleet
+"""
+
+import io
+import stat
+import sys
+
+from lib.fleet import FleetProgress, fleet_command, format_duration, main, parse_list_hosts, run_fleet
+
+LIST_HOSTS_OUTPUT = """\
+
+playbook: site.yml
+
+  play #1 (all): Bootstrap Ubuntu Desktop Environment\tTAGS: []
+    pattern: ['all']
+    hosts (3):
+      desk-01
+      desk-02
+      desk-03
+"""
+
+EVENTS = [
+    {"event": "play_start", "name": "Bootstrap"},
+    {"event": "task_start", "task": "Gather facts"},
+    {"event": "result", "host": "desk-01", "task": "Gather facts", "status": "ok", "time": 100.0},
+    {"event": "result", "host": "desk-02", "task": "Gather facts", "status": "ok", "time": 101.0},
+    {"event": "result", "host": "desk-03", "task": "Gather facts", "status": "unreachable", "msg": "timed out"},
+    {"event": "task_start", "task": "Install packages"},
+    {"event": "result", "host": "desk-01", "task": "Install packages", "status": "changed", "time": 160.0},
+    {
+        "event": "result",
+        "host": "desk-02",
+        "task": "Install packages",
+        "status": "failed",
+        "msg": "No package matching 'docker-ce'",
+        "time": 130.0,
+    },
+    {"event": "task_start", "task": "Stop unattended-upgrades"},
+    {
+        "event": "result",
+        "host": "desk-01",
+        "task": "Stop unattended-upgrades",
+        "status": "failed",
+        "ignore_errors": True,
+        "time": 170.0,
+    },
+]
+
+STATS = {
+    "event": "stats",
+    "hosts": {
+        "desk-01": {"ok": 3, "changed": 1, "failures": 0, "unreachable": 0, "skipped": 4, "ignored": 1},
+        "desk-02": {"ok": 1, "changed": 0, "failures": 1, "unreachable": 0, "skipped": 0, "ignored": 0},
+        "desk-03": {"ok": 0, "changed": 0, "failures": 0, "unreachable": 1, "skipped": 0, "ignored": 0},
+    },
+}
+
+# Stand-in for ansible-playbook: replays EVENTS and STATS on UBOOTU_EVENT_FD
+FAKE_ANSIBLE = """\
+#!{python}
+import json, os, sys
+
+assert os.environ["ANSIBLE_STDOUT_CALLBACK"] == "ubootu_events"
+with os.fdopen(int(os.environ["UBOOTU_EVENT_FD"]), "w") as events:
+    for event in {events!r}:
+        events.write(json.dumps(event) + "\\n")
+sys.exit(2)
+"""
+
+
+def test_fleet_command_uses_the_inventory_and_forks():
+    command = fleet_command("inventories/production", "/tmp/config.yml", forks=25, limit="desks", check=True)
+
+    assert command[:2] == ["ansible-playbook", "site.yml"]
+    assert command[command.index("-i") + 1] == "inventories/production"
+    assert command[command.index("--forks") + 1] == "25"
+    assert command[command.index("--limit") + 1] == "desks"
+    assert "@/tmp/config.yml" in command and "--check" in command
+    assert "--connection" not in command
+
+
+def test_hosts_are_read_from_list_hosts():
+    assert parse_list_hosts(LIST_HOSTS_OUTPUT) == ["desk-01", "desk-02", "desk-03"]
+    assert parse_list_hosts("") == []
+
+
+def test_progress_is_aggregated_per_host():
+    progress = FleetProgress(["desk-01", "desk-02", "desk-03", "desk-04"])
+    printed = [line for event in EVENTS for line in progress.handle(event)]
+
+    hosts = progress.hosts
+    assert (hosts["desk-01"].ok, hosts["desk-01"].changed, hosts["desk-01"].ignored) == (2, 1, 1)
+    assert hosts["desk-01"].status == "running" and hosts["desk-01"].duration == 70.0
+    assert hosts["desk-02"].status == "failed"
+    assert hosts["desk-02"].failures == ["Install packages: No package matching 'docker-ce'"]
+    assert hosts["desk-03"].status == "unreachable"
+    assert hosts["desk-04"].status == "not run"
+
+    # Failures are printed as they happen; ignored errors are not
+    assert "desk-02: FAILED Install packages: No package matching 'docker-ce'" in printed
+    assert "desk-03: UNREACHABLE Gather facts: timed out" in printed
+    assert not any("Stop unattended-upgrades:" in line for line in printed)
+    assert printed[-1].endswith("Stop unattended-upgrades (2/4 hosts, 1 failed, 1 unreachable)")
+
+    progress.handle(STATS)
+    assert hosts["desk-01"].status == "changed" and hosts["desk-01"].ok == 3
+    assert progress.counts() == {"changed": 1, "failed": 1, "unreachable": 1, "not run": 1}
+
+
+def test_summary_lists_every_host_and_its_failures():
+    progress = FleetProgress()
+    for event in EVENTS + [STATS]:
+        progress.handle(event)
+
+    lines = progress.summary_lines()
+    assert lines[0].split() == ["HOST", "STATUS", "OK", "CHANGED", "FAILED", "SKIPPED", "TIME"]
+    assert lines[1].split() == ["desk-01", "changed", "3", "1", "0", "4", "1m", "10s"]
+    assert lines[3] == "  - Install packages: No package matching 'docker-ce'"
+    assert lines[-1] == "3 hosts: 1 changed, 1 failed, 1 unreachable"
+    assert progress.to_dict()["desk-02"]["status"] == "failed"
+
+
+def test_run_follows_the_event_stream(tmp_path):
+    fake = tmp_path / "ansible-playbook"
+    fake.write_text(FAKE_ANSIBLE.format(python=sys.executable, events=EVENTS + [STATS]))
+    fake.chmod(fake.stat().st_mode | stat.S_IXUSR)
+    output = io.StringIO()
+
+    command = fleet_command(tmp_path / "hosts", tmp_path / "config.yml", forks=5)
+    returncode, progress = run_fleet([str(fake)] + command[1:], ["desk-01", "desk-02", "desk-03"], output)
+
+    assert returncode == 2
+    assert progress.finished
+    assert progress.counts() == {"changed": 1, "failed": 1, "unreachable": 1}
+    assert "desk-02: FAILED" in output.getvalue()
+
+
+def test_missing_ansible_is_a_plain_error(tmp_path, monkeypatch, capsys):
+    config = tmp_path / "config.yml"
+    config.write_text("selected_items: []\n")
+    monkeypatch.setenv("PATH", str(tmp_path))
+
+    assert main(["-i", str(tmp_path / "hosts"), "-c", str(config)]) == 1
+    assert capsys.readouterr().err.startswith("Error: could not run ansible-playbook: ")
+
+
+def test_format_duration():
+    assert format_duration(42) == "42s"
+    assert format_duration(245) == "4m 05s"
+    assert format_duration(7260) == "2h 01m"
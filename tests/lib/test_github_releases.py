@@ -0,0 +1,167 @@
+"""
+Unit tests for github_releases, against a local stand-in for the GitHub API
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+import yaml
+
+from lib.github_releases import ReleaseCache, ReleaseResolver
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+
+
+class FakeGitHub(BaseHTTPRequestHandler):
+    """Serves /repos/<owner>/<name>/releases/latest from the server's `releases` dict"""
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append((self.path, self.headers.get("If-None-Match")))
+            server.active += 1
+            server.peak = max(server.peak, server.active)
+        try:
+            time.sleep(server.delay)
+            repo = self.path[len("/repos/") : -len("/releases/latest")]
+            if server.status != 200 or repo not in server.releases:
+                self.send_response(server.status if server.status != 200 else 404)
+                self.end_headers()
+                return
+            release = server.releases[repo]
+            etag = f'"{release["tag_name"]}"'
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+            body = json.dumps(release).encode()
+            self.send_response(200)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+def make_release(tag, repo):
+    name = repo.split("/")[1]
+    return {
+        "tag_name": tag,
+        "name": tag,
+        "body": "release notes " * 100,
+        "author": {"login": "someone"},
+        "assets": [
+            {
+                "name": f"{name}_{tag}_amd64.deb",
+                "browser_download_url": f"https://example.invalid/{repo}/{tag}/{name}_amd64.deb",
+                "size": 1024,
+                "download_count": 7,
+            }
+        ],
+    }
+
+
+@pytest.fixture
+def github():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeGitHub)
+    server.releases = {repo: make_release("v1.0.0", repo) for repo in ("sharkdp/fd", "sharkdp/bat", "cli/cli")}
+    server.requests = []
+    server.lock = threading.Lock()
+    server.active = server.peak = 0
+    server.delay = 0
+    server.status = 200
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def resolver(github, tmp_path):
+    return ReleaseResolver(
+        ReleaseCache(tmp_path / "releases"), api_url=f"http://127.0.0.1:{github.server_port}", token=""
+    )
+
+
+def test_release_is_cached_and_slimmed(github, resolver):
+    result = resolver.resolve("sharkdp/fd")
+
+    assert not result["failed"] and not result["cached"]
+    assert result["json"]["tag_name"] == "v1.0.0"
+    assert result["json"]["assets"][0]["browser_download_url"].endswith("fd_amd64.deb")
+    assert "body" not in result["json"] and "download_count" not in result["json"]["assets"][0]
+
+    # Within the TTL the cache answers without a request
+    assert resolver.resolve("sharkdp/fd")["cached"]
+    assert len(github.requests) == 1
+
+
+def test_stale_entry_is_revalidated_with_etag(github, resolver):
+    resolver.resolve("sharkdp/fd")
+    resolver.cache.ttl = 0
+    time.sleep(0.01)
+
+    result = resolver.resolve("sharkdp/fd")
+    assert result["status"] == 304 and result["cached"]
+    assert github.requests[-1] == ("/repos/sharkdp/fd/releases/latest", '"v1.0.0"')
+
+    github.releases["sharkdp/fd"] = make_release("v2.0.0", "sharkdp/fd")
+    time.sleep(0.01)
+    result = resolver.resolve("sharkdp/fd")
+    assert result["status"] == 200 and result["json"]["tag_name"] == "v2.0.0"
+
+
+def test_batch_resolves_concurrently_in_order(github, resolver):
+    github.delay = 0.2
+    repos = ["cli/cli", "sharkdp/fd", "sharkdp/bat", "sharkdp/fd"]
+
+    results = resolver.resolve_all(repos)
+
+    assert [result["repo"] for result in results] == repos
+    # Duplicates are asked for once, and the requests overlap
+    assert len(github.requests) == 3
+    assert github.peak > 1
+
+
+def test_cached_release_is_used_when_github_refuses(github, resolver):
+    resolver.resolve("sharkdp/fd")
+    resolver.cache.ttl = 0
+    github.status = 403
+
+    result = resolver.resolve("sharkdp/fd")
+    assert not result["failed"] and result["stale"]
+    assert "403" in result["msg"]
+
+    missing = resolver.resolve("sharkdp/bat")
+    assert missing["failed"] and missing["json"] == {}
+
+
+def test_offline_resolver_answers_from_the_cache_only(github, resolver):
+    resolver.resolve("sharkdp/fd")
+    offline = ReleaseResolver(ReleaseCache(resolver.cache.cache_dir, ttl=0), api_url=resolver.api_url, offline=True)
+
+    assert offline.resolve("sharkdp/fd")["json"]["tag_name"] == "v1.0.0"
+    assert offline.resolve("sharkdp/bat")["failed"]
+    assert len(github.requests) == 1
+
+
+def test_roles_use_the_release_lookup():
+    """No role asks the GitHub API directly any more"""
+    for path in (REPO_ROOT / "roles").glob("*/tasks/*.yml"):
+        assert "api.github.com" not in path.read_text(), path
+
+    tasks = yaml.safe_load((REPO_ROOT / "roles/development-tools/tasks/cli-tools-comprehensive.yml").read_text())
+    batch = next(task for task in tasks if task.get("name") == "Get latest GitHub releases for modern CLI tools")
+    assert "query('github_release'" in batch["ansible.builtin.set_fact"]["github_releases"]["results"]
@@ -0,0 +1,197 @@
+"""
+Unit tests for offline_bundle
+"""
+
+import gzip
+import json
+import shutil
+import subprocess
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from lib.artifact_cache import ArtifactCache
+from lib.offline_bundle import (
+    ARTIFACTS_DIR,
+    BundleError,
+    BundleRecord,
+    build_bundle,
+    deactivate,
+    download_artifacts,
+    load_manifest,
+    parse_depends,
+    read_record,
+    write_apt_config,
+    write_apt_index,
+    write_manifest,
+)
+
+RECORD = [
+    {"module": "apt", "args": {"name": ["git", "nodejs=20.11.1-1nodesource1"], "state": "present"}},
+    {"module": "apt_batch", "args": {"name": "htop,ncdu"}},
+    {"module": "apt", "args": {"name": ["nano"], "state": "absent"}},
+    {"module": "package", "args": {"name": ["curl"]}},
+    {"module": "cached_get_url", "args": {"url": "https://example.invalid/a.deb", "dest": "/tmp/"}},
+    {"module": "get_url", "args": {"url": "https://example.invalid/b.tar.gz", "checksum": "sha256:abc"}},
+    {"module": "cached_get_url", "args": {"dest": "/tmp/c"}, "url": "https://example.invalid/c"},
+    {"module": "snap", "args": {"name": "helm", "classic": "yes"}},
+    {"module": "snap", "args": {"name": ["ngrok"], "channel": "edge"}},
+    {"module": "flatpak", "args": {"name": "com.spotify.Client"}},
+    {
+        "module": "shell",
+        "task": "Install zoxide",
+        "args": {"_raw_params": "curl -sS https://example.invalid/install.sh | bash", "creates": "/usr/bin/zoxide"},
+    },
+    {"module": "command", "task": "Fetch key", "args": {"argv": ["wget", "-O", "/tmp/k", "https://example.invalid/k"]}},
+]
+
+DEPENDS_OUTPUT = """\
+git
+  Depends: libc6
+  Depends: perl
+  Recommends: less
+libc6
+  Depends: libgcc-s1
+perl
+  PreDepends: dpkg
+<perlapi-5.38.2>
+libgcc-s1
+git
+"""
+
+
+class FileServer(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = self.server.files.get(self.path)
+        self.send_response(200 if body is not None else 404)
+        self.end_headers()
+        if body is not None:
+            self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FileServer)
+    server.files = {"/tool.deb": b"deb" * 100, "/tool.AppImage": b"app" * 100}
+    server.url = f"http://127.0.0.1:{server.server_port}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_record_lists_what_the_run_installs(tmp_path):
+    path = tmp_path / "record.jsonl"
+    path.write_text("\n".join(json.dumps(entry) for entry in RECORD) + "\nnot json\n")
+
+    record = read_record(path)
+
+    assert record.apt == {"git", "nodejs", "htop", "ncdu", "curl"}
+    assert record.downloads == {
+        "https://example.invalid/a.deb": None,
+        "https://example.invalid/b.tar.gz": "sha256:abc",
+        "https://example.invalid/c": None,
+    }
+    assert record.snaps == {
+        "helm": {"classic": True, "channel": "stable"},
+        "ngrok": {"classic": False, "channel": "edge"},
+    }
+    assert record.flatpaks == {"com.spotify.Client"}
+    assert record.commands == {
+        "Install zoxide": ["https://example.invalid/install.sh"],
+        "Fetch key": ["https://example.invalid/k"],
+    }
+    assert read_record(tmp_path / "missing.jsonl") == BundleRecord()
+
+
+def test_dependency_closure_is_parsed():
+    assert parse_depends(DEPENDS_OUTPUT) == ["git", "libc6", "perl", "libgcc-s1"]
+
+
+@pytest.mark.skipif(shutil.which("dpkg-deb") is None, reason="needs dpkg-deb")
+def test_apt_index_covers_every_package(tmp_path):
+    source = tmp_path / "hello" / "DEBIAN"
+    source.mkdir(parents=True)
+    (source / "control").write_text(
+        "Package: ubootu-hello\nVersion: 1.0\nArchitecture: all\nMaintainer: Ubootu <ubootu@example.invalid>\n"
+        "Description: test package\n"
+    )
+    repo = tmp_path / "apt"
+    repo.mkdir()
+    subprocess.run(["dpkg-deb", "--build", str(source.parent), str(repo / "ubootu-hello_1.0_all.deb")], check=True)
+
+    assert write_apt_index(repo) == 1
+
+    index = (repo / "Packages").read_text()
+    assert "Package: ubootu-hello\n" in index
+    assert "Filename: ./ubootu-hello_1.0_all.deb\n" in index
+    assert "SHA256: " in index
+    with gzip.open(repo / "Packages.gz", "rt") as f:
+        assert f.read() == index
+    assert " Packages.gz\n" in (repo / "Release").read_text()
+
+
+def test_bundled_downloads_are_served_offline(server, tmp_path):
+    cache = ArtifactCache(tmp_path / ARTIFACTS_DIR)
+    downloads = {
+        f"{server.url}/tool.deb": None,
+        f"{server.url}/tool.AppImage": "sha256:https://example.invalid/SHA256SUMS",
+        f"{server.url}/gone.deb": None,
+    }
+
+    assert download_artifacts(downloads, cache) == [f"{server.url}/gone.deb"]
+    server.shutdown()
+    server.server_close()
+
+    assert cache.fetch(f"{server.url}/tool.deb", offline=True).path.read_bytes() == server.files["/tool.deb"]
+    assert cache.fetch(f"{server.url}/tool.AppImage", offline=True).status == "hit"
+
+
+def test_apt_reads_only_the_bundle_while_active(tmp_path):
+    apt_etc = tmp_path / "etc-apt"
+    bundle = tmp_path / "bundle"
+    (bundle / "apt").mkdir(parents=True)
+
+    write_apt_config(bundle, apt_etc)
+
+    sources = apt_etc / "ubootu-bundle"
+    assert (sources / "sources.list").read_text() == f"deb [trusted=yes] file:{bundle / 'apt'} ./\n"
+    assert not list((sources / "sources.list.d").iterdir())
+    config = (apt_etc / "apt.conf.d" / "99ubootu-bundle").read_text()
+    assert f'Dir::Etc::SourceList "{sources}/sources.list";' in config
+    assert f'Dir::Etc::SourceParts "{sources}/sources.list.d";' in config
+
+    deactivate(apt_etc)
+    assert not sources.exists()
+    assert not (apt_etc / "apt.conf.d" / "99ubootu-bundle").exists()
+
+
+def test_manifest_format_is_checked(tmp_path):
+    with pytest.raises(BundleError):
+        load_manifest(tmp_path)
+
+    write_manifest(tmp_path, {"format": 1, "snaps": []})
+    assert load_manifest(tmp_path)["format"] == 1
+    write_manifest(tmp_path, {"format": 99})
+    with pytest.raises(BundleError):
+        load_manifest(tmp_path)
+
+
+def test_manifest_is_complete_only_without_gaps(tmp_path, monkeypatch):
+    monkeypatch.setattr("lib.offline_bundle.apt_closure", lambda packages: (sorted(packages), []))
+    monkeypatch.setattr("lib.offline_bundle.download_apt_packages", lambda packages, directory: [])
+    monkeypatch.setattr("lib.offline_bundle.write_apt_index", lambda directory: 0)
+    monkeypatch.setattr("lib.offline_bundle.download_collections", lambda directory: True)
+
+    assert build_bundle(BundleRecord(apt={"git"}), tmp_path / "full")["complete"] is True
+    assert build_bundle(BundleRecord(apt={"git"}), tmp_path / "stopped", run_finished=False)["complete"] is False
+
+    record = BundleRecord(apt={"git"}, commands={"Install zoxide": ["https://example.invalid/install.sh"]})
+    manifest = build_bundle(record, tmp_path / "scripts")
+    assert manifest["complete"] is False and manifest["run_finished"] is True
+    assert manifest["unbundled"]["commands"] == {"Install zoxide": ["https://example.invalid/install.sh"]}
+    assert load_manifest(tmp_path / "scripts")["complete"] is False
@@ -0,0 +1,260 @@
+"""
+Unit tests for role_scheduler
+"""
+
+import io
+import os
+import stat
+import sys
+import textwrap
+from pathlib import Path
+
+import pytest
+import yaml
+
+from lib.role_scheduler import (
+    SCHEDULED_ROLES_VAR,
+    RolePlan,
+    RoleScheduler,
+    build_role_graph,
+    evaluate_condition,
+    execution_waves,
+    find_playbook,
+    read_extra_vars,
+    read_play_variables,
+    scheduled_command,
+)
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+
+# Stand-in for ansible-playbook: logs when each generated play starts and ends
+FAKE_ANSIBLE = """\
+#!{python}
+import json, sys, time
+import yaml
+
+play = yaml.safe_load(open(sys.argv[1]))[0]
+roles = [entry["role"] if isinstance(entry, dict) else entry for entry in play.get("roles") or []]
+label = roles[0] if roles else ("prepare" if play.get("pre_tasks") else "finish")
+scheduled = json.loads(sys.argv[sys.argv.index("--extra-vars") + 1])
+with open({log!r}, "a") as log:
+    log.write(f"start {{label}} {{time.time()}} {{','.join(scheduled[{var!r}])}}\\n")
+print(f"running {{label}}")
+time.sleep(0.3)
+with open({log!r}, "a") as log:
+    log.write(f"end {{label}} {{time.time()}}\\n")
+sys.exit(3 if label == "broken" else 0)
+"""
+
+
+def write_role(roles_dir, name, dependencies=None):
+    meta_dir = roles_dir / name / "meta"
+    meta_dir.mkdir(parents=True)
+    meta = {"galaxy_info": {"author": "test"}}
+    if dependencies is not None:
+        meta["dependencies"] = [{"role": dependency} for dependency in dependencies]
+    (meta_dir / "main.yml").write_text(yaml.safe_dump(meta))
+
+
+def write_site(tmp_path, roles):
+    play = {
+        "name": "Test",
+        "hosts": "all",
+        "pre_tasks": [
+            {"name": "Facts", "ansible.builtin.setup": None, "tags": "always"},
+            {"name": "Cleanup", "ansible.builtin.shell": "true"},
+        ],
+        "roles": roles,
+        "post_tasks": [{"name": "Done", "ansible.builtin.debug": {"msg": "done"}}],
+    }
+    site = tmp_path / "site.yml"
+    site.write_text(yaml.safe_dump([play], sort_keys=False))
+    return site
+
+
+class TestConditions:
+    def test_simple_conditions(self):
+        assert evaluate_condition(None, {}) is True
+        assert evaluate_condition("enable_x | default(false)", {}) is False
+        assert evaluate_condition("enable_x | default(true)", {}) is True
+        assert evaluate_condition("enable_x | default(false)", {"enable_x": True}) is True
+        assert evaluate_condition("enable_x", {"enable_x": "no"}) is False
+        assert evaluate_condition("not enable_x | default(false)", {}) is True
+        assert evaluate_condition(["a | default(true)", "b | default(false)"], {}) is False
+
+    def test_complex_conditions_are_undecided(self):
+        assert evaluate_condition("enable_x", {}) is None
+        assert evaluate_condition("ansible_os_family == 'Debian'", {}) is None
+
+    def test_read_extra_vars(self, tmp_path):
+        vars_file = tmp_path / "vars.yml"
+        vars_file.write_text("enable_x: true\n")
+        command = ["ansible-playbook", "site.yml", "-e", f"@{vars_file}", "--extra-vars", '{"y": 1}', "-e", "z=2"]
+        assert read_extra_vars(command) == {"enable_x": True, "y": 1, "z": "2"}
+
+    def test_templated_values_are_undecided(self):
+        assert evaluate_condition("enable_x", {"enable_x": "{{ other }}"}) is None
+
+    def test_play_variables_follow_precedence(self, tmp_path):
+        (tmp_path / "inventory" / "group_vars").mkdir(parents=True)
+        (tmp_path / "inventory" / "hosts").write_text("localhost\n")
+        (tmp_path / "inventory" / "group_vars" / "all.yml").write_text("a: inventory\nb: inventory\nc: inventory\n")
+        (tmp_path / "group_vars" / "all").mkdir(parents=True)
+        (tmp_path / "group_vars" / "all" / "main.yml").write_text("b: playbook\nc: playbook\n")
+        site = tmp_path / "site.yml"
+        command = ["ansible-playbook", str(site), "-i", str(tmp_path / "inventory" / "hosts"), "-e", "c=extra"]
+
+        assert read_play_variables(command, site) == {"a": "inventory", "b": "playbook", "c": "extra"}
+
+
+class TestRoleGraph:
+    def test_repository_roles(self):
+        roles = ["common", "themes", "development-tools", "security-tools", "dotfiles"]
+        graph = build_role_graph(roles, REPO_ROOT / "roles")
+
+        assert graph["common"] == []
+        assert graph["themes"] == []
+        assert graph["security-tools"] == ["common", "development-tools"]
+        # Both edit ~/.zshrc and ~/.vimrc, so they keep the playbook's order
+        assert graph["development-tools"] == ["common", "themes"]
+        assert graph["dotfiles"] == ["common", "themes", "development-tools"]
+        assert execution_waves(graph) == [["common", "themes"], ["development-tools"], ["security-tools", "dotfiles"]]
+
+    def test_themes_run_after_the_desktop_environment(self):
+        """Both set the GTK theme and color scheme through dconf"""
+        plan = RolePlan(REPO_ROOT / "site.yml", {"enable_development_tools": True})
+
+        assert "desktop-environment" in plan.graph["themes"]
+        position = {role: step for step, wave in enumerate(plan.waves) for role in wave}
+        assert position["themes"] > position["desktop-environment"]
+        assert position["dotfiles"] > max(position["themes"], position["development-tools"])
+
+    def test_roles_editing_the_same_file_keep_playbook_order(self, tmp_path):
+        for name in ("prompt", "aliases", "tools"):
+            write_role(tmp_path, name, [])
+            (tmp_path / name / "tasks").mkdir()
+        (tmp_path / "prompt" / "tasks" / "main.yml").write_text(
+            yaml.safe_dump([{"lineinfile": {"path": "/home/{{ primary_user }}/.bashrc", "line": "eval x"}}])
+        )
+        (tmp_path / "aliases" / "tasks" / "main.yml").write_text(
+            yaml.safe_dump([{"block": [{"ansible.builtin.shell": "echo 'alias ll=ls' >> ~/.bashrc"}]}])
+        )
+        (tmp_path / "tools" / "tasks" / "main.yml").write_text(
+            yaml.safe_dump([{"copy": {"dest": "{{ ansible_env.HOME }}/.tool.conf", "content": "x"}}])
+        )
+
+        graph = build_role_graph(["prompt", "aliases", "tools"], tmp_path)
+        assert graph == {"prompt": [], "aliases": ["prompt"], "tools": []}
+
+    def test_dependency_outside_the_plan_is_looked_through(self, tmp_path):
+        write_role(tmp_path, "base", [])
+        write_role(tmp_path, "middle", ["base"])
+        write_role(tmp_path, "top", ["middle"])
+
+        assert build_role_graph(["base", "top"], tmp_path) == {"base": [], "top": ["base"]}
+
+    def test_cycle_is_reported(self, tmp_path):
+        write_role(tmp_path, "a", ["b"])
+        write_role(tmp_path, "b", ["a"])
+
+        with pytest.raises(ValueError, match="cycle"):
+            execution_waves(build_role_graph(["a", "b"], tmp_path))
+
+    def test_site_plan_skips_disabled_roles(self):
+        plan = RolePlan(REPO_ROOT / "site.yml", {"enable_development_tools": False})
+
+        assert "development-tools" in plan.skipped
+        assert "security-tools" in plan.skipped
+        assert plan.waves[0][0] == "common"
+        assert all(dependencies == ["common"] for role, dependencies in plan.graph.items() if role in plan.waves[1])
+
+    def test_role_play_keeps_only_always_pre_tasks(self, tmp_path):
+        write_role(tmp_path / "roles", "common", [])
+        plan = RolePlan(write_site(tmp_path, [{"role": "common", "tags": ["common"]}]))
+
+        play = plan.role_play("common")
+        assert [task["name"] for task in play["pre_tasks"]] == ["Facts"]
+        assert play["roles"] == [{"role": "common", "tags": ["common"]}]
+        assert play["post_tasks"] == []
+        assert plan.prepare_play()["roles"] == [] and len(plan.prepare_play()["pre_tasks"]) == 2
+        assert plan.finish_play()["pre_tasks"] == [] and plan.finish_play()["post_tasks"]
+
+    def test_only_runs_the_listed_roles(self, tmp_path):
+        write_role(tmp_path / "roles", "common", [])
+        write_role(tmp_path / "roles", "themes", [])
+        write_role(tmp_path / "roles", "apps", ["common"])
+        plan = RolePlan(write_site(tmp_path, ["common", "themes", "apps"]), only=["apps"])
+
+        assert plan.roles == ["apps"]
+        assert plan.unchanged == ["common", "themes"]
+        assert plan.graph == {"apps": []}
+        # Roles left as applied still count as done for meta dependencies
+        assert plan.standalone_roles == ["common", "themes", "apps"]
+
+
+class TestRoleScheduler:
+    def make_scheduler(self, tmp_path, roles, dependencies):
+        for name, needs in dependencies.items():
+            write_role(tmp_path / "roles", name, needs)
+        site = write_site(tmp_path, roles)
+
+        log = tmp_path / "runs.log"
+        fake = tmp_path / "ansible-playbook"
+        fake.write_text(FAKE_ANSIBLE.format(python=sys.executable, log=str(log), var=SCHEDULED_ROLES_VAR))
+        fake.chmod(fake.stat().st_mode | stat.S_IXUSR)
+
+        output = io.StringIO()
+        scheduler = RoleScheduler(RolePlan(site), [str(fake), str(site), "-i", "localhost,"], 4, output)
+        return scheduler, log, output
+
+    @staticmethod
+    def read_log(log):
+        runs = {}
+        for line in log.read_text().splitlines():
+            kind, label, when = line.split()[:3]
+            runs.setdefault(label, {})[kind] = float(when)
+        return runs
+
+    def test_independent_roles_overlap_and_dependents_wait(self, tmp_path):
+        scheduler, log, output = self.make_scheduler(
+            tmp_path, ["common", "themes", "apps"], {"common": [], "themes": [], "apps": ["common"]}
+        )
+
+        assert scheduler.run() == 0
+        runs = self.read_log(log)
+
+        assert runs["prepare"]["end"] <= min(runs[role]["start"] for role in ("common", "themes", "apps"))
+        assert runs["common"]["start"] < runs["themes"]["end"] and runs["themes"]["start"] < runs["common"]["end"]
+        assert runs["apps"]["start"] >= runs["common"]["end"]
+        assert runs["finish"]["start"] >= max(runs[role]["end"] for role in ("common", "themes", "apps"))
+        assert "[themes] running themes" in output.getvalue()
+        assert "start common" in log.read_text() and "common,themes,apps" in log.read_text()
+
+        # Generated playbooks are removed afterwards
+        assert sorted(path.name for path in tmp_path.glob(".ubootu-*")) == []
+
+    def test_failed_role_skips_its_dependents(self, tmp_path):
+        scheduler, log, output = self.make_scheduler(
+            tmp_path, ["broken", "themes", "apps"], {"broken": [], "themes": [], "apps": ["broken"]}
+        )
+
+        assert scheduler.run() == 3
+        runs = self.read_log(log)
+
+        assert "apps" not in runs
+        assert "themes" in runs and "finish" in runs
+        assert scheduler.results["apps"] == -1
+        assert "[apps] Skipped: depends on failed broken" in output.getvalue()
+
+
+def test_scheduled_command_wraps_the_ansible_command():
+    command = ["ansible-playbook", "site.yml", "-i", "inventory.ini", "--forks", "1"]
+    wrapped = scheduled_command(command, max_parallel=2)
+
+    assert wrapped[1:5] == ["-m", "lib.role_scheduler", "--max-parallel", "2"]
+    assert wrapped[-len(command) :] == command
+    assert find_playbook(command) == 1
+    assert find_playbook(["ansible-playbook", "-i", "hosts.yml", "site.yml"]) == 3
+
+    limited = scheduled_command(command, roles=["common", "apps"])
+    assert limited[5:8] == ["--roles", "common,apps", "--"]
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""Test the debounced config writer"""
+
+import os
+import time
+from unittest.mock import patch
+
+import pytest
+import yaml
+
+from lib.tui import config_writer
+from lib.tui.config_writer import ConfigWriter, write_config_atomic
+
+
+def test_atomic_write_replaces_file(tmp_path):
+    """The new content lands under the original name with no temp files left"""
+    path = tmp_path / "config.yml"
+    path.write_text("old: true\n")
+    os.chmod(path, 0o640)
+
+    write_config_atomic(str(path), {"selected_items": ["git"]})
+
+    assert yaml.safe_load(path.read_text()) == {"selected_items": ["git"]}
+    assert os.listdir(tmp_path) == ["config.yml"]
+    assert oct(os.stat(path).st_mode & 0o777) == oct(0o640)
+
+
+def test_atomic_write_failure_keeps_old_file(tmp_path):
+    """A failed dump leaves the previous file and no temp file behind"""
+    path = tmp_path / "config.yml"
+    path.write_text("old: true\n")
+
+    with patch.object(config_writer.yaml, "dump", side_effect=IOError("Disk full")):
+        with pytest.raises(IOError):
+            write_config_atomic(str(path), {"selected_items": []})
+
+    assert path.read_text() == "old: true\n"
+    assert os.listdir(tmp_path) == ["config.yml"]
+
+
+def test_schedule_coalesces_bursts(tmp_path):
+    """Many scheduled saves inside the quiet period become a single write"""
+    path = str(tmp_path / "config.yml")
+    writer = ConfigWriter(delay=0.2)
+
+    with patch.object(config_writer, "write_config_atomic", wraps=write_config_atomic) as mock_write:
+        for i in range(20):
+            writer.schedule(path, {"count": i})
+        assert mock_write.call_count == 0
+
+        deadline = time.monotonic() + 5
+        while writer.pending and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+        assert mock_write.call_count == 1
+    assert yaml.safe_load(open(path)) == {"count": 19}
+    writer.close()
+
+
+def test_flush_writes_immediately(tmp_path):
+    """flush() writes queued changes without waiting for the quiet period"""
+    path = str(tmp_path / "config.yml")
+    writer = ConfigWriter(delay=60)
+
+    writer.schedule(path, {"count": 1})
+    assert writer.flush() is True
+    assert yaml.safe_load(open(path)) == {"count": 1}
+    assert writer.pending is False
+    writer.close()
+
+
+def test_write_now_supersedes_pending(tmp_path):
+    """An explicit write drops older queued content"""
+    path = str(tmp_path / "config.yml")
+    writer = ConfigWriter(delay=60)
+
+    writer.schedule(path, {"count": 1})
+    writer.write_now(path, {"count": 2})
+    assert writer.flush() is True
+    assert yaml.safe_load(open(path)) == {"count": 2}
+    writer.close()
+
+
+def test_background_errors_are_reported(tmp_path):
+    """Write errors are kept for the UI instead of raised on the writer thread"""
+    path = str(tmp_path / "missing" / "config.yml")
+    writer = ConfigWriter(delay=60)
+
+    writer.schedule(path, {"count": 1})
+    assert writer.flush() is False
+    assert writer.last_error is not None
+    writer.close()
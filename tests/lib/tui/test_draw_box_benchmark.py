@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for tui.utils.draw_box
+Counts curses calls for one full unified menu frame and one dialog box on a
+200x60 terminal, with the line-drawing draw_box and the previous
+one-addch-per-cell version. Run directly to print the counts.
+"""
+
+import os
+import sys
+from collections import Counter
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../../.."))
+
+from lib.tui import utils
+from lib.tui.constants import DIALOG_HEIGHT, DIALOG_WIDTH
+from lib.tui.unified_menu import UnifiedMenu
+
+# Other tests may swap curses out in sys.modules; use the module the TUI code sees
+curses = utils.curses
+
+TERMINAL_HEIGHT = 60
+TERMINAL_WIDTH = 200
+
+# ACS characters only exist after initscr(); any distinct values will do here
+ACS_CHARACTERS = {
+    "ACS_ULCORNER": ord("+"),
+    "ACS_URCORNER": ord("+"),
+    "ACS_LLCORNER": ord("+"),
+    "ACS_LRCORNER": ord("+"),
+    "ACS_HLINE": ord("-"),
+    "ACS_VLINE": ord("|"),
+}
+
+
+class CountingWindow:
+    """Stand-in curses window that counts every drawing call made on it and its sub-windows"""
+
+    def __init__(self, height, width, calls=None):
+        self.height = height
+        self.width = width
+        self.calls = calls if calls is not None else Counter()
+
+    def getmaxyx(self):
+        return self.height, self.width
+
+    def derwin(self, height, width, y, x):
+        return CountingWindow(height, width, self.calls)
+
+    def __getattr__(self, name):
+        def record(*args, **kwargs):
+            self.calls[name] += 1
+
+        return record
+
+
+def legacy_draw_box(stdscr, y, x, height, width, title=None):
+    """The previous draw_box, one addch per border cell, kept as the reference"""
+    try:
+        stdscr.addch(y, x, curses.ACS_ULCORNER)
+        stdscr.addch(y, x + width - 1, curses.ACS_URCORNER)
+        stdscr.addch(y + height - 1, x, curses.ACS_LLCORNER)
+        stdscr.addch(y + height - 1, x + width - 1, curses.ACS_LRCORNER)
+
+        for i in range(1, width - 1):
+            stdscr.addch(y, x + i, curses.ACS_HLINE)
+            stdscr.addch(y + height - 1, x + i, curses.ACS_HLINE)
+
+        for i in range(1, height - 1):
+            stdscr.addch(y + i, x, curses.ACS_VLINE)
+            stdscr.addch(y + i, x + width - 1, curses.ACS_VLINE)
+
+        if title:
+            title = f" {title} "
+            title_x = x + utils.center_text(width, title)
+            stdscr.attron(curses.A_BOLD)
+            stdscr.addstr(y, title_x, title[: width - 2])
+            stdscr.attroff(curses.A_BOLD)
+    except curses.error:
+        pass
+
+
+def count_calls(box_function):
+    """Curses calls for one full menu frame and one dialog box drawn with box_function
+
+    Returns (menu_frame_calls, dialog_box_calls) as Counters keyed by method name.
+    """
+    with patch.multiple(curses, create=True, **ACS_CHARACTERS), patch(
+        "lib.tui.unified_menu.draw_box", box_function
+    ), patch("lib.tui.unified_menu.curses.doupdate"):
+        stdscr = CountingWindow(TERMINAL_HEIGHT, TERMINAL_WIDTH)
+        menu = UnifiedMenu(stdscr)
+        menu.load_menu_structure()
+        menu.discovery = None
+        stdscr.calls.clear()
+        menu.render()
+        frame_calls = Counter(stdscr.calls)
+
+        dialog = CountingWindow(TERMINAL_HEIGHT, TERMINAL_WIDTH)
+        box_function(dialog, 20, 70, DIALOG_HEIGHT, DIALOG_WIDTH, "Confirm")
+        dialog_calls = Counter(dialog.calls)
+
+    return frame_calls, dialog_calls
+
+
+def test_line_drawing_cuts_calls_per_frame():
+    """draw_box with hline/vline/border needs a fraction of the calls of the addch loop"""
+    frame_calls, dialog_calls = count_calls(utils.draw_box)
+    legacy_frame_calls, legacy_dialog_calls = count_calls(legacy_draw_box)
+
+    # Border drawing is now a constant number of calls per box, whatever the terminal size
+    assert dialog_calls["addch"] == 4
+    assert sum(dialog_calls.values()) <= 10
+    assert legacy_dialog_calls["addch"] == 2 * (DIALOG_WIDTH + DIALOG_HEIGHT) - 4
+
+    assert sum(frame_calls.values()) * 5 < sum(legacy_frame_calls.values())
+
+
+if __name__ == "__main__":
+    frame_calls, dialog_calls = count_calls(utils.draw_box)
+    legacy_frame_calls, legacy_dialog_calls = count_calls(legacy_draw_box)
+    print(f"Terminal: {TERMINAL_WIDTH}x{TERMINAL_HEIGHT}")
+    print(f"{'':24}{'addch loop':>12}{'line drawing':>14}")
+    print(f"{'Full menu frame':24}{sum(legacy_frame_calls.values()):>12}{sum(frame_calls.values()):>14}")
+    print(f"{'  of which addch':24}{legacy_frame_calls['addch']:>12}{frame_calls['addch']:>14}")
+    print(f"{'Dialog box (60x10)':24}{sum(legacy_dialog_calls.values()):>12}{sum(dialog_calls.values()):>14}")
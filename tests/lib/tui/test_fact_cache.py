@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""Test the persistent Ansible fact cache"""
+
+import configparser
+import json
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+import yaml
+
+from lib.tui.fact_cache import FACT_CACHE_TTL, FactCache, system_fingerprint
+
+REPO_ROOT = Path(__file__).resolve().parents[3]
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return FactCache(cache_dir=tmp_path / "facts")
+
+
+def test_prepare_points_ansible_at_the_cache(cache):
+    """A first apply starts a cache generation and configures the jsonfile plugin"""
+    env = {}
+    assert cache.prepare(env)
+
+    assert env["ANSIBLE_CACHE_PLUGIN"] == "jsonfile"
+    assert env["ANSIBLE_CACHE_PLUGIN_CONNECTION"] == str(cache.cache_dir)
+    assert env["ANSIBLE_CACHE_PLUGIN_TIMEOUT"] == str(FACT_CACHE_TTL)
+    assert cache.cache_dir.is_dir()
+    assert cache.is_valid()
+
+
+def test_fresh_facts_are_kept(cache):
+    """Facts written by Ansible survive the next apply"""
+    cache.prepare({})
+    (cache.cache_dir / "localhost").write_text("{}")
+
+    cache.prepare({})
+    assert (cache.cache_dir / "localhost").exists()
+
+
+def test_expired_facts_are_dropped(cache):
+    """The age limit counts from the start of the generation, not the last write"""
+    cache.prepare({})
+    (cache.cache_dir / "localhost").write_text("{}")
+    state = json.loads(cache.state_file.read_text())
+    state["created"] = time.time() - FACT_CACHE_TTL - 1
+    cache.state_file.write_text(json.dumps(state))
+
+    assert not cache.is_valid()
+    cache.prepare({})
+    assert not (cache.cache_dir / "localhost").exists()
+    assert cache.is_valid()
+
+
+def test_kernel_or_release_change_drops_facts(cache, tmp_path):
+    """Facts gathered before a kernel or distribution upgrade are thrown away"""
+    cache.prepare({})
+    (cache.cache_dir / "localhost").write_text("{}")
+
+    os_release = tmp_path / "os-release"
+    os_release.write_text('VERSION_ID="24.04"\n')
+    upgraded = system_fingerprint(str(os_release))
+    assert upgraded != system_fingerprint()
+
+    with patch("lib.tui.fact_cache.system_fingerprint", return_value=upgraded):
+        assert not cache.is_valid()
+        cache.prepare({})
+        assert cache.is_valid()
+    assert not (cache.cache_dir / "localhost").exists()
+
+
+def test_unwritable_cache_leaves_env_alone(tmp_path):
+    """If the cache can't be created Ansible runs without one"""
+    blocker = tmp_path / "blocker"
+    blocker.write_text("")
+    env = {}
+
+    assert not FactCache(cache_dir=blocker / "facts").prepare(env)
+    assert env == {}
+
+
+def test_playbook_reuses_cached_facts():
+    """site.yml gathers the configured subset only when no cached facts are present"""
+    play = yaml.safe_load((REPO_ROOT / "site.yml").read_text())[0]
+    setup = play["pre_tasks"][0]["ansible.builtin.setup"]
+    group_vars = yaml.safe_load((REPO_ROOT / "group_vars" / "all" / "main.yml").read_text())
+
+    assert "ansible_facts.distribution_release is defined" in setup["gather_subset"]
+    assert "ubootu_gather_subset" in setup["gather_subset"]
+    assert group_vars["ubootu_gather_subset"] == ["!all", "min", "network"]
+
+
+def test_caching_is_not_enabled_globally():
+    """Only FactCache.prepare turns caching on, so unchecked runs always gather in full"""
+    config = configparser.ConfigParser(interpolation=None)
+    config.read(REPO_ROOT / "ansible.cfg")
+
+    assert not any(key.startswith("fact_caching") for key in config["defaults"])
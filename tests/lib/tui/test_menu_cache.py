@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""Test the compiled menu catalog cache"""
+
+import os
+from unittest.mock import patch
+
+import pytest
+
+from lib.tui import menu_cache
+from lib.tui.menu_items import load_menu_structure as build_menu_structure
+
+
+@pytest.fixture
+def source(tmp_path):
+    """Stand-in for menu_items.py whose mtime the test controls"""
+    path = tmp_path / "menu_items.py"
+    path.write_text("# menu source\n")
+    return path
+
+
+def test_cache_matches_source(tmp_path, source):
+    """Items loaded from the cache equal a fresh build"""
+    cache_path = tmp_path / "cache" / "menu.marshal"
+
+    first = menu_cache.load_menu_structure(cache_path, source)
+    assert cache_path.exists()
+
+    with patch.object(menu_cache, "build_menu_cache", side_effect=AssertionError("cache not used")):
+        second = menu_cache.load_menu_structure(cache_path, source)
+
+    assert first == second == build_menu_structure()
+
+
+def test_source_change_invalidates_cache(tmp_path, source):
+    """Touching the menu source forces a rebuild"""
+    cache_path = tmp_path / "menu.marshal"
+    menu_cache.load_menu_structure(cache_path, source)
+
+    st = source.stat()
+    os.utime(source, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+    with patch.object(menu_cache, "build_menu_cache", return_value=[{"id": "rebuilt"}]) as mock_build:
+        items = menu_cache.load_menu_structure(cache_path, source)
+
+    mock_build.assert_called_once()
+    assert items == [{"id": "rebuilt"}]
+
+
+def test_corrupt_cache_is_rebuilt(tmp_path, source):
+    """Unreadable cache files fall back to building the menu"""
+    cache_path = tmp_path / "menu.marshal"
+    cache_path.write_bytes(b"not marshal data")
+
+    items = menu_cache.load_menu_structure(cache_path, source)
+
+    assert items == build_menu_structure()
+    assert menu_cache.load_menu_structure(cache_path, source) == items
+
+
+def test_unwritable_cache_still_loads(tmp_path, source):
+    """A cache directory that can't be created doesn't stop the menu loading"""
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+
+    items = menu_cache.load_menu_structure(blocker / "menu.marshal", source)
+
+    assert items == build_menu_structure()
+
+
+def test_cache_path_honours_xdg(tmp_path):
+    """The cache lives under XDG_CACHE_HOME when it is set"""
+    with patch.dict(os.environ, {"XDG_CACHE_HOME": str(tmp_path)}):
+        assert menu_cache.get_cache_path().parent == tmp_path / "ubootu"
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""Test the indexed menu catalog"""
+
+import sys
+from unittest.mock import MagicMock
+
+import pytest
+
+from lib.tui.menu_catalog import MenuCatalog, MenuItem
+from lib.tui.menu_items import load_menu_structure
+
+
+@pytest.fixture
+def items():
+    """Small nested catalog"""
+    return [
+        {"id": "cat1", "label": "Category 1", "is_category": True, "parent": None, "children": ["cat2", "item1"]},
+        {"id": "cat2", "label": "Category 2", "is_category": True, "parent": "cat1", "children": ["item2", "item3"]},
+        {"id": "item1", "label": "Item 1", "parent": "cat1"},
+        {"id": "item2", "label": "Item 2", "parent": "cat2"},
+        {"id": "item3", "label": "Item 3", "parent": "cat2"},
+        {"id": "top", "label": "Top", "parent": None},
+    ]
+
+
+def test_lookup_by_id(items):
+    """Items are found by id"""
+    catalog = MenuCatalog(items)
+    assert catalog.get("item2")["label"] == "Item 2"
+    assert catalog.get("missing") is None
+    assert "cat1" in catalog
+
+
+def test_first_definition_wins():
+    """Duplicate ids resolve to the first definition like a linear scan"""
+    catalog = MenuCatalog([{"id": "dup", "label": "First"}, {"id": "dup", "label": "Second"}])
+    assert catalog.get("dup")["label"] == "First"
+
+
+def test_children_keep_definition_order(items):
+    """Children are returned in the order the items were defined"""
+    catalog = MenuCatalog(items)
+    assert [item["id"] for item in catalog.children(None)] == ["cat1", "top"]
+    assert [item["id"] for item in catalog.children("cat1")] == ["cat2", "item1"]
+    assert catalog.children("item1") == []
+
+
+def test_descendant_leaves(items):
+    """Descendants are leaf items only, collected recursively"""
+    catalog = MenuCatalog(items)
+    assert catalog.descendant_leaves("cat1") == {"item1", "item2", "item3"}
+    assert catalog.descendant_leaves("cat2") == {"item2", "item3"}
+    assert catalog.descendant_leaves("item1") == frozenset()
+
+
+def test_explicit_category_items(items):
+    """An explicit category mapping overrides the children lists"""
+    catalog = MenuCatalog(items, {"cat1": {"item1"}})
+    assert catalog.descendant_leaves("cat1") == {"item1"}
+    assert catalog.descendant_leaves("cat2") == frozenset()
+
+
+def test_cycle_does_not_recurse_forever():
+    """Malformed catalogs that loop back on themselves still resolve"""
+    items = [
+        {"id": "a", "is_category": True, "children": ["b", "leaf"]},
+        {"id": "b", "is_category": True, "children": ["a"]},
+        {"id": "leaf", "parent": "a"},
+    ]
+    catalog = MenuCatalog(items)
+    assert catalog.descendant_leaves("a") == {"leaf"}
+
+
+def test_matches_real_menu_structure():
+    """Catalog lookups agree with a linear scan of the shipped menu"""
+    items = load_menu_structure()
+    catalog = MenuCatalog(items)
+
+    for parent in [None, "development", "dev-languages", "security"]:
+        expected = [item for item in items if item.get("parent") == parent]
+        assert catalog.children(parent) == expected
+
+    assert catalog.leaf_ids == [item["id"] for item in items if not item.get("is_category")]
+
+
+def test_unified_menu_rebuilds_catalog_on_reassignment(items):
+    """Replacing items or category_items on the menu invalidates the index"""
+    from lib.tui.unified_menu import UnifiedMenu
+
+    stdscr = MagicMock()
+    stdscr.getmaxyx.return_value = (24, 80)
+    menu = UnifiedMenu(stdscr)
+
+    menu.items = items
+    menu.category_items = MenuCatalog.build_category_items(items)
+    assert menu.get_all_descendant_items("cat1") == {"item1", "item2", "item3"}
+
+    menu.category_items = {"cat1": {"item1"}}
+    assert menu.get_all_descendant_items("cat1") == {"item1"}
+
+    menu.items = [{"id": "only", "label": "Only", "parent": None}]
+    assert [item["id"] for item in menu.get_current_items()] == ["only"]
+
+
+def test_menu_item_mapping_compatibility():
+    """MenuItem answers the same mapping queries as the dict it came from"""
+    data = {"id": "zoom", "label": "Zoom", "parent": "apps", "values": [1, 2], "custom": "x"}
+    item = MenuItem.from_dict(data)
+
+    assert item == data
+    assert dict(item) == data
+    assert item["label"] == "Zoom"
+    assert item["values"] == [1, 2]
+    assert item.get("icon") is None
+    assert item.get("children", []) == []
+    assert "icon" not in item
+    assert "custom" in item
+    with pytest.raises(KeyError):
+        item["icon"]
+
+
+def test_menu_item_attributes():
+    """Fields are also typed attributes with defaults for unset ones"""
+    item = MenuItem(id="dev", label="Dev", is_category=True, children=["a"])
+
+    assert item.id == "dev"
+    assert item.is_category is True
+    assert item.is_configurable is False
+    assert item.icon is None
+    assert not hasattr(item, "__dict__")
+
+
+def test_menu_item_interns_ids():
+    """Ids built at runtime are interned"""
+    item = MenuItem(id="".join(["py", "thon"]), parent="".join(["dev-", "python"]), children=["".join(["g", "o"])])
+    assert item.id is sys.intern("python")
+    assert item["parent"] is sys.intern("dev-python")
+    assert item.children[0] is sys.intern("go")
+
+
+def test_load_menu_structure_returns_records():
+    """The shipped menu is built from MenuItem records"""
+    items = load_menu_structure()
+    assert all(isinstance(item, MenuItem) for item in items)
+    assert all(isinstance(item.to_dict(), dict) for item in items)
+
+
+def test_ancestors(items):
+    """Categories above an item come outermost first"""
+    catalog = MenuCatalog(items)
+    assert catalog.ancestors("item2") == ["cat1", "cat2"]
+    assert catalog.ancestors("item1") == ["cat1"]
+    assert catalog.ancestors("top") == []
+    assert catalog.ancestors("missing") == []
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""Test the menu search index"""
+
+import time
+
+import pytest
+
+from lib.tui.menu_catalog import MenuCatalog
+from lib.tui.menu_items import load_menu_structure
+from lib.tui.menu_search import MenuSearchIndex, edit_distance, tokenize
+
+
+@pytest.fixture
+def index():
+    """Index over a few items with overlapping words"""
+    return MenuSearchIndex(
+        [
+            {"id": "editors", "label": "Text Editors", "is_category": True, "parent": None},
+            {"id": "vim", "label": "Vim", "description": "Modal text editor", "parent": "editors"},
+            {
+                "id": "neovim",
+                "label": "Neovim",
+                "description": "Vim-fork focused on extensibility",
+                "parent": "editors",
+            },
+            {
+                "id": "vscode",
+                "label": "Visual Studio Code",
+                "help": "Editor with a vim mode extension",
+                "parent": "editors",
+            },
+            {"id": "docker", "label": "Docker", "description": "Container runtime", "parent": None},
+            {"id": "ai-ml", "label": "AI & Machine Learning", "is_category": True, "parent": None},
+        ]
+    )
+
+
+def test_tokenize():
+    """Words are lowercased and split on punctuation"""
+    assert tokenize("Vim-fork, focused on C++") == ["vim", "fork", "focused", "on", "c++"]
+
+
+def test_edit_distance():
+    """Transpositions count as one edit and the limit cuts the work short"""
+    assert edit_distance("docker", "docker", 2) == 0
+    assert edit_distance("doker", "docker", 2) == 1
+    assert edit_distance("pychram", "pycharm", 2) == 1
+    assert edit_distance("abc", "xyzxyz", 1) == 2
+
+
+def test_exact_match_ranks_first(index):
+    """A label that is the query beats items that only mention it"""
+    assert index.search("vim") == ["vim", "neovim", "vscode"]
+
+
+def test_prefix_match(index):
+    """Partial words match while typing"""
+    assert index.search("dock") == ["docker"]
+    assert set(index.search("vi")) == {"vim", "neovim", "vscode"}
+
+
+def test_every_term_must_match(index):
+    """Multiple words narrow the results"""
+    assert index.search("visual code") == ["vscode"]
+    assert index.search("vim container") == []
+
+
+def test_fuzzy_match(index):
+    """Typos fall back to nearby words"""
+    assert index.search("doker") == ["docker"]
+    assert index.search("neovmi") == ["neovim"]
+    # Too short to guess at
+    assert index.search("dx") == []
+
+
+def test_ids_are_searchable(index):
+    """Whole ids and their parts are indexed"""
+    assert index.search("ai-ml") == ["ai-ml"]
+    assert index.search("ml") == ["ai-ml"]
+
+
+def test_limit_and_empty_query(index):
+    """Empty queries find nothing; limit caps the results"""
+    assert index.search("") == []
+    assert index.search("  ") == []
+    assert index.search("vim", limit=1) == ["vim"]
+
+
+def test_catalog_search_is_fast():
+    """Per-keystroke searches over the full catalog take a few milliseconds at most"""
+    catalog = MenuCatalog(load_menu_structure())
+    index = catalog.search_index
+    assert catalog.search_index is index
+
+    queries = ["p", "py", "pyc", "pych", "pycha", "pychar", "pycharm", "pychram", "doker", "kubernets", "vs code"]
+    start = time.perf_counter()
+    for query in queries:
+        assert index.search(query)
+    per_query = (time.perf_counter() - start) / len(queries)
+
+    assert "pycharm" in index.search("pychram")
+    assert per_query < 0.005
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Tests for the bounded progress output history
+"""
+
+import pytest
+
+from lib.tui.output_history import OutputHistory
+
+
+def _lines(start, end):
+    return [f"line {i}" for i in range(start, end)]
+
+
+class TestOutputHistory:
+    """Test the in-memory tail and spill file"""
+
+    def test_small_history_stays_in_memory(self):
+        history = OutputHistory(capacity=10)
+        history.extend(_lines(0, 5))
+        history.append("line 5")
+
+        assert len(history) == 6
+        assert history.spilled == 0
+        assert history.tail(3) == _lines(3, 6)
+        assert history.window(0, 100) == _lines(0, 6)
+
+    def test_old_lines_spill_to_disk(self):
+        history = OutputHistory(capacity=10)
+        for start in range(0, 95, 7):
+            history.extend(_lines(start, min(start + 7, 95)))
+
+        assert len(history) == 95
+        assert len(history._recent) == 10
+        assert history.spilled == 85
+        assert history.window(0, 3) == _lines(0, 3)
+        # A window spanning the spill file and the in-memory tail
+        assert history.window(80, 10) == _lines(80, 90)
+        assert history.tail(5) == _lines(90, 95)
+
+    def test_batch_larger_than_capacity(self):
+        history = OutputHistory(capacity=4)
+        history.extend(_lines(0, 2))
+        history.extend(_lines(2, 12))
+
+        assert list(history._recent) == _lines(8, 12)
+        assert history.window(0, 12) == _lines(0, 12)
+
+    def test_find_covers_spilled_lines(self):
+        history = OutputHistory(capacity=5)
+        history.extend(_lines(0, 50))
+        history.append("TASK [Install Docker] failed")
+        history.extend(_lines(51, 60))
+
+        assert history.find("install docker", 59) == 50
+        assert history.find("line 3", 49) == 39
+        assert history.find("line 3", 29) == 3
+        assert history.find("line 5", 0, backwards=False) == 5
+        assert history.find("missing", 59) is None
+
+    def test_unicode_lines_round_trip(self):
+        history = OutputHistory(capacity=2)
+        history.extend(["✓ Installed", "ök", "ü", "last"])
+
+        assert history.window(0, 4) == ["✓ Installed", "ök", "ü", "last"]
+
+    def test_spill_failure_drops_old_lines(self):
+        history = OutputHistory(capacity=3)
+        history._spill_failed = True
+        history.extend(_lines(0, 10))
+
+        assert history.first_available == 7
+        assert history.window(0, 10) == _lines(7, 10)
+        assert history.find("line 2", 9) is None
+
+    def test_clear(self):
+        history = OutputHistory(capacity=2)
+        history.extend(_lines(0, 10))
+        history.clear()
+
+        assert len(history) == 0
+        assert history.spilled == 0
+        assert history.window(0, 5) == []
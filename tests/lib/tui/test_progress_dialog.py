@@ -8,6 +8,7 @@ import subprocess
 import sys
 import threading
 import time
+from pathlib import Path
 from unittest.mock import MagicMock, call, patch
 
 import pytest
@@ -219,3 +220,277 @@ class TestProgressDialog:
                 # We'll verify this by checking the addstr calls
                 # This will be implemented in the actual fix
                 pass
+
+
+class TestAnsibleEventStream:
+    """Test progress accounting from the bundled callback's JSON events"""
+
+    @pytest.fixture
+    def progress_dialog(self):
+        from lib.tui.progress_dialog import ProgressDialog
+
+        stdscr = MagicMock()
+        stdscr.getmaxyx.return_value = (24, 80)
+        return ProgressDialog(stdscr)
+
+    def _drain(self, dialog):
+        lines = []
+        while not dialog.output_queue.empty():
+            item = dialog.output_queue.get_nowait()
+            lines.extend(item if isinstance(item, list) else [item])
+        return lines
+
+    def test_events_update_counters(self, progress_dialog):
+        """Task results are counted once per host; loop items only add output"""
+        events = [
+            {"event": "play_start", "name": "Configure"},
+            {"event": "task_start", "task": "applications : Install Firefox"},
+            {"event": "item", "status": "changed", "task": "applications : Install Firefox", "item": "firefox"},
+            {"event": "item", "status": "ok", "task": "applications : Install Firefox", "item": "ffmpeg"},
+            {
+                "event": "result",
+                "status": "changed",
+                "task": "applications : Install Firefox",
+                "loop": True,
+                "duration": 4.5,
+            },
+            {"event": "task_start", "task": "themes : Install Dracula"},
+            {
+                "event": "result",
+                "status": "skipped",
+                "task": "themes : Install Dracula",
+                "false_condition": "'dracula' in selected_items",
+            },
+            {"event": "result", "status": "failed", "task": "common : Update apt cache", "msg": "boom"},
+            {"event": "result", "status": "failed", "task": "common : Probe", "ignore_errors": True},
+            {"event": "stats", "hosts": {"localhost": {"ok": 2, "failures": 1, "skipped": 1}}},
+        ]
+        for event in events:
+            progress_dialog._handle_event(event)
+
+        assert progress_dialog.completed_tasks == 2
+        assert progress_dialog.skipped_tasks == 1
+        assert progress_dialog.failed_tasks == 1
+        assert progress_dialog.skip_reasons == {"Not selected in menu": 1}
+        assert progress_dialog.task_durations == {"applications : Install Firefox": 4.5}
+        assert progress_dialog.current_task == "Finalizing configuration..."
+        assert self._drain(progress_dialog) == [
+            "CHANGED [Install Firefox: firefox]",
+            "OK [Install Firefox: ffmpeg]",
+            "SKIPPED [Install Dracula] - Not selected",
+            "FAILED [Update apt cache] - boom",
+            "IGNORED [Probe]",
+        ]
+
+    def test_events_read_from_pipe(self, progress_dialog):
+        """The playbook runner hands the child a pipe and consumes what it writes"""
+        script = (
+            "import json, os\n"
+            "out = os.fdopen(int(os.environ['UBOOTU_EVENT_FD']), 'w')\n"
+            "out.write(json.dumps({'event': 'task_start', 'task': 'common : Install git'}) + '\\n')\n"
+            "out.write('not json\\n')\n"
+            "out.write(json.dumps({'event': 'result', 'status': 'ok', 'task': 'common : Install git'}) + '\\n')\n"
+            "print('[WARNING]: something to see')\n"
+        )
+
+        progress_dialog._run_ansible_playbook([sys.executable, "-c", script])
+
+        assert progress_dialog.exit_code == 0
+        assert progress_dialog.completed_tasks == 1
+        output = self._drain(progress_dialog)
+        assert "OK [Install git]" in output
+        assert "[WARNING]: something to see" in output
+
+    def test_events_keep_a_silent_run_alive(self, progress_dialog):
+        """A run that only reports events for longer than the stall timeout is not killed"""
+        script = (
+            "import json, os, time\n"
+            "out = os.fdopen(int(os.environ['UBOOTU_EVENT_FD']), 'w', buffering=1)\n"
+            "for i in range(8):\n"
+            "    out.write(json.dumps({'event': 'result', 'status': 'ok', 'task': 'common : Step %d' % i}) + '\\n')\n"
+            "    time.sleep(0.5)\n"
+        )
+
+        with patch("lib.tui.progress_dialog.ACTIVITY_TIMEOUT", 2):
+            progress_dialog._run_ansible_playbook([sys.executable, "-c", script])
+
+        output = self._drain(progress_dialog)
+        assert progress_dialog.exit_code == 0
+        assert progress_dialog.completed_tasks == 8
+        assert progress_dialog.lines_read == 8
+        assert not any("No output or progress" in line or "without producing any output" in line for line in output)
+
+    def test_callback_plugin_emits_events(self, tmp_path):
+        """The bundled callback writes one JSON line per event to UBOOTU_EVENT_FD"""
+        pytest.importorskip("ansible")
+        import importlib.util
+        import json
+        import os
+
+        from lib.tui.progress_dialog import EVENT_CALLBACK_DIR
+
+        read_fd, write_fd = os.pipe()
+        with patch.dict(os.environ, {"UBOOTU_EVENT_FD": str(write_fd)}):
+            spec = importlib.util.spec_from_file_location("ubootu_events", EVENT_CALLBACK_DIR / "ubootu_events.py")
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            callback = module.CallbackModule()
+
+        task = MagicMock(_uuid="t1", action="apt")
+        task.get_name.return_value = "common : Install git"
+        result = MagicMock(_task=task, _result={"changed": True})
+        result._host.get_name.return_value = "localhost"
+
+        callback.v2_playbook_on_task_start(task, False)
+        callback.v2_runner_on_ok(result)
+        callback._stream.close()
+
+        with os.fdopen(read_fd) as f:
+            events = [json.loads(line) for line in f]
+
+        assert [event["event"] for event in events] == ["task_start", "result"]
+        assert events[1]["status"] == "changed"
+        assert events[1]["host"] == "localhost"
+        assert "duration" in events[1]
+
+    def test_callback_plugin_reports_batched_packages_as_items(self):
+        """A batched apt task's per-package results become item events, like a loop"""
+        pytest.importorskip("ansible")
+        import importlib.util
+        import json
+        import os
+
+        from lib.tui.progress_dialog import EVENT_CALLBACK_DIR
+
+        read_fd, write_fd = os.pipe()
+        with patch.dict(os.environ, {"UBOOTU_EVENT_FD": str(write_fd)}):
+            spec = importlib.util.spec_from_file_location("ubootu_events", EVENT_CALLBACK_DIR / "ubootu_events.py")
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            callback = module.CallbackModule()
+
+        task = MagicMock(_uuid="t1", action="apt_batch")
+        task.get_name.return_value = "development-tools : Install CLI tools"
+        packages = [{"item": "tree", "status": "ok"}, {"item": "bogus", "status": "failed", "msg": "No package\nmore"}]
+        result = MagicMock(_task=task, _result={"failed": True, "msg": "Failed to install: bogus"})
+        result._result["package_results"] = packages
+        result._host.get_name.return_value = "localhost"
+
+        callback.v2_runner_on_failed(result)
+        callback._stream.close()
+
+        with os.fdopen(read_fd) as f:
+            events = [json.loads(line) for line in f]
+
+        assert [(event["event"], event["status"], event.get("item")) for event in events] == [
+            ("item", "ok", "tree"),
+            ("item", "failed", "bogus"),
+            ("result", "failed", None),
+        ]
+        assert events[1]["msg"] == "No package"
+        assert events[2]["loop"] is True
+
+
+class TestBatchedOutput:
+    """Test bulk ingestion of playbook output"""
+
+    @pytest.fixture
+    def progress_dialog(self):
+        from lib.tui.progress_dialog import ProgressDialog
+
+        stdscr = MagicMock()
+        stdscr.getmaxyx.return_value = (24, 80)
+        return ProgressDialog(stdscr)
+
+    def test_ingest_output_queues_one_batch(self, progress_dialog, tmp_path):
+        """A block of lines is cleaned, filtered and queued as a single batch"""
+        progress_dialog.events_enabled = True
+        log_path = tmp_path / "run.log"
+
+        with open(log_path, "a") as run_log:
+            assert progress_dialog._ingest_output("\x1b[0;33mfirst\x1b[0m\n\n  \nsecond  \n", run_log)
+
+        assert progress_dialog.output_queue.get_nowait() == ["first", "second"]
+        assert progress_dialog.output_queue.empty()
+        assert progress_dialog.lines_read == 2
+        assert log_path.read_text().count("\n") == 2
+
+    def test_large_output_read_in_bulk(self, progress_dialog):
+        """Thousands of lines, split across pipe reads, arrive intact and in few batches"""
+        script = "import sys\nsys.stdout.write(''.join('line %d\\n' % i for i in range(5000)) + 'tail')\n"
+
+        with patch("lib.tui.progress_dialog.EVENT_CALLBACK_DIR", Path("/nonexistent")):
+            progress_dialog._run_ansible_playbook([sys.executable, "-c", script])
+
+        batches = []
+        while not progress_dialog.output_queue.empty():
+            item = progress_dialog.output_queue.get_nowait()
+            if isinstance(item, list):
+                batches.append(item)
+
+        lines = [line for batch in batches for line in batch]
+        assert progress_dialog.exit_code == 0
+        assert lines[:2] == ["line 0", "line 1"]
+        assert lines[-2:] == ["line 4999", "tail"]
+        assert len(batches) < 100
+
+
+class TestOutputScrollback:
+    """Test scrolling and searching the output history"""
+
+    @pytest.fixture
+    def progress_dialog(self):
+        from lib.tui.output_history import OutputHistory
+        from lib.tui.progress_dialog import ProgressDialog
+
+        stdscr = MagicMock()
+        stdscr.getmaxyx.return_value = (24, 80)
+        dialog = ProgressDialog(stdscr)
+        dialog.output_history = OutputHistory(capacity=20)
+        dialog.output_history.extend(f"line {i}" for i in range(100))
+        return dialog
+
+    def test_page_keys_scroll_and_clamp(self, progress_dialog):
+        # Other tests may swap curses out in sys.modules; use the one the dialog sees
+        from lib.tui.progress_dialog import curses
+
+        assert progress_dialog._view_start(10) == 90
+        assert progress_dialog._handle_output_key(curses.KEY_PPAGE, 10, 20, 4)
+        assert progress_dialog._view_start(10) == 80
+        assert progress_dialog.output_history.window(80, 10)[0] == "line 80"
+
+        progress_dialog._handle_output_key(curses.KEY_HOME, 10, 20, 4)
+        assert progress_dialog._view_start(10) == 0
+        assert progress_dialog.output_history.window(0, 1) == ["line 0"]
+
+        progress_dialog._handle_output_key(curses.KEY_NPAGE, 10, 20, 4)
+        assert progress_dialog._view_start(10) == 10
+        progress_dialog._handle_output_key(curses.KEY_END, 10, 20, 4)
+        assert progress_dialog.scroll_offset == 0
+
+    def test_other_keys_are_not_consumed(self, progress_dialog):
+        assert not progress_dialog._handle_output_key(ord("x"), 10, 20, 4)
+        # n only searches once there is something to search for
+        assert not progress_dialog._handle_output_key(ord("n"), 10, 20, 4)
+
+    def test_search_moves_view_to_match(self, progress_dialog):
+        progress_dialog.stdscr.getch.side_effect = [ord("l"), ord("i"), ord("n"), ord("e"), ord(" "), ord("5"), 10]
+
+        assert progress_dialog._handle_output_key(ord("/"), 10, 20, 4)
+        assert progress_dialog.search_match == 59
+        view_start = progress_dialog._view_start(10)
+        assert view_start <= 59 < view_start + 10
+
+        progress_dialog._handle_output_key(ord("n"), 10, 20, 4)
+        assert progress_dialog.search_match == 58
+        progress_dialog._handle_output_key(ord("N"), 10, 20, 4)
+        assert progress_dialog.search_match == 59
+
+    def test_search_not_found(self, progress_dialog):
+        progress_dialog.stdscr.getch.side_effect = [ord("z"), 10]
+
+        progress_dialog._handle_output_key(ord("/"), 10, 20, 4)
+
+        assert progress_dialog.search_match is None
+        assert progress_dialog.search_status == "Not found: z"
+        assert progress_dialog.scroll_offset == 0
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""Test the incremental selection state"""
+
+import random
+
+import pytest
+
+from lib.tui.menu_catalog import MenuCatalog
+from lib.tui.menu_items import load_menu_structure
+from lib.tui.selection_state import SelectionState
+
+
+@pytest.fixture
+def catalog():
+    """Small nested catalog"""
+    return MenuCatalog(
+        [
+            {"id": "cat1", "is_category": True, "parent": None, "children": ["cat2", "item1"]},
+            {"id": "cat2", "is_category": True, "parent": "cat1", "children": ["item2", "item3"]},
+            {"id": "item1", "parent": "cat1"},
+            {"id": "item2", "parent": "cat2"},
+            {"id": "item3", "parent": "cat2"},
+        ]
+    )
+
+
+def test_behaves_like_legacy_dict():
+    """Plain dict layouts round-trip through the mapping interface"""
+    state = SelectionState({"firefox": True, "chrome": False, "dev": {"python", "rust"}})
+
+    assert state == {"firefox": True, "chrome": False, "dev": {"python", "rust"}}
+    assert state["dev"] == {"python", "rust"}
+    assert state.get("chrome") is False
+    assert state.is_selected("firefox")
+    assert state.is_selected("python")
+    assert not state.is_selected("chrome")
+    assert not state.is_selected("dev")
+
+    del state["dev"]
+    assert not state.is_selected("python")
+
+
+def test_item_selected_through_several_entries():
+    """An item stays selected until every entry holding it lets go"""
+    state = SelectionState({"cat1": {"item1"}, "cat2": {"item1"}})
+
+    state.discard(["item1"], keep="cat2")
+    assert "cat1" not in state
+    assert state.is_selected("item1")
+
+    state.discard(["item1"])
+    assert not state.is_selected("item1")
+    assert state == {}
+
+
+def test_discard_direct_selection_becomes_false():
+    """Direct selections are kept as False when deselected"""
+    state = SelectionState({"firefox": True})
+    state.discard(["firefox"])
+    assert state.get("firefox") is False
+    assert state.config_items() == []
+
+
+def test_counts_follow_changes(catalog):
+    """Category counters update on every add, discard and assignment"""
+    state = SelectionState()
+    state.bind(catalog)
+    assert state.counts("cat1") == (0, 3)
+
+    state.add("cat2", "item2")
+    assert state.counts("cat1") == (1, 3)
+    assert state.counts("cat2") == (1, 2)
+
+    state["cat1"] = {"item1", "item2", "item3"}
+    assert state.counts("cat1") == (3, 3)
+
+    state.discard(["item2"])
+    assert state.counts("cat1") == (2, 3)
+    assert state.counts("cat2") == (1, 2)
+
+    state.clear()
+    assert state.counts("cat1") == (0, 3)
+
+
+def test_bind_recounts_existing_selections(catalog):
+    """Binding a catalog after selections exist counts them"""
+    state = SelectionState({"cat2": {"item2", "item3"}})
+    state.bind(catalog)
+    assert state.counts("cat2") == (2, 2)
+    assert state.counts("cat1") == (2, 3)
+
+
+def test_config_items_layout():
+    """Categories are followed by their items like config.yml expects"""
+    state = SelectionState({"top": True, "off": False, "cat": {"a"}})
+    assert state.config_items() == ["top", "cat", "a"]
+
+
+def test_counts_match_brute_force_on_real_menu():
+    """Random toggles on the shipped menu keep counters exact"""
+    catalog = MenuCatalog(load_menu_structure())
+    state = SelectionState()
+    state.bind(catalog)
+
+    rng = random.Random(1234)
+    leaves = list(catalog.leaf_ids)
+    for _ in range(500):
+        item_id = rng.choice(leaves)
+        if state.is_selected(item_id):
+            state.discard([item_id])
+        else:
+            state.add(rng.choice(list(catalog.categories_containing(item_id)) or [item_id]), item_id)
+
+    selected = state.selected_items()
+    for category_id in catalog.category_items:
+        descendants = catalog.descendant_leaves(category_id)
+        assert state.counts(category_id) == (len(descendants & selected), len(descendants))
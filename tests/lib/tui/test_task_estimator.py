@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""Test task count and duration estimates for Ansible runs"""
+
+import subprocess
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from lib.tui.task_estimator import TaskEstimator, parse_task_list
+
+LIST_TASKS_OUTPUT = """
+playbook: site.yml
+
+  play #1 (all): Bootstrap Ubuntu Desktop Environment\tTAGS: []
+    tasks:
+      Gather facts manually first\tTAGS: [always]
+      common : Update apt cache\tTAGS: [common]
+      common : Install essential packages\tTAGS: [common, packages]
+
+  play #2 (all): Applications\tTAGS: []
+    tasks:
+      applications : Install Firefox\tTAGS: [applications]
+"""
+
+
+@pytest.fixture
+def estimator(tmp_path):
+    """Estimator with its caches and a minimal playbook under tmp_path"""
+    playbook_dir = tmp_path / "repo"
+    (playbook_dir / "roles" / "common" / "tasks").mkdir(parents=True)
+    (playbook_dir / "site.yml").write_text("---\n")
+    (playbook_dir / "roles" / "common" / "tasks" / "main.yml").write_text("---\n")
+    return TaskEstimator(cache_dir=tmp_path / "cache", playbook_dir=playbook_dir)
+
+
+def test_parse_task_list():
+    """Task names are read from every play, without their tags"""
+    assert parse_task_list(LIST_TASKS_OUTPUT) == [
+        "Gather facts manually first",
+        "common : Update apt cache",
+        "common : Install essential packages",
+        "applications : Install Firefox",
+    ]
+
+
+def test_expected_tasks_cached_per_config(estimator):
+    """--list-tasks runs once per configuration"""
+    with patch("subprocess.run") as mock_run:
+        mock_run.return_value = MagicMock(stdout=LIST_TASKS_OUTPUT, returncode=0)
+
+        command = ["ansible-playbook", "site.yml", "--diff", "-v", "--extra-vars", "@vars.yml"]
+        first = estimator.expected_tasks(command, "hash-a")
+        second = estimator.expected_tasks(command, "hash-a")
+
+        assert first == second
+        assert len(first) == 4
+        mock_run.assert_called_once()
+        listed = mock_run.call_args[0][0]
+        assert listed[-1] == "--list-tasks"
+        assert "--diff" not in listed and "@vars.yml" in listed
+
+        estimator.expected_tasks(command, "hash-b")
+        assert mock_run.call_count == 2
+
+
+def test_playbook_change_invalidates_plan(estimator):
+    """Editing a role's tasks gives a new cache key"""
+    key = estimator.plan_key("hash-a")
+    tasks_file = estimator.playbook_dir / "roles" / "common" / "tasks" / "main.yml"
+    tasks_file.write_text("---\n- name: new task\n")
+    assert estimator.plan_key("hash-a") != key
+
+
+def test_list_tasks_failure_returns_none(estimator):
+    """A playbook that can't be listed gives no estimate"""
+    with patch("subprocess.run", side_effect=subprocess.CalledProcessError(4, "ansible-playbook")):
+        assert estimator.expected_tasks(["ansible-playbook", "site.yml"], "hash-a") is None
+        assert estimator.expected_count(["ansible-playbook", "site.yml"], "hash-a") is None
+
+
+def test_recorded_run_refines_count_and_durations(estimator):
+    """A finished run's result count replaces the listed count; durations are blended"""
+    with patch("subprocess.run") as mock_run:
+        mock_run.return_value = MagicMock(stdout=LIST_TASKS_OUTPUT, returncode=0)
+        assert estimator.expected_count(["ansible-playbook"], "hash-a") == 4
+
+    estimator.record_run("hash-a", 37, {"common : Update apt cache": 10.0})
+    estimator.record_run("hash-a", 37, {"common : Update apt cache": 20.0})
+
+    assert estimator.expected_count(["ansible-playbook"], "hash-a") == 37
+    assert estimator.load_durations() == {"common : Update apt cache": 15.0}
+
+
+def test_estimate_remaining():
+    """Unstarted tasks cost their history, unknown ones the average"""
+    expected = ["a", "b", "c", "c"]
+    history = {"a": 10.0, "b": 30.0}
+
+    assert TaskEstimator.estimate_remaining(expected, [], history) == 10 + 30 + 20 + 20
+    assert TaskEstimator.estimate_remaining(expected, ["a", "c"], history) == 30 + 20
+    assert TaskEstimator.estimate_remaining(expected, [], {}, {"a": 4.0}) == 16
+    assert TaskEstimator.estimate_remaining(expected, [], {}) is None
+
+
+def test_progress_dialog_uses_estimate():
+    """ProgressDialog reports a real percentage and ETA once the task list is known"""
+    from lib.tui.progress_dialog import ProgressDialog
+
+    stdscr = MagicMock()
+    stdscr.getmaxyx.return_value = (24, 80)
+    dialog = ProgressDialog(stdscr)
+    dialog.completed_tasks = 3
+    dialog.skipped_tasks = 1
+
+    assert dialog._progress_estimate() == (6, None)
+
+    dialog.expected_total = 8
+    dialog.expected_task_names = ["a", "b", "c", "d", "e", "f", "g", "h"]
+    dialog.started_tasks = ["a", "b", "c", "d"]
+    dialog.duration_history = {"e": 60.0, "f": 60.0, "g": 60.0, "h": 60.0}
+
+    percentage, eta = dialog._progress_estimate()
+    assert percentage == 50
+    assert eta == 240
+    assert ProgressDialog._format_duration(eta) == "4m 00s"
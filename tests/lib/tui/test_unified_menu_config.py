@@ -5,6 +5,7 @@ Tests for unified menu configurable item handling
 
 import os
 import sys
+import tempfile
 import unittest
 from unittest.mock import MagicMock, Mock, mock_open, patch
 
@@ -192,18 +193,17 @@ class TestConfigPersistence(unittest.TestCase):
         menu.selections = {"item1": True, "category1": {"subitem1", "subitem2"}}
         menu.configurable_values = {"font-size": 16, "theme": "Dark"}
 
-        # Mock file operations
-        mock_file = mock_open()
-        with patch("builtins.open", mock_file):
+        # Save into a scratch directory
+        with tempfile.TemporaryDirectory() as temp_dir:
+            menu.config_file = os.path.join(temp_dir, "config.yml")
             menu.save_configuration()
 
-        # Get what was written
-        handle = mock_file()
-        written_calls = handle.write.call_args_list
-        written_data = "".join(call[0][0] for call in written_calls)
+            # Only the config file is left behind by the atomic write
+            self.assertEqual(os.listdir(temp_dir), ["config.yml"])
 
-        # Parse the YAML
-        config = yaml.safe_load(written_data)
+            # Parse the YAML
+            with open(menu.config_file) as f:
+                config = yaml.safe_load(f)
 
         # Verify structure
         self.assertIn("metadata", config)
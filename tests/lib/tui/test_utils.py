@@ -85,10 +85,8 @@ class TestDrawBox:
         stdscr = MagicMock()
         draw_box(stdscr, 0, 0, 3, 20, title="Test")
 
-        # Check that title was added
-        stdscr.attron.assert_called_with(7)  # A_BOLD
-        stdscr.attroff.assert_called_with(7)  # A_BOLD
-        stdscr.addstr.assert_called()
+        # Check that the title was added, centered and bold
+        stdscr.addstr.assert_called_once_with(0, 7, " Test ", 7)  # A_BOLD
 
     @patch("lib.tui.utils.curses.error", Exception)
     def test_draw_box_handles_curses_error(self):
@@ -112,14 +110,42 @@ class TestDrawBox:
         stdscr = MagicMock()
         draw_box(stdscr, 0, 0, 3, 5)
 
-        # Check horizontal lines (top and bottom)
-        for i in range(1, 4):
-            stdscr.addch.assert_any_call(0, i, 5)  # ACS_HLINE
-            stdscr.addch.assert_any_call(2, i, 5)  # ACS_HLINE
+        # Check horizontal lines (top and bottom), one call each
+        stdscr.hline.assert_has_calls([call(0, 1, 5, 3), call(2, 1, 5, 3)])  # ACS_HLINE
 
         # Check vertical lines (left and right)
-        stdscr.addch.assert_any_call(1, 0, 6)  # ACS_VLINE
-        stdscr.addch.assert_any_call(1, 4, 6)  # ACS_VLINE
+        stdscr.vline.assert_has_calls([call(1, 0, 6, 1), call(1, 4, 6, 1)])  # ACS_VLINE
+
+        # Only the corners are drawn cell by cell
+        assert stdscr.addch.call_count == 4
+
+    def test_draw_box_filling_window_uses_border(self):
+        """Test that a box covering the whole window is a single border() call"""
+        window = MagicMock()
+        window.getmaxyx.return_value = (3, 80)
+
+        draw_box(window, 0, 0, 3, 80)
+
+        window.border.assert_called_once_with()
+        window.addch.assert_not_called()
+        window.hline.assert_not_called()
+
+    @patch("lib.tui.utils.curses")
+    def test_draw_box_bottom_right_corner_error(self, mock_curses):
+        """Test that the error from the last cell of a window doesn't stop the title"""
+        mock_curses.error = Exception
+        mock_curses.ACS_LRCORNER = 4
+
+        def addch(y, x, ch):
+            if ch == 4:
+                raise Exception("cursor past the end of the window")
+
+        stdscr = MagicMock()
+        stdscr.addch.side_effect = addch
+
+        draw_box(stdscr, 0, 0, 5, 10, title="Title")
+
+        stdscr.addstr.assert_called_once()
 
 
 class TestDrawCenteredText:
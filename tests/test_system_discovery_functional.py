@@ -48,7 +48,9 @@ class TestSystemDiscoveryFunctional:
 
     @patch("subprocess.run")
     def test_get_installed_packages_success(self, mock_run):
-        """Test getting installed packages from dpkg"""
+        """Test getting installed packages from dpkg-query when the status file is unreadable"""
+        self.discovery.dpkg_status_file = "/nonexistent/dpkg/status"
+
         # Mock dpkg output
         mock_run.return_value = MagicMock(
             stdout="firefox|2:120.0+build2-0ubuntu0.22.04.1|install ok installed|45678\n"
@@ -71,12 +73,31 @@ class TestSystemDiscoveryFunctional:
     @patch("subprocess.run")
     def test_get_installed_packages_handles_error(self, mock_run):
         """Test handling of dpkg query errors"""
+        self.discovery.dpkg_status_file = "/nonexistent/dpkg/status"
         mock_run.side_effect = subprocess.CalledProcessError(1, "dpkg-query")
 
         packages = self.discovery.get_installed_packages()
 
         assert packages == {}
 
+    @patch("subprocess.run")
+    def test_get_installed_packages_reads_status_file(self, mock_run, tmp_path):
+        """Test installed packages come from the dpkg status file without spawning dpkg-query"""
+        status_file = tmp_path / "status"
+        status_file.write_text(
+            "Package: git\nStatus: install ok installed\nInstalled-Size: 12345\n"
+            "Architecture: amd64\nVersion: 1:2.34.1-1ubuntu1.10\n\n"
+            "Package: vim\nStatus: deinstall ok config-files\nArchitecture: amd64\nVersion: 2:8.2\n"
+        )
+        self.discovery.dpkg_status_file = str(status_file)
+
+        packages = self.discovery.get_installed_packages()
+
+        mock_run.assert_not_called()
+        assert packages == {
+            "git": {"version": "1:2.34.1-1ubuntu1.10", "status": "installed", "size": "12345", "menu_id": "git"}
+        }
+
     @patch("subprocess.run")
     def test_get_installed_snaps_success(self, mock_run):
         """Test getting installed snap packages"""
@@ -155,6 +176,149 @@ class TestSystemDiscoveryFunctional:
         assert status_map["chrome"] == "not_installed"
         assert status_map["docker"] == "not_installed"
 
+    @patch.object(SystemDiscovery, "get_installed_flatpaks")
+    @patch.object(SystemDiscovery, "get_installed_snaps")
+    @patch.object(SystemDiscovery, "get_installed_packages")
+    def test_get_inventory_runs_backends_concurrently(self, mock_packages, mock_snaps, mock_flatpaks):
+        """Test the backends overlap and a failing backend yields an empty inventory"""
+        import threading
+
+        barrier = threading.Barrier(2, timeout=5)
+
+        def wait_for_peer(result):
+            def query():
+                barrier.wait()
+                return result
+
+            return query
+
+        mock_packages.side_effect = wait_for_peer({"git": {"menu_id": "git"}})
+        mock_snaps.side_effect = wait_for_peer({"code": {"menu_id": "vscode"}})
+        mock_flatpaks.side_effect = RuntimeError("flatpak exploded")
+
+        installed, snaps, flatpaks = self.discovery.get_inventory()
+
+        assert installed == {"git": {"menu_id": "git"}}
+        assert snaps == {"code": {"menu_id": "vscode"}}
+        assert flatpaks == {}
+
+    @patch("subprocess.run")
+    def test_backend_timeout_returns_empty(self, mock_run):
+        """Test a backend that outlives its timeout is treated as empty"""
+        mock_run.side_effect = subprocess.TimeoutExpired(["snap"], 15)
+
+        assert self.discovery.get_installed_snaps() == {}
+        assert mock_run.call_args[1]["timeout"] == SystemDiscovery.BACKEND_TIMEOUTS["snap"]
+
+    @patch.object(SystemDiscovery, "get_installed_flatpaks", return_value={})
+    @patch.object(SystemDiscovery, "get_installed_snaps", return_value={})
+    @patch.object(SystemDiscovery, "get_installed_packages")
+    def test_map_to_menu_items_async(self, mock_packages, mock_snaps, mock_flatpaks):
+        """Test the background mapping resolves to the same status map"""
+        mock_packages.return_value = {"git": {"menu_id": "git"}}
+
+        future = self.discovery.map_to_menu_items_async(["git", "vim"])
+
+        assert future.result(timeout=5) == {"git": "installed", "vim": "not_installed"}
+
+    def _cached_discovery(self, tmp_path):
+        """Discovery whose cache and backend sources all live under tmp_path"""
+        discovery = SystemDiscovery(use_cache=True)
+        discovery.cache_file = str(tmp_path / ".ubootu_discovery_cache.json")
+        discovery.dpkg_status_file = str(tmp_path / "dpkg_status")
+        discovery.SNAP_STATE_FILE = str(tmp_path / "snap_state.json")
+        discovery.FLATPAK_APP_DIRS = [str(tmp_path / "flatpak_app")]
+        if not (tmp_path / "flatpak_app").exists():
+            (tmp_path / "dpkg_status").write_text("")
+            (tmp_path / "snap_state.json").write_text("")
+            (tmp_path / "flatpak_app").mkdir()
+        return discovery
+
+    @patch.object(SystemDiscovery, "get_installed_flatpaks", return_value={})
+    @patch.object(SystemDiscovery, "get_installed_snaps", return_value={"code": {"version": "1.85.1"}})
+    @patch.object(SystemDiscovery, "get_installed_packages", return_value={"git": {"version": "2.34.1"}})
+    def test_discovery_cache_reused_until_sources_change(self, mock_packages, mock_snaps, mock_flatpaks, tmp_path):
+        """Test unchanged backends come from the cache and only the changed one is re-queried"""
+        import os
+
+        discovery = self._cached_discovery(tmp_path)
+        installed, snaps, flatpaks = discovery.get_inventory()
+        assert installed == {"git": {"version": "2.34.1"}}
+        assert mock_packages.call_count == mock_snaps.call_count == mock_flatpaks.call_count == 1
+
+        # A fresh instance (next launch) reads everything from the cache
+        again = self._cached_discovery(tmp_path)
+        installed, snaps, flatpaks = again.get_inventory()
+        assert mock_packages.call_count == mock_snaps.call_count == mock_flatpaks.call_count == 1
+        assert installed == {"git": {"version": "2.34.1", "menu_id": "git"}}
+        assert snaps["code"]["menu_id"] == "vscode"
+
+        # Touching the snap state only refreshes snaps
+        st = os.stat(again.SNAP_STATE_FILE)
+        os.utime(again.SNAP_STATE_FILE, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+        again.get_inventory()
+        assert mock_snaps.call_count == 2
+        assert mock_packages.call_count == mock_flatpaks.call_count == 1
+
+        # force bypasses the cache
+        again.get_inventory(force=True)
+        assert mock_packages.call_count == 2
+
+    @patch("subprocess.run")
+    def test_failed_backend_not_cached(self, mock_run, tmp_path):
+        """Test a backend that timed out is retried on the next scan instead of cached as empty"""
+
+        def run(cmd, **kwargs):
+            if cmd[0] == "snap":
+                raise subprocess.TimeoutExpired(cmd, kwargs["timeout"])
+            return MagicMock(stdout="org.mozilla.firefox\t120.0\tstable\n", returncode=0)
+
+        mock_run.side_effect = run
+        discovery = self._cached_discovery(tmp_path)
+        installed, snaps, flatpaks = discovery.get_inventory()
+        assert snaps == {} and "snap" in discovery.backend_errors
+        assert list(flatpaks) == ["org.mozilla.firefox"]
+
+        with open(discovery.cache_file) as f:
+            cache = json.load(f)["backends"]
+        assert cache["snap"]["signature"] is None
+        assert cache["flatpak"]["signature"] is not None
+
+        discovery.get_inventory()
+        commands = [call.args[0][0] for call in mock_run.call_args_list]
+        assert commands.count("snap") == 2
+        assert commands.count("flatpak") == 1
+
+    @patch.object(SystemDiscovery, "get_installed_flatpaks", return_value={})
+    @patch.object(SystemDiscovery, "get_installed_snaps", return_value={})
+    @patch.object(SystemDiscovery, "get_installed_packages", return_value={"git": {"version": "2.34.1"}})
+    def test_save_system_state_uses_cached_inventory(self, mock_packages, mock_snaps, mock_flatpaks, tmp_path):
+        """Test saving state after a scan does not query the backends again"""
+        discovery = self._cached_discovery(tmp_path)
+        discovery.state_file = str(tmp_path / ".ubootu_system_state.yml")
+
+        discovery.map_to_menu_items(["git"])
+        discovery.save_system_state()
+
+        assert mock_packages.call_count == 1
+        with open(discovery.state_file) as f:
+            assert yaml.safe_load(f)["packages"]["git"]["version"] == "2.34.1"
+
+    def test_build_installed_index(self):
+        """Test the reverse index records every source a menu item is installed from"""
+        index = SystemDiscovery.build_installed_index(
+            {"docker.io": {"menu_id": "docker"}, "docker-ce": {"menu_id": "docker"}, "libc6": {"menu_id": None}},
+            {"code": {"menu_id": "vscode"}},
+            {"org.mozilla.firefox": {"simple_name": "firefox", "menu_id": "firefox"}},
+        )
+
+        assert index["docker"] == [("apt", "docker.io"), ("apt", "docker-ce")]
+        assert index["vscode"] == [("snap", "code")]
+        assert index["code"] == [("snap", "code")]
+        assert index["firefox"] == [("flatpak", "org.mozilla.firefox")]
+        assert "libc6" not in index
+        assert None not in index
+
     @patch("builtins.open", new_callable=mock_open)
     @patch.object(SystemDiscovery, "get_installed_flatpaks")
     @patch.object(SystemDiscovery, "get_installed_snaps")
@@ -299,6 +463,57 @@ class TestSystemDiscoveryFunctional:
         assert is_safe is True
         assert "Safe to remove" in reason
 
+    @patch("lib.system_discovery.apt_pkg", None)
+    @patch.object(SystemDiscovery, "get_managed_packages")
+    @patch("subprocess.run")
+    def test_plan_removals_batches_queries(self, mock_run, mock_managed):
+        """Test one rdepends query and one managed-list read cover every candidate"""
+        mock_managed.return_value = {"docker-ce", "docker.io", "htop", "neofetch"}
+        mock_run.return_value = MagicMock(
+            stdout="docker-ce\nReverse Depends:\n  docker-compose-plugin\n"
+            "docker.io\nReverse Depends:\n"
+            "htop\nReverse Depends:\n |htop-extras\n"
+            "neofetch\nReverse Depends:\n"
+            "vim\nReverse Depends:\n",
+            returncode=0,
+        )
+
+        plan = self.discovery.plan_removals(["docker", "htop", "neofetch", "vim"])
+
+        mock_run.assert_called_once()
+        assert mock_run.call_args[0][0][:2] == ["apt-cache", "rdepends"]
+        mock_managed.assert_called_once()
+
+        assert plan.to_remove == {
+            "docker.io": ["Unchecked from menu: docker"],
+            "htop": ["Unchecked from menu: htop"],
+            "neofetch": ["Unchecked from menu: neofetch"],
+        }
+        assert "depend on docker-ce" in plan.kept["docker-ce"]
+        assert "not installed by Ubootu" in plan.kept["vim"]
+
+    @patch("lib.system_discovery.apt_pkg", None)
+    @patch.object(SystemDiscovery, "get_managed_packages", return_value={"git"})
+    @patch("subprocess.run")
+    def test_plan_removals_skips_packages_not_installed(self, mock_run, mock_managed):
+        """Test only installed packages of an item are planned once the inventory is known"""
+        mock_run.return_value = MagicMock(stdout="git\nReverse Depends:\n", returncode=0)
+        self.discovery.installed_packages = {"git": {"menu_id": "git"}}
+
+        plan = self.discovery.plan_removals(["git", "docker"])
+
+        assert [candidate.package for candidate in plan.candidates] == ["git"]
+        assert plan.to_remove == {"git": ["Unchecked from menu: git"]}
+
+    def test_parse_rdepends_batched_output(self):
+        """Test the batched rdepends parser reads the same as the single-package one"""
+        output = "zlib1g\nReverse Depends:\n  zlib1g-dev\n  wget\n |libpng16-16\nvim\nReverse Depends:\n"
+
+        assert SystemDiscovery._parse_rdepends(output, ["zlib1g", "vim"]) == {"zlib1g": ["wget"], "vim": []}
+        assert SystemDiscovery._parse_rdepends("Reverse Depends:\n  firefox\n", ["libgtk-3-0"]) == {
+            "libgtk-3-0": ["firefox"]
+        }
+
     @patch.object(SystemDiscovery, "get_managed_packages")
     @patch.object(SystemDiscovery, "is_safe_to_remove")
     @patch.object(SystemDiscovery, "get_installed_packages")
@@ -329,6 +544,7 @@ class TestSystemDiscoveryFunctional:
     @patch("subprocess.run")
     def test_get_installed_packages_filters_non_installed(self, mock_run):
         """Test that only properly installed packages are included"""
+        self.discovery.dpkg_status_file = "/nonexistent/dpkg/status"
         mock_run.return_value = MagicMock(
             stdout="firefox|120.0|install ok installed|45678\n"
             "broken-pkg|1.0|deinstall ok config-files|1234\n"
@@ -91,6 +91,128 @@ class TestUnifiedMenuFunctional:
         assert self.menu.system_state["firefox"] == "installed"
         assert self.menu.system_state["chrome"] == "not_installed"
 
+    def test_background_system_scan(self):
+        """Test the startup scan fills in system state once its future completes"""
+        from concurrent.futures import Future
+
+        self.menu.items = [{"id": "firefox", "is_category": False}]
+        future = Future()
+        self.menu.discovery = MagicMock()
+        self.menu.discovery.map_to_menu_items_async.return_value = future
+
+        self.menu.start_system_scan()
+        assert self.menu.system_scan_pending
+        assert self.menu.poll_system_scan() is False
+        assert self.menu.system_state == {}
+
+        future.set_result({"firefox": "installed"})
+        assert self.menu.poll_system_scan() is True
+        assert not self.menu.system_scan_pending
+        assert self.menu.system_state == {"firefox": "installed"}
+
+    @patch("lib.tui.unified_menu.curses.doupdate")
+    @patch("lib.tui.unified_menu.draw_centered_text")
+    @patch("lib.tui.unified_menu.draw_box")
+    def test_render_redraws_only_changed_rows(self, mock_box, mock_text, mock_doupdate):
+        """Test frames after the first only touch the rows and regions that changed"""
+        self.menu.items = [{"id": f"item{i}", "label": f"Item {i}", "is_category": False} for i in range(5)]
+        windows = {}
+
+        def derwin(height, width, y, x):
+            windows[y] = MagicMock()
+            return windows[y]
+
+        self.stdscr.derwin.side_effect = derwin
+        self.menu.render()
+        header, list_win, help_win = windows[0], windows[6], windows[21]
+        # Five items plus blank rows for the rest of the list area
+        assert list_win.addstr.call_count == self.menu.height - 10
+        assert mock_doupdate.call_count == 1
+
+        for win in (header, list_win, help_win):
+            win.reset_mock()
+        mock_box.reset_mock()
+
+        # Nothing changed: nothing is drawn, but the frame is still flushed once
+        self.menu.render()
+        assert not header.method_calls and not list_win.method_calls and not help_win.method_calls
+        assert mock_doupdate.call_count == 2
+
+        # Cursor move: the old and new highlighted rows
+        self.menu.navigate(ord("j"))
+        self.menu.render()
+        assert [c.args[0] for c in list_win.addstr.call_args_list] == [1, 2]
+        assert not mock_box.called
+
+        # Toggle: only the toggled row (and the header's status line)
+        list_win.reset_mock()
+        self.menu.selections["item1"] = True
+        self.menu.changes_since_apply = True
+        self.menu.render()
+        assert [c.args[0] for c in list_win.addstr.call_args_list] == [2]
+        assert header.addstr.called
+        assert not help_win.method_calls
+
+        # After a dialog the whole screen is drawn again
+        self.menu.invalidate()
+        self.menu.render()
+        self.stdscr.erase.assert_called()
+        assert mock_box.called
+
+    def test_search_mode(self):
+        """Test typing a search query and jumping to the chosen result"""
+        self.menu.items = [
+            {"id": "dev", "label": "Development", "is_category": True, "parent": None, "children": ["editors"]},
+            {"id": "editors", "label": "Editors", "is_category": True, "parent": "dev", "children": ["vim", "emacs"]},
+            {"id": "emacs", "label": "Emacs", "parent": "editors"},
+            {"id": "vim", "label": "Vim", "description": "Modal editor", "parent": "editors"},
+            {"id": "games", "label": "Games", "is_category": True, "parent": None, "children": []},
+        ]
+        self.menu.category_items = {"dev": {"editors"}, "editors": {"vim", "emacs"}}
+
+        assert self.menu.navigate(ord("/")) == "search"
+        assert self.menu.search_active
+
+        for char in "vmi":
+            assert self.menu.navigate(ord(char)) == "search_update"
+        assert [item["id"] for item in self.menu.search_results] == ["vim"]
+
+        # Backspace widens the search again
+        self.menu.navigate(127)
+        self.menu.navigate(127)
+        assert self.menu.search_query == "v"
+
+        self.menu.navigate(ord("i"))
+        assert self.menu.navigate(10) == "search_jump"
+        assert not self.menu.search_active
+        assert self.menu.current_menu == "editors"
+        assert self.menu.menu_stack == ["root", "dev"]
+        assert self.menu.breadcrumb == ["Root", "Development", "Editors"]
+        assert self.menu.get_current_items()[self.menu.current_index]["id"] == "vim"
+
+        # Going back walks up the real menu path
+        self.menu.go_back()
+        assert self.menu.current_menu == "dev"
+
+    def test_search_cancel_keeps_position(self):
+        """Test Esc leaves search mode without moving"""
+        self.menu.items = [
+            {"id": "vim", "label": "Vim", "parent": None},
+            {"id": "emacs", "label": "Emacs", "parent": None},
+        ]
+        self.menu.current_index = 1
+
+        self.menu.navigate(ord("/"))
+        self.menu.navigate(ord("v"))
+        # Keys that are commands outside search mode are typed into the query
+        self.menu.navigate(ord("q"))
+        assert self.menu.search_query == "vq"
+
+        assert self.menu.navigate(27) == "search_cancel"
+        assert not self.menu.search_active
+        assert self.menu.current_menu == "root"
+        assert self.menu.current_index == 1
+
     def test_get_item_sync_status(self):
         """Test getting item sync status"""
         self.menu.selections = {"firefox": True}
@@ -167,16 +289,19 @@ class TestUnifiedMenuFunctional:
 
         assert self.menu.selections.get("firefox") is True
 
-    @patch("builtins.open", new_callable=mock_open)
-    def test_save_configuration(self, mock_file):
+    def test_save_configuration(self, tmp_path):
         """Test saving configuration to file"""
+        self.menu.config_file = str(tmp_path / "config.yml")
         self.menu.selections = {"firefox": True, "chrome": False}
         self.menu.configurable_values = {"timeout": 30}
 
         result = self.menu.save_configuration(silent=True)
 
         assert result is True
-        mock_file.assert_called_with("config.yml", "w")
+        assert self.menu.flush_configuration() is True
+        saved = yaml.safe_load(Path(self.menu.config_file).read_text())
+        assert saved["selected_items"] == ["firefox"]
+        assert saved["configurable_items"]["timeout"]["value"] == 30
 
     def test_get_current_items(self):
         """Test getting current menu items"""
@@ -438,6 +563,23 @@ class TestUnifiedMenuFunctional:
         assert len(packages["safe"]) == 1
         assert len(packages["unsafe"]) == 1
 
+    def test_plan_delta_limits_apply_to_affected_roles(self, tmp_path, monkeypatch):
+        """A one-item change since the last apply only runs the roles that use the item"""
+        monkeypatch.chdir(Path(__file__).resolve().parents[1])
+        applied = {"metadata": {"version": "1.0"}, "selected_items": ["git"], "configurable_items": {}}
+        current = dict(applied, selected_items=["git", "ghostty"])
+        self.menu.applied_state_file = str(tmp_path / "applied.yml")
+        self.menu.config_file = str(tmp_path / "config.yml")
+        Path(self.menu.applied_state_file).write_text(yaml.safe_dump(applied))
+        Path(self.menu.config_file).write_text(yaml.safe_dump(current))
+
+        plan = self.menu._plan_delta({})
+        assert plan.roles == ["applications"]
+
+        # Nothing applied yet: everything runs
+        Path(self.menu.applied_state_file).unlink()
+        assert self.menu._plan_delta({}) is None
+
     def test_navigate_up_down(self):
         """Test navigation with arrow keys"""
         self.menu.items = [